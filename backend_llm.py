@@ -0,0 +1,170 @@
+"""
+Backendy modelu językowego. logic_ai rozmawia wyłącznie z obiektem backendu:
+
+    generuj(prompt, konfiguracja=None) -> str
+    generuj_strumien(prompt, konfiguracja=None) -> iterator fragmentów tekstu
+
+BackendGemini woła API Google. BackendLokalny to deterministyczna zaślepka bez sieci:
+symuluje opóźnienie pierwszego tokenu, przepustowość (tokeny/s) i losowe awarie, a odpowiada
+tekstem o strukturze oczekiwanej przez aplikację (program z punktami, JSON godzin, cel, pytania).
+Wybór: zmienna BHP_LLM_BACKEND = "gemini" (domyślnie) albo "lokalny".
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+import google.generativeai as genai
+
+class BladBackendu(Exception):
+    """Błąd zwracany przez backend (np. symulowana awaria zaślepki). `retry_after` - sugerowany czas oczekiwania (s)."""
+
+    def __init__(self, komunikat, retry_after=None):
+        super().__init__(komunikat)
+        self.retry_after = retry_after
+
+class BackendGemini:
+    def __init__(self, model):
+        self.model = model
+
+    def _parametry(self, konfiguracja):
+        if konfiguracja:
+            return {"generation_config": genai.types.GenerationConfig(**konfiguracja)}
+        return {}
+
+    def generuj(self, prompt, konfiguracja=None):
+        response = genai.GenerativeModel(self.model).generate_content(prompt, **self._parametry(konfiguracja))
+        return response.text
+
+    def generuj_strumien(self, prompt, konfiguracja=None):
+        response = genai.GenerativeModel(self.model).generate_content(prompt, stream=True, **self._parametry(konfiguracja))
+        for chunk in response:
+            yield chunk.text
+
+# --- ZAŚLEPKA DO TESTÓW OFFLINE ---
+
+# ~4 znaki na token (przybliżenie dla liczenia czasu "generowania")
+ZNAKI_NA_TOKEN = 4
+
+_TEMATY_ZASLEPKI = [
+    "Istota bezpieczeństwa i higieny pracy",
+    "Zakres obowiązków i uprawnień pracodawcy oraz pracowników",
+    "Odpowiedzialność za naruszenie przepisów BHP",
+    "Zasady poruszania się na terenie zakładu pracy",
+    "Zagrożenia wypadkowe i zagrożenia dla zdrowia",
+    "Podstawowe zasady BHP przy obsłudze urządzeń technicznych",
+    "Zasady przydziału odzieży roboczej i środków ochrony indywidualnej",
+    "Porządek i czystość w miejscu pracy",
+    "Profilaktyczna opieka lekarska",
+    "Podstawowe zasady ochrony przeciwpożarowej",
+    "Postępowanie w razie wypadku i udzielanie pierwszej pomocy"
+]
+
+def _program_zaslepki(prompt, los):
+    stanowisko = re.search(r"stanowiska '([^']*)'", prompt)
+    stanowisko = stanowisko.group(1) if stanowisko else "pracownik"
+    linie = [f"# SZCZEGÓŁOWY PROGRAM SZKOLENIA WSTĘPNEGO BHP: {stanowisko}", "", "## CZĘŚĆ I: INSTRUKTAŻ OGÓLNY", ""]
+    for i, temat in enumerate(_TEMATY_ZASLEPKI, 1):
+        linie += [f"{i}. **{temat}**", f"- Omówienie zagadnienia na podstawie Kodeksu pracy (art. {los.randint(200, 237)}).", ""]
+    linie += ["## CZĘŚĆ II: INSTRUKTAŻ STANOWISKOWY", ""]
+    for litera, temat in zip("ABCD", ["Przygotowanie do pracy", "Przebieg procesu pracy", "Zagrożenia na stanowisku", "Sprzęt ochronny"]):
+        linie += [f"### {litera}. {temat}", f"- Zasady dla stanowiska {stanowisko}.", ""]
+    linie += ["Oświadczam, że odbyłem szkolenie. Data szkolenia i podpis: ........"]
+    return "\n".join(linie)
+
+def _godziny_zaslepki(prompt, los):
+    bloki = [("Blok Prawny", 0.6), ("Blok Organizacyjny", 0.5), ("Blok Techniczny", 0.4),
+             ("Blok Higieniczny", 0.5), ("Blok Ratunkowy", 1.0), ("INSTRUKTAŻ STANOWISKOWY", 2.0)]
+    return "```json\n" + json.dumps([{"nazwa": f"{i}. {n}", "godziny": g} for i, (n, g) in enumerate(bloki, 1)], ensure_ascii=False) + "\n```"
+
+def _cel_zaslepki(prompt, los):
+    return "Celem szkolenia jest przygotowanie pracownika do bezpiecznego wykonywania pracy na stanowisku w ciągu jednego dnia szkoleniowego."
+
+def _pytania_zaslepki(prompt, los):
+    punkt = re.search(r'punktu programu szkolenia: "([^"]*)"', prompt)
+    if punkt:
+        tytul = punkt.group(1)
+        return "\n".join(f"{i}. {pytanie} {tytul}? - Zgodnie z programem szkolenia."
+                         for i, pytanie in enumerate(["Jakie obowiązki wynikają z punktu", "Jakie zagrożenia omawia punkt",
+                                                      "Jak postąpisz w sytuacji opisanej w punkcie"], 1))
+    return "\n".join(f"{i}. {temat}: co należy zrobić? - Postępować zgodnie z instrukcją." for i, temat in enumerate(_TEMATY_ZASLEPKI[:10], 1))
+
+def _sekcja_zaslepki(prompt, los):
+    tytul = re.search(r'NAPISZ WYŁĄCZNIE PUNKT: "([^"]*)"', prompt).group(1)
+    return f"### {tytul}\n\n- **Zasada:** omówienie zagadnienia zgodnie z art. {los.randint(200, 237)} Kodeksu pracy.\n- Pracownik ma obowiązek stosować się do instrukcji."
+
+def _korekta_zaslepki(prompt, los):
+    # Zaślepka "poprawia" tekst, oddając go bez zmian
+    for znacznik in ("TEKST ORYGINALNY DO EDYCJI:", "FRAGMENT DO EDYCJI:"):
+        if znacznik in prompt:
+            return prompt.split(znacznik, 1)[1].strip()
+    return prompt
+
+# Rozpoznawanie zadania po charakterystycznym fragmencie promptu
+# (korekty najpierw - edytowany tekst może zawierać znaczniki innych zadań)
+ODPOWIEDZI_ZASLEPKI = [
+    ("TEKST ORYGINALNY DO EDYCJI", _korekta_zaslepki),
+    ("FRAGMENT DO EDYCJI", _korekta_zaslepki),
+    ("NAPISZ WYŁĄCZNIE PUNKT", _sekcja_zaslepki),
+    ("BLOKI PRAWNE", _godziny_zaslepki),
+    ("CEL SZKOLENIA", _cel_zaslepki),
+    ("PYTAŃ KONTROLNYCH", _pytania_zaslepki),
+]
+
+class BackendLokalny:
+    def __init__(self, opoznienie_s=0.5, tokeny_na_s=200.0, awaryjnosc=0.0, ziarno=0):
+        self.model = "lokalny-stub"
+        self.opoznienie_s = opoznienie_s
+        self.tokeny_na_s = tokeny_na_s
+        self.awaryjnosc = awaryjnosc
+        # Awarie losowane z własnego generatora - ta sama kolejność wywołań daje te same awarie
+        self._los_awarii = random.Random(ziarno)
+        self._blokada = threading.Lock()
+
+    def _odpowiedz(self, prompt):
+        # Treść zależy tylko od promptu (deterministyczna)
+        los = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        for znacznik, funkcja in ODPOWIEDZI_ZASLEPKI:
+            if znacznik in prompt:
+                return funkcja(prompt, los)
+        return _program_zaslepki(prompt, los)
+
+    def _moze_awaria(self):
+        with self._blokada:
+            awaria = self._los_awarii.random() < self.awaryjnosc
+        if awaria:
+            raise BladBackendu("503 Service Unavailable (symulowana awaria zaślepki)")
+
+    def _czas_generowania(self, tekst):
+        return (len(tekst) / ZNAKI_NA_TOKEN) / self.tokeny_na_s if self.tokeny_na_s else 0.0
+
+    def generuj(self, prompt, konfiguracja=None):
+        tekst = self._odpowiedz(prompt)
+        time.sleep(self.opoznienie_s)
+        self._moze_awaria()
+        time.sleep(self._czas_generowania(tekst))
+        return tekst
+
+    def generuj_strumien(self, prompt, konfiguracja=None, znaki_na_fragment=80):
+        tekst = self._odpowiedz(prompt)
+        time.sleep(self.opoznienie_s)
+        self._moze_awaria()
+        for i in range(0, len(tekst), znaki_na_fragment):
+            fragment = tekst[i:i + znaki_na_fragment]
+            time.sleep(self._czas_generowania(fragment))
+            yield fragment
+
+def utworz_backend(rodzaj, model):
+    """Tworzy backend wg nazwy; parametry zaślepki z BHP_STUB_OPOZNIENIE / BHP_STUB_TOKENY_NA_S / BHP_STUB_AWARYJNOSC."""
+    if rodzaj == "lokalny":
+        return BackendLokalny(
+            opoznienie_s=float(os.environ.get("BHP_STUB_OPOZNIENIE", "0.5")),
+            tokeny_na_s=float(os.environ.get("BHP_STUB_TOKENY_NA_S", "200")),
+            awaryjnosc=float(os.environ.get("BHP_STUB_AWARYJNOSC", "0")),
+        )
+    if rodzaj == "gemini":
+        return BackendGemini(model)
+    raise ValueError(f"Nieznany backend modelu: {rodzaj}")
@@ -0,0 +1,109 @@
+"""
+Test obciążeniowy całego potoku bez sieci (lokalna zaślepka modelu zamiast Gemini):
+
+    python benchmark_offline.py [--szkolenia 20] [--watki 4] [--opoznienie 0.5] [--tokeny-na-s 200] [--awaryjnosc 0.05]
+                                [--rpm 600] [--tpm 2000000]
+
+Każde szkolenie przechodzi tę samą ścieżkę co aplikacja: program + cel + godziny, pytania kontrolne,
+a potem dokumenty (program DOCX, karty uczestników, rejestr, tematyka). Cache odpowiedzi jest
+kierowany do pliku tymczasowego, żeby kolejne przebiegi nie mierzyły samych trafień.
+"""
+import argparse
+import datetime
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+if "BHP_LLM_CACHE" not in os.environ:
+    os.environ["BHP_LLM_CACHE"] = os.path.join(tempfile.mkdtemp(prefix="bhp_bench_"), "odpowiedzi_llm.sqlite")
+
+from backend_llm import BackendLokalny
+from bramka_llm import BramkaLLM
+from logic_ai import generuj_szkolenie_rownolegle, generuj_test_bhp, statystyki_modeli, ustaw_backend
+from logic_docs import generuj_dokument_seryjny, generuj_dokument_z_tabela, generuj_docx_z_konspektu, generuj_docx_z_markdown
+
+UCZESTNICY = [
+    {"imie_nazwisko": f"Uczestnik {i}", "miejsce_pracy": "Biuro", "funkcja": "Specjalista"} for i in range(1, 6)
+]
+
+def _dokumenty(firma, nazwa_zawodu, wyniki):
+    """Generuje dokumenty szkolenia. Zwraca (liczba wygenerowanych plików, lista błędów "dokument: opis")."""
+    if wyniki["konspekt"]:
+        pliki = {"program": (generuj_docx_z_konspektu(wyniki["konspekt"]), None)}
+    else:
+        pliki = {"program": (generuj_docx_z_markdown(wyniki["finalna_tresc"]), None)}
+    dzis = datetime.date.today().strftime("%d.%m.%Y")
+    konteksty_kart = [{
+        'nazwa_firmy': firma, 'imie_nazwisko': u['imie_nazwisko'], 'komorka_organizacyjna': u['miejsce_pracy'],
+        'stanowisko': nazwa_zawodu, 'dzien_rozpoczecia': dzis, 'instruktor_ogolny': "Jan Nowak",
+        'data_stanowiskowego': dzis, 'instruktor_stanowiskowy': "Anna Kowalska"
+    } for u in UCZESTNICY]
+    pliki["karty"] = generuj_dokument_seryjny("Wzor-Karta-szkolenia-wstepnego-BHP.docx", konteksty_kart)
+    rejestr_dane = [{'numer': f"1/{i + 1}", 'imie_nazwisko': u['imie_nazwisko'], 'uwagi': ''} for i, u in enumerate(UCZESTNICY)]
+    context_rej = {'rodzaj_szkolenia': "wstępnego", 'nr_kursu': "1", 'kierownik_nazwisko': "Jan Nowak",
+                   'data_wystawienia': dzis, 'nazwa_organizatora': firma, 'miejsce': "Warszawa"}
+    # Szablon uproszczony ma jedną tabelę (rejestr)
+    pliki["rejestr"] = generuj_dokument_z_tabela("rejestr_zaswiadczen_szablon_uproszczony.docx", context_rej, rejestr_dane,
+                                                 ['numer', 'imie_nazwisko', 'podpis_dummy', 'uwagi'], index_tabeli=0)
+    tematyka = [{"nazwa": t.get('nazwa', ''), "godziny": t.get('godziny', 0), "praktyka": "0"} for t in wyniki["tematyka_z_godzinami"]]
+    pliki["tematyka"] = generuj_dokument_z_tabela("tematyka_szablon_uproszczony.docx", {}, tematyka, ['nazwa', 'godziny', 'praktyka'])
+    bledy = [f"{nazwa}: {blad or 'brak pliku'}" for nazwa, (plik, blad) in pliki.items() if not plik]
+    return len(pliki) - len(bledy), bledy
+
+def _jedno_szkolenie(nr):
+    firma, nazwa_zawodu = f"Firma testowa {nr}", "Specjalista do spraw kadr"
+    czasy = {}
+    t0 = time.perf_counter()
+    wyniki = generuj_szkolenie_rownolegle(firma, nazwa_zawodu, "Opis testowy.", "", "Praca biurowa.", "Biuro")
+    czasy["program"] = time.perf_counter() - t0
+    if "Błąd" in wyniki["finalna_tresc"]:
+        return czasy, False
+    t0 = time.perf_counter()
+    generuj_test_bhp(wyniki["finalna_tresc"])
+    czasy["pytania"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    czasy["pliki"], czasy["bledy_plikow"] = _dokumenty(firma, nazwa_zawodu, wyniki)
+    czasy["dokumenty"] = time.perf_counter() - t0
+    return czasy, True
+
+def benchmark(szkolenia, watki):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=watki) as pula:
+        wyniki = list(pula.map(_jedno_szkolenie, range(szkolenia)))
+    return wyniki, time.perf_counter() - start
+
+def _opis(wartosci):
+    if not wartosci:
+        return "-"
+    wartosci = sorted(wartosci)
+    p95 = wartosci[min(len(wartosci) - 1, int(len(wartosci) * 0.95))]
+    return f"mediana {statistics.median(wartosci):.2f} s | p95 {p95:.2f} s"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test obciążeniowy potoku szkoleń na lokalnej zaślepce modelu.")
+    parser.add_argument("--szkolenia", type=int, default=20, help="Liczba szkoleń do wygenerowania")
+    parser.add_argument("--watki", type=int, default=4, help="Ile szkoleń naraz")
+    parser.add_argument("--opoznienie", type=float, default=0.5, help="Opóźnienie pierwszego tokenu zaślepki (s)")
+    parser.add_argument("--tokeny-na-s", type=float, default=200, help="Przepustowość zaślepki (tokeny/s)")
+    parser.add_argument("--awaryjnosc", type=float, default=0.0, help="Odsetek wywołań kończących się błędem (0-1)")
+    parser.add_argument("--rpm", type=float, default=600, help="Limit zapytań na minutę w bramce")
+    parser.add_argument("--tpm", type=float, default=2000000, help="Limit tokenów na minutę w bramce")
+    args = parser.parse_args()
+
+    bramka = BramkaLLM(BackendLokalny(args.opoznienie, args.tokeny_na_s, args.awaryjnosc), args.rpm, args.tpm)
+    ustaw_backend(bramka)
+    wyniki, czas = benchmark(args.szkolenia, args.watki)
+
+    udane = [c for c, ok in wyniki if ok]
+    print("-" * 30)
+    print(f"Szkolenia: {len(udane)}/{len(wyniki)} udanych w {czas:.2f} s ({len(udane) / czas * 3600:.0f} szkoleń/h)")
+    for etap in ("program", "pytania", "dokumenty"):
+        print(f"{etap:>10}: {_opis([c[etap] for c in udane if etap in c])}")
+    bledy_plikow = [b for c in udane for b in c.get("bledy_plikow", [])]
+    print(f"Dokumenty DOCX: {sum(c.get('pliki', 0) for c in udane)}, błędy: {len(bledy_plikow)}")
+    for blad in sorted(set(bledy_plikow)):
+        print(f"  {bledy_plikow.count(blad)}x {blad}")
+    print(f"Bramka: {bramka.statystyki}")
+    print(f"Modele: {statystyki_modeli()}")
@@ -0,0 +1,183 @@
+"""
+Centralna bramka wywołań modelu. Owija dowolny backend (backend_llm) i dla wszystkich wywołań w procesie pilnuje:
+
+- limitu zapytań i tokenów na minutę (kubełki tokenów),
+- maksymalnej liczby wywołań w toku (semafor),
+- ponowień z wykładniczym opóźnieniem i losowym rozrzutem, z uwzględnieniem "retry after" z odpowiedzi API.
+
+Po błędzie 429 z podanym czasem oczekiwania wstrzymywane są wszystkie wywołania, nie tylko to jedno.
+"""
+import os
+import random
+import re
+import threading
+import time
+
+LIMIT_ZAPYTAN_NA_MIN = float(os.environ.get("BHP_LLM_RPM", "60"))
+LIMIT_TOKENOW_NA_MIN = float(os.environ.get("BHP_LLM_TPM", "1000000"))
+MAKS_ROWNOLEGLYCH = int(os.environ.get("BHP_LLM_ROWNOLEGLE", "8"))
+MAKS_PROB = int(os.environ.get("BHP_LLM_PROBY", "5"))
+
+OPOZNIENIE_BAZOWE_S = 1.0
+MAKS_OPOZNIENIE_S = 60.0
+
+# ~4 znaki na token - do szacowania zużycia limitu tokenów
+ZNAKI_NA_TOKEN = 4
+
+# Błędy przejściowe: limit, przeciążenie, timeout (kody HTTP i nazwy wyjątków google.api_core)
+_WZORZEC_PONOWIENIA = re.compile(
+    r"\b(429|500|502|503|504)\b|ResourceExhausted|ServiceUnavailable|DeadlineExceeded|InternalServerError|"
+    r"TooManyRequests|timed? ?out", re.IGNORECASE
+)
+
+def czy_ponowic(blad):
+    return bool(_WZORZEC_PONOWIENIA.search(f"{type(blad).__name__} {blad}"))
+
+def czas_retry_after(blad):
+    """Czas oczekiwania zasugerowany przez API (atrybut retry_after albo 'retry_delay { seconds: N }' / 'retry in Ns')."""
+    wartosc = getattr(blad, "retry_after", None)
+    if wartosc:
+        return float(wartosc)
+    tekst = str(blad)
+    m = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", tekst) or re.search(r"retry (?:in|after) ([\d.]+)\s*s", tekst, re.IGNORECASE)
+    return float(m.group(1)) if m else None
+
+class KubelekTokenow:
+    """Kubełek uzupełniany w sposób ciągły: pojemność = limit na minutę."""
+
+    def __init__(self, na_minute):
+        self.pojemnosc = float(na_minute)
+        self.tempo = self.pojemnosc / 60.0
+        self.stan = self.pojemnosc
+        self.czas = time.monotonic()
+        self._blokada = threading.Lock()
+
+    def _uzupelnij(self):
+        teraz = time.monotonic()
+        self.stan = min(self.pojemnosc, self.stan + (teraz - self.czas) * self.tempo)
+        self.czas = teraz
+
+    def pobierz(self, ile=1.0):
+        """Czeka, aż w kubełku będzie `ile` jednostek, i je zabiera."""
+        ile = min(float(ile), self.pojemnosc)  # większe żądanie nigdy by się nie zmieściło
+        while True:
+            with self._blokada:
+                self._uzupelnij()
+                if self.stan >= ile:
+                    self.stan -= ile
+                    return
+                czekaj = (ile - self.stan) / self.tempo
+            time.sleep(czekaj)
+
+    def obciaz(self, ile):
+        """Zużycie znane dopiero po fakcie (tokeny odpowiedzi) - stan może zejść poniżej zera."""
+        with self._blokada:
+            self._uzupelnij()
+            self.stan -= float(ile)
+
+def _strumien_z_pomiarem(strumien, pomiar):
+    """Fragmenty `strumien`; na koniec `pomiar(czas_s)` - łączny czas czekania na model, bez przerw u odbiorcy."""
+    czas = 0.0
+    try:
+        while True:
+            start = time.monotonic()
+            try:
+                fragment = next(strumien)
+            except StopIteration:
+                return
+            finally:
+                czas += time.monotonic() - start
+            yield fragment
+    finally:
+        strumien.close()
+        pomiar(czas)
+
+class BramkaLLM:
+    """
+    Backend z limitami: ten sam interfejs (generuj, generuj_strumien, model) co owijany backend.
+    Opcjonalny `pomiar(czas_s)` dostaje czas samego wywołania modelu w każdej próbie - bez czekania
+    na limity i semafor i bez odczekań przed ponowieniem (router_llm liczy z niego SLO).
+    """
+
+    def __init__(self, backend, zapytania_na_min=LIMIT_ZAPYTAN_NA_MIN, tokeny_na_min=LIMIT_TOKENOW_NA_MIN,
+                 maks_rownoleglych=MAKS_ROWNOLEGLYCH, maks_prob=MAKS_PROB):
+        self.backend = backend
+        self.maks_prob = maks_prob
+        self._zapytania = KubelekTokenow(zapytania_na_min)
+        self._tokeny = KubelekTokenow(tokeny_na_min)
+        self._semafor = threading.BoundedSemaphore(maks_rownoleglych)
+        self._wstrzymane_do = 0.0
+        self._blokada = threading.Lock()
+        self.statystyki = {"wywolania": 0, "ponowienia": 0, "bledy": 0}
+
+    @property
+    def model(self):
+        return self.backend.model
+
+    def _czekaj_na_limit(self, prompt):
+        with self._blokada:
+            pauza = self._wstrzymane_do - time.monotonic()
+        if pauza > 0:
+            time.sleep(pauza)
+        self._zapytania.pobierz(1)
+        self._tokeny.pobierz(len(prompt) / ZNAKI_NA_TOKEN)
+
+    def _odczekaj_po_bledzie(self, proba, blad):
+        """Pełny losowy rozrzut (0..2^proba s), a jeśli API podało retry-after - co najmniej tyle, dla wszystkich wątków."""
+        opoznienie = random.uniform(0, min(MAKS_OPOZNIENIE_S, OPOZNIENIE_BAZOWE_S * 2 ** proba))
+        retry_after = czas_retry_after(blad)
+        if retry_after:
+            opoznienie = retry_after + random.uniform(0, OPOZNIENIE_BAZOWE_S)
+            with self._blokada:
+                self._wstrzymane_do = max(self._wstrzymane_do, time.monotonic() + retry_after)
+        with self._blokada:
+            self.statystyki["ponowienia"] += 1
+        time.sleep(opoznienie)
+
+    def _zapisz_blad(self):
+        with self._blokada:
+            self.statystyki["bledy"] += 1
+
+    def generuj(self, prompt, konfiguracja=None, pomiar=None):
+        for proba in range(self.maks_prob):
+            self._czekaj_na_limit(prompt)
+            try:
+                with self._semafor:
+                    with self._blokada:
+                        self.statystyki["wywolania"] += 1
+                    start = time.monotonic()
+                    try:
+                        tekst = self.backend.generuj(prompt, konfiguracja)
+                    finally:
+                        if pomiar:
+                            pomiar(time.monotonic() - start)
+                self._tokeny.obciaz(len(tekst) / ZNAKI_NA_TOKEN)
+                return tekst
+            except Exception as e:
+                if proba + 1 >= self.maks_prob or not czy_ponowic(e):
+                    self._zapisz_blad()
+                    raise
+                self._odczekaj_po_bledzie(proba, e)
+
+    def generuj_strumien(self, prompt, konfiguracja=None, pomiar=None):
+        """Ponawia tylko przed pierwszym fragmentem - wysłanego już tekstu nie da się cofnąć."""
+        for proba in range(self.maks_prob):
+            self._czekaj_na_limit(prompt)
+            wyslane_znaki = 0
+            try:
+                with self._semafor:
+                    with self._blokada:
+                        self.statystyki["wywolania"] += 1
+                    strumien = self.backend.generuj_strumien(prompt, konfiguracja)
+                    if pomiar:
+                        strumien = _strumien_z_pomiarem(strumien, pomiar)
+                    for fragment in strumien:
+                        wyslane_znaki += len(fragment)
+                        yield fragment
+                self._tokeny.obciaz(wyslane_znaki / ZNAKI_NA_TOKEN)
+                return
+            except Exception as e:
+                if wyslane_znaki or proba + 1 >= self.maks_prob or not czy_ponowic(e):
+                    self._zapisz_blad()
+                    raise
+                self._odczekaj_po_bledzie(proba, e)
@@ -0,0 +1,119 @@
+"""
+Trwały cache odpowiedzi modelu (SQLite), wspólny dla wszystkich procesów Streamlit i przeżywający restart.
+Klucz = nazwa modelu + hash promptu + konfiguracja generowania. Wpisy wygasają po CZAS_ZYCIA_S,
+a gdy łączny rozmiar przekroczy MAKS_ROZMIAR_B, usuwane są najdawniej używane (LRU).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from data_manager import FOLDER_CACHE
+
+PLIK_CACHE_LLM = os.environ.get("BHP_LLM_CACHE", os.path.join(FOLDER_CACHE, "odpowiedzi_llm.sqlite"))
+CZAS_ZYCIA_S = float(os.environ.get("BHP_LLM_CACHE_DNI", "30")) * 24 * 3600
+MAKS_ROZMIAR_B = int(float(os.environ.get("BHP_LLM_CACHE_MB", "200")) * 1024 * 1024)
+
+# Czekanie na blokadę zapisu innego procesu (SQLite pozwala na jednego piszącego naraz)
+LIMIT_OCZEKIWANIA_S = 30
+
+_SCHEMAT = """
+CREATE TABLE IF NOT EXISTS odpowiedzi (
+    klucz TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    odpowiedz TEXT NOT NULL,
+    rozmiar INTEGER NOT NULL,
+    utworzono REAL NOT NULL,
+    uzyto REAL NOT NULL,
+    trafienia INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS odpowiedzi_uzyto ON odpowiedzi (uzyto);
+"""
+
+# Osobne połączenie na wątek (sqlite3 nie lubi współdzielenia połączeń między wątkami)
+_lokalne = threading.local()
+
+def _polaczenie():
+    polaczenie = getattr(_lokalne, "polaczenie", None)
+    if polaczenie is None:
+        os.makedirs(os.path.dirname(PLIK_CACHE_LLM) or ".", exist_ok=True)
+        polaczenie = sqlite3.connect(PLIK_CACHE_LLM, timeout=LIMIT_OCZEKIWANIA_S, isolation_level=None)
+        # WAL: czytelnicy nie blokują piszącego i odwrotnie
+        polaczenie.execute("PRAGMA journal_mode=WAL")
+        polaczenie.execute("PRAGMA synchronous=NORMAL")
+        polaczenie.executescript(_SCHEMAT)
+        _lokalne.polaczenie = polaczenie
+    return polaczenie
+
+def klucz_odpowiedzi(model, prompt, konfiguracja=None):
+    """Klucz wpisu: identyczny model, prompt i konfiguracja dają identyczny klucz."""
+    opis = json.dumps({
+        "model": model,
+        "prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        "konfiguracja": konfiguracja or {}
+    }, sort_keys=True)
+    return hashlib.sha256(opis.encode("utf-8")).hexdigest()
+
+def odczytaj_odpowiedz(klucz):
+    """Zwraca zapisaną odpowiedź albo None (brak wpisu, wpis przeterminowany lub błąd bazy)."""
+    teraz = time.time()
+    try:
+        db = _polaczenie()
+        wiersz = db.execute("SELECT odpowiedz, utworzono FROM odpowiedzi WHERE klucz = ?", (klucz,)).fetchone()
+        if wiersz is None:
+            return None
+        if teraz - wiersz[1] > CZAS_ZYCIA_S:
+            db.execute("DELETE FROM odpowiedzi WHERE klucz = ?", (klucz,))
+            return None
+        db.execute("UPDATE odpowiedzi SET uzyto = ?, trafienia = trafienia + 1 WHERE klucz = ?", (teraz, klucz))
+        return wiersz[0]
+    except sqlite3.Error as e:
+        print(f"Błąd odczytu cache odpowiedzi: {e}")
+        return None
+
+def zapisz_odpowiedz(klucz, model, odpowiedz):
+    """Zapisuje odpowiedź i od razu sprząta: wpisy po TTL, a potem najstarsze ponad limit rozmiaru."""
+    teraz = time.time()
+    try:
+        db = _polaczenie()
+        # BEGIN IMMEDIATE: zapis i sprzątanie w jednej transakcji, bez wyścigu z innymi procesami
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO odpowiedzi (klucz, model, odpowiedz, rozmiar, utworzono, uzyto, trafienia) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (klucz, model, odpowiedz, len(odpowiedz.encode("utf-8")), teraz, teraz)
+            )
+            db.execute("DELETE FROM odpowiedzi WHERE utworzono < ?", (teraz - CZAS_ZYCIA_S,))
+            # Zostawiamy najświeższe wpisy, dopóki mieszczą się w limicie
+            db.execute("""
+                DELETE FROM odpowiedzi WHERE klucz IN (
+                    SELECT klucz FROM (
+                        SELECT klucz, SUM(rozmiar) OVER (ORDER BY uzyto DESC, klucz) AS narastajaco FROM odpowiedzi
+                    ) WHERE narastajaco > ?
+                )""", (MAKS_ROZMIAR_B,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        print(f"Błąd zapisu cache odpowiedzi: {e}")
+
+def statystyki_cache():
+    """Liczba wpisów, łączny rozmiar odpowiedzi (bajty) i suma trafień."""
+    try:
+        wpisy, rozmiar, trafienia = _polaczenie().execute(
+            "SELECT COUNT(*), COALESCE(SUM(rozmiar), 0), COALESCE(SUM(trafienia), 0) FROM odpowiedzi"
+        ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Błąd odczytu cache odpowiedzi: {e}")
+        wpisy, rozmiar, trafienia = 0, 0, 0
+    return {"wpisy": wpisy, "bajty": rozmiar, "trafienia": trafienia, "limit_bajtow": MAKS_ROZMIAR_B}
+
+def wyczysc_cache():
+    try:
+        _polaczenie().execute("DELETE FROM odpowiedzi")
+    except sqlite3.Error as e:
+        print(f"Błąd czyszczenia cache odpowiedzi: {e}")
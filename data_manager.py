@@ -1,49 +1,519 @@
 import os
+import hashlib
+import json
+import re
+import csv
+import bisect
+import threading
+import unicodedata
 from PyPDF2 import PdfReader
+from docx import Document
+from docx.table import Table
+from docx.text.paragraph import Paragraph
 import streamlit as st
 
+# Trwały magazyn wyekstrahowanych tekstów (przeżywa restart procesu, w przeciwieństwie do st.cache_data)
+FOLDER_CACHE = os.environ.get("BHP_CACHE_DIR", ".cache_bhp")
+FOLDER_CACHE_TEKSTOW = os.path.join(FOLDER_CACHE, "teksty")
+
+# Rodzaj wpisu i separator stron dla dokumentów bazy wiedzy
+RODZAJ_BAZY = "baza"
+SEPARATOR_BAZY = "\n\n"
+
+# Klasyfikacja zawodów (eksport KZiS: kolumny "kod;nazwa")
+PLIK_KLASYFIKACJI = "klasyfikacja_zawodow.csv"
+
+# Lista awaryjna, gdy brak pliku klasyfikacji
+ZAWODY_DOMYSLNE = {
+    "252101": "Administrator baz danych",
+    "242217": "Specjalista administracji publicznej",
+    "242307": "Specjalista do spraw kadr",
+    "334101": "Kierownik biura",
+    "334302": "Asystent dyrektora"
+}
+
 def wczytaj_liste_zawodow_lokalnie():
-    lista_zawodow = {
-        "Administrator baz danych (252101)": "252101",
-        "Specjalista administracji publicznej (242217)": "242217",
-        "Specjalista do spraw kadr (242307)": "242307",
-        "Kierownik biura (334101)": "334101",
-        "Asystent dyrektora (334302)": "334302"
+    """Zwraca cały katalog jako słownik {etykieta: kod}. Do list wyboru lepiej używać szukaj_zawodow()."""
+    indeks = _indeks_katalogu()
+    return {_etykieta_zawodu(nazwa, kod): kod for kod, nazwa in zip(indeks["kody"], indeks["nazwy"])}
+
+# --- MAGAZYN TEKSTÓW NA DYSKU ---
+
+def _hash_pliku(sciezka):
+    """Liczy SHA-256 zawartości pliku (czytanie blokami, bez ładowania całości do pamięci)."""
+    h = hashlib.sha256()
+    with open(sciezka, "rb") as f:
+        for blok in iter(lambda: f.read(1 << 20), b""):
+            h.update(blok)
+    return h.hexdigest()
+
+def _zapisz_atomowo(sciezka, tresc):
+    """Zapis przez plik tymczasowy + os.replace, żeby równoległe procesy nie czytały połówek plików."""
+    os.makedirs(os.path.dirname(sciezka), exist_ok=True)
+    sciezka_tmp = f"{sciezka}.{os.getpid()}.tmp"
+    with open(sciezka_tmp, "w", encoding="utf-8") as f:
+        f.write(tresc)
+    os.replace(sciezka_tmp, sciezka)
+
+def _sciezka_metadanych(sciezka_zrodla):
+    klucz = hashlib.sha1(os.path.abspath(sciezka_zrodla).encode("utf-8")).hexdigest()
+    return os.path.join(FOLDER_CACHE_TEKSTOW, f"{klucz}.json")
+
+def odcisk_pliku(sciezka_zrodla):
+    """
+    Zwraca hash treści pliku. Jeśli rozmiar i mtime się nie zmieniły od ostatniego razu,
+    hash jest brany z metadanych (bez ponownego czytania pliku).
+    """
+    stat = os.stat(sciezka_zrodla)
+    sciezka_meta = _sciezka_metadanych(sciezka_zrodla)
+    try:
+        with open(sciezka_meta, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("rozmiar") == stat.st_size and meta.get("mtime_ns") == stat.st_mtime_ns:
+            return meta["sha256"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sha = _hash_pliku(sciezka_zrodla)
+    meta = {
+        "sciezka": os.path.abspath(sciezka_zrodla),
+        "rozmiar": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha
     }
-    return lista_zawodow
+    try:
+        _zapisz_atomowo(sciezka_meta, json.dumps(meta, ensure_ascii=False))
+    except OSError as e:
+        print(f"Nie udało się zapisać metadanych cache dla {sciezka_zrodla}: {e}")
+    return sha
+
+def _sciezka_tekstu(sciezka_zrodla, rodzaj):
+    return os.path.join(FOLDER_CACHE_TEKSTOW, f"{odcisk_pliku(sciezka_zrodla)}.{rodzaj}.txt")
+
+def odczytaj_tekst_z_cache(sciezka_zrodla, rodzaj="pelny"):
+    """Zwraca zapisany tekst pliku albo None, jeśli magazyn nie ma aktualnego wpisu."""
+    try:
+        with open(_sciezka_tekstu(sciezka_zrodla, rodzaj), "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def zapisz_tekst_w_cache(sciezka_zrodla, tekst, rodzaj="pelny"):
+    try:
+        _zapisz_atomowo(_sciezka_tekstu(sciezka_zrodla, rodzaj), tekst)
+    except OSError as e:
+        print(f"Nie udało się zapisać tekstu w cache dla {sciezka_zrodla}: {e}")
+
+def pobierz_tekst_z_cache(sciezka_zrodla, ekstraktor, rodzaj="pelny"):
+    """
+    Zwraca tekst pliku z trwałego magazynu na dysku (klucz: ścieżka + rozmiar + mtime + hash treści).
+    Funkcja `ekstraktor(sciezka)` jest wywoływana tylko przy braku trafienia, a jej wynik zapisywany.
+    `rodzaj` rozróżnia różne sposoby ekstrakcji tego samego pliku.
+    """
+    tekst = odczytaj_tekst_z_cache(sciezka_zrodla, rodzaj)
+    if tekst is None:
+        tekst = ekstraktor(sciezka_zrodla)
+        zapisz_tekst_w_cache(sciezka_zrodla, tekst, rodzaj)
+    return tekst
+
+# --- EKSTRAKCJA OPISÓW ZAWODÓW ---
+
+def ekstrahuj_strony_pdf(sciezka_pdf, od=0, do=None, separator="\n"):
+    """Tekst stron [od, do) PDF-a. Zaszyfrowane pliki zwracają pusty tekst."""
+    pelny_tekst = ""
+    with open(sciezka_pdf, "rb") as f:
+        pdf_reader = PdfReader(f)
+        if pdf_reader.is_encrypted:
+            return ""
+        for page in pdf_reader.pages[od:do]:
+            pelny_tekst += (page.extract_text() or "") + separator
+    return pelny_tekst
+
+def _ekstrahuj_tekst_pdf(sciezka_pdf):
+    return ekstrahuj_strony_pdf(sciezka_pdf)
+
+def _ekstrahuj_pdf_bazy(sciezka_pdf):
+    return ekstrahuj_strony_pdf(sciezka_pdf, separator=SEPARATOR_BAZY)
+
+def _nazwa_zawodu_z_pdf(sciezka_pdf):
+    """Odczytuje nazwę zawodu ze strony tytułowej (blok 'INFORMACJA O ZAWODZIE' / nazwa / '(kod )')."""
+    with open(sciezka_pdf, "rb") as f:
+        strona_tytulowa = PdfReader(f).pages[0].extract_text() or ""
+    match = re.search(r"INFORMACJA\s+O\s+ZAWODZIE\s*\n(.+?)\n\s*\(\s*\d{6}\s*\)", strona_tytulowa)
+    return " ".join(match.group(1).split()) if match else None
+
+def _sciezka_pliku_pomocniczego(sciezka_pdf):
+    """Szuka gotowego pliku .txt (np. 242307.txt) obok PDF-a lub w katalogu głównym aplikacji."""
+    kod = os.path.splitext(os.path.basename(sciezka_pdf))[0]
+    for folder in (os.path.dirname(sciezka_pdf), "."):
+        sciezka_txt = os.path.join(folder, f"{kod}.txt")
+        if os.path.isfile(sciezka_txt):
+            return sciezka_txt
+    return None
+
+def _plik_pomocniczy_kompletny(tekst):
+    """Pliki pomocnicze bywają wyciągami (np. tylko rozdział 2) - bez wszystkich sekcji SEKCJE_BHP nie zastępują PDF-a."""
+    sekcje = podziel_opis_na_sekcje(tekst)
+    return all(numer in sekcje for numer in SEKCJE_BHP)
+
+def ekstrahuj_opis_zawodu(sciezka_pdf):
+    """
+    Używa pliku pomocniczego .txt tylko wtedy, gdy dotyczy tego samego zawodu co PDF
+    (porównanie z nazwą ze strony tytułowej) i zawiera wszystkie sekcje SEKCJE_BHP.
+    W przeciwnym razie parsuje cały PDF.
+    """
+    sciezka_txt = _sciezka_pliku_pomocniczego(sciezka_pdf)
+    if sciezka_txt:
+        with open(sciezka_txt, "r", encoding="utf-8") as f:
+            tekst_pomocniczy = f.read()
+        nazwa_zawodu = _nazwa_zawodu_z_pdf(sciezka_pdf)
+        poczatek = " ".join(tekst_pomocniczy[:1000].split()).lower()
+        if not (tekst_pomocniczy.strip() and nazwa_zawodu and nazwa_zawodu.lower() in poczatek):
+            print(f"Plik {sciezka_txt} nie pasuje do {sciezka_pdf} - parsuję PDF.")
+        elif not _plik_pomocniczy_kompletny(tekst_pomocniczy):
+            print(f"Plik {sciezka_txt} nie obejmuje wszystkich sekcji opisu - parsuję PDF.")
+        else:
+            return tekst_pomocniczy
+    return _ekstrahuj_tekst_pdf(sciezka_pdf)
+
+def rodzaj_opisu_zawodu(sciezka_pdf):
+    # Zmiana pliku pomocniczego musi unieważnić wpis, więc jego rozmiar i mtime wchodzą do klucza
+    # (podobnie wersja reguł wyboru pliku - "v2": sprawdzanie kompletności sekcji)
+    sciezka_txt = _sciezka_pliku_pomocniczego(sciezka_pdf)
+    if not sciezka_txt:
+        return "opis"
+    stat = os.stat(sciezka_txt)
+    odcisk = hashlib.sha1(f"{os.path.abspath(sciezka_txt)}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:12]
+    return f"opis-v2-{odcisk}"
 
 @st.cache_data
 def pobierz_opis_zawodu_lokalnie(kod_zawodu):
     sciezka_pliku = os.path.join('baza_zawodow', f'{kod_zawodu}.pdf')
     try:
-        pelny_tekst = ""
-        with open(sciezka_pliku, "rb") as f:
-            pdf_reader = PdfReader(f)
-            for page in pdf_reader.pages:
-                pelny_tekst += (page.extract_text() or "") + "\n"
-        return pelny_tekst
+        return pobierz_tekst_z_cache(sciezka_pliku, ekstrahuj_opis_zawodu, rodzaj_opisu_zawodu(sciezka_pliku))
     except FileNotFoundError:
         return f"Błąd: Brak pliku {kod_zawodu}.pdf w folderze 'baza_zawodow'."
     except Exception as e:
         return f"Błąd odczytu pliku PDF {kod_zawodu}.pdf: {e}"
 
+# --- SEKCJE OPISU ZAWODU (do promptu) ---
+
+# Sekcje standardowego układu "Informacji o zawodzie" potrzebne do szkolenia BHP
+SEKCJE_BHP = {
+    "2.1": "Synteza zawodu",
+    "2.2": "Opis pracy i sposobu jej wykonywania",
+    "2.3": "Środowisko pracy (warunki, maszyny i narzędzia, zagrożenia, organizacja pracy)",
+    "2.4": "Wymagania zdrowotne",
+    "3.1": "Zadania zawodowe"
+}
+
+_WZORZEC_NAGLOWKA = re.compile(r"^\s*(\d)\s*\.\s*(\d)\s*\.\s+(\S.*)$")
+_WZORZEC_SPISU_TRESCI = re.compile(r"(\.\s*){5,}|\.{3,}")
+_WZORZEC_STOPKI = re.compile(r"^\s*INFORMACJA\s+O\s+ZAWODZIE\s+–.*\d{6}\s*$")
+# Indeks przypisu doklejony do słowa, np. "zarządzania19 zasobami"
+_WZORZEC_PRZYPISU = re.compile(r"(?<=[a-ząćęłńóśźż]{2})\d{1,2}(?=[\s,.;:)]|$)")
+
+def podziel_opis_na_sekcje(tekst):
+    """
+    Dzieli tekst opisu zawodu na sekcje wg numeracji "X.Y. Tytuł".
+    Pomija linie spisu treści (z kropkami) i stopki stron; przy powtórzonym numerze wygrywa
+    późniejsze wystąpienie (treść po spisie). Zwraca słownik {numer: {"tytul": ..., "linie": [...]}}.
+    """
+    sekcje = {}
+    biezaca = None
+    po_stopce = False
+    tytul_otwarty = False
+    for linia in tekst.splitlines():
+        if _WZORZEC_STOPKI.match(linia):
+            po_stopce = True
+            continue
+        if po_stopce:
+            # Po stopce PDF dokleja numer strony do pierwszej linii (np. "7 2.5. Wykształcenie...")
+            linia = re.sub(r"^\s*\d{1,2}(\s+|$)", "", linia)
+            po_stopce = False
+        if tytul_otwarty:
+            # Dokończenie zawiniętego tytułu, np. "2.3. Środowisko pracy (warunki ... organizacja" / "pracy)"
+            tytul_otwarty = biezaca["tytul"].count("(") > biezaca["tytul"].count(")") + linia.count(")")
+            biezaca["tytul"] += " " + " ".join(linia.split())
+            continue
+        match = _WZORZEC_NAGLOWKA.match(linia)
+        if match:
+            if _WZORZEC_SPISU_TRESCI.search(linia):
+                biezaca = None
+                continue
+            numer = f"{match.group(1)}.{match.group(2)}"
+            biezaca = {"tytul": " ".join(match.group(3).split()), "linie": []}
+            sekcje[numer] = biezaca
+            tytul_otwarty = biezaca["tytul"].count("(") > biezaca["tytul"].count(")")
+        elif re.match(r"^\s*\d\s*\.\s+[A-ZĄĆĘŁŃÓŚŹŻ\s]{5,}$", linia):
+            # Nagłówek rozdziału (np. "3. ZADANIA ZAWODOWE...") kończy poprzednią sekcję
+            biezaca = None
+        elif biezaca is not None:
+            biezaca["linie"].append(linia)
+    return sekcje
+
+def _oczysc_sekcje(linie, numer):
+    # Samotne numery stron
+    linie = [l for l in linie if not re.fullmatch(r"\s*\d{1,2}\s*", l)]
+    if numer == "2.4":
+        # Z wymagań psychofizycznych do szkolenia potrzebne są tylko wymagania zdrowotne
+        start = next((i for i, l in enumerate(linie) if l.strip().lower().startswith("wymagania zdrowotne")), None)
+        linie = linie[start + 1:] if start is not None else []
+    tekst = "\n".join(l.strip() for l in linie if l.strip())
+    tekst = re.sub(r"^[\uf02d\uf0b7\u2022]\s*", "- ", tekst, flags=re.MULTILINE)
+    # Odsyłacze do innych sekcji ("Więcej informacji znajduje się w sekcji: ...") nic nie wnoszą;
+    # usuwamy też ich krótkie zawinięte zakończenie
+    tekst = re.sub(r"^Więcej\s[^\n]*?sekcj[^\n]*(\n[^\n]{0,60}\.\s*$)?\n?", "", tekst, flags=re.MULTILINE)
+    tekst = _WZORZEC_PRZYPISU.sub("", tekst)
+    tekst = re.sub(r"[ \t]{2,}", " ", tekst)
+    return re.sub(r"\n{2,}", "\n", tekst).strip()
+
+def wyciagnij_sekcje_bhp(tekst):
+    """
+    Zostawia z opisu zawodu tylko sekcje potrzebne do szkolenia BHP (synteza, opis pracy,
+    środowisko i zagrożenia, wymagania zdrowotne, zadania). Bez spisu treści, stopek i przypisów.
+    Jeśli układ nie zostanie rozpoznany, zwraca tekst bez zmian.
+    """
+    sekcje = podziel_opis_na_sekcje(tekst)
+    czesci = []
+    for numer, tytul in SEKCJE_BHP.items():
+        if numer not in sekcje:
+            continue
+        tresc = _oczysc_sekcje(sekcje[numer]["linie"], numer)
+        if tresc:
+            czesci.append(f"{numer}. {tytul}\n{tresc}")
+    if not czesci:
+        return tekst
+    return "\n\n".join(czesci)
+
 @st.cache_data
-def laduj_baze_wiedzy(folder_path='baza_wiedzy_new'):
-    pelny_tekst = ""
+def pobierz_opis_zawodu_do_szkolenia(kod_zawodu):
+    """Opis zawodu przycięty do sekcji istotnych dla BHP (mniejszy prompt)."""
+    opis = pobierz_opis_zawodu_lokalnie(kod_zawodu)
+    if opis.startswith("Błąd"):
+        return opis
+    return wyciagnij_sekcje_bhp(opis)
+
+# --- BAZA WIEDZY (PDF / TXT / DOCX) ---
+
+def _ekstrahuj_txt(sciezka):
+    with open(sciezka, "r", encoding="utf-8") as f:
+        return f.read() + SEPARATOR_BAZY
+
+def _ekstrahuj_docx(sciezka):
+    """Tekst akapitów i tabel w kolejności z dokumentu (wiersze tabel jako 'komórka | komórka')."""
+    doc = Document(sciezka)
+    linie = []
+    for element in doc.element.body.iterchildren():
+        if element.tag.endswith('}p'):
+            linie.append(Paragraph(element, doc).text)
+        elif element.tag.endswith('}tbl'):
+            for wiersz in Table(element, doc).rows:
+                komorki = []
+                for komorka in wiersz.cells:
+                    # Scalone komórki python-docx zwraca wielokrotnie
+                    if not komorki or komorka.text != komorki[-1]:
+                        komorki.append(komorka.text)
+                linie.append(" | ".join(k.strip() for k in komorki))
+    return "\n".join(linie) + SEPARATOR_BAZY
+
+EKSTRAKTORY_BAZY = {
+    '.pdf': _ekstrahuj_pdf_bazy,
+    '.txt': _ekstrahuj_txt,
+    '.docx': _ekstrahuj_docx
+}
+
+def stan_folderu_bazy(folder_path):
+    """Tani odcisk folderu (nazwa, rozmiar, mtime obsługiwanych plików) - zmienia się, gdy plik dodano, usunięto lub zmieniono."""
+    if not os.path.isdir(folder_path):
+        return ()
+    stan = []
+    for wpis in os.scandir(folder_path):
+        if wpis.is_file() and os.path.splitext(wpis.name)[1].lower() in EKSTRAKTORY_BAZY:
+            st_pliku = wpis.stat()
+            stan.append((wpis.name, st_pliku.st_size, st_pliku.st_mtime_ns))
+    return tuple(sorted(stan))
+
+# Teksty dokumentów już wczytanych w tym procesie: {ścieżka: (rozmiar, mtime_ns, odcisk, tekst)}
+_dokumenty_w_pamieci = {}
+_blokada_dokumentow = threading.Lock()
+
+def wczytaj_dokumenty_bazy(folder_path='baza_wiedzy_new'):
+    """
+    Zwraca listę dokumentów bazy wiedzy: [{"nazwa", "tekst", "odcisk"}, ...].
+    Niezmienione pliki (ten sam rozmiar i mtime) są brane z pamięci, a zmienione lub nowe
+    z trwałego magazynu tekstów - ekstrakcja działa tylko dla plików o nowej treści.
+    """
+    dokumenty = []
     if not os.path.isdir(folder_path):
-        return "" 
-    for nazwa_pliku in os.listdir(folder_path):
+        return dokumenty
+    for nazwa_pliku, rozmiar, mtime_ns in stan_folderu_bazy(folder_path):
         sciezka_pliku = os.path.join(folder_path, nazwa_pliku)
+        klucz = os.path.abspath(sciezka_pliku)
+        with _blokada_dokumentow:
+            wpis = _dokumenty_w_pamieci.get(klucz)
+        if not wpis or wpis[:2] != (rozmiar, mtime_ns):
+            try:
+                ekstraktor = EKSTRAKTORY_BAZY[os.path.splitext(nazwa_pliku)[1].lower()]
+                tekst = pobierz_tekst_z_cache(sciezka_pliku, ekstraktor, RODZAJ_BAZY)
+                wpis = (rozmiar, mtime_ns, odcisk_pliku(sciezka_pliku), tekst)
+            except Exception as e:
+                print(f"Błąd pliku {nazwa_pliku}: {e}")
+                continue
+            with _blokada_dokumentow:
+                _dokumenty_w_pamieci[klucz] = wpis
+        dokumenty.append({"nazwa": nazwa_pliku, "tekst": wpis[3], "odcisk": wpis[2]})
+    return dokumenty
+
+@st.cache_data
+def _laduj_baze_wiedzy(folder_path, stan_folderu):
+    return "".join(d["tekst"] for d in wczytaj_dokumenty_bazy(folder_path))
+
+def laduj_baze_wiedzy(folder_path='baza_wiedzy_new'):
+    # Stan folderu w kluczu cache: dodanie/zmiana pliku unieważnia wynik, ale przelicza się tylko ten plik
+    return _laduj_baze_wiedzy(folder_path, stan_folderu_bazy(folder_path))
+
+# --- KATALOG ZAWODÓW (KLASYFIKACJA) ---
+
+_blokada_katalogu = threading.Lock()
+_katalog = None
+
+def normalizuj_tekst(tekst):
+    """Małe litery bez polskich znaków diakrytycznych (np. 'Księgowa' -> 'ksiegowa')."""
+    tekst = tekst.lower().replace("ł", "l")
+    return "".join(z for z in unicodedata.normalize("NFKD", tekst) if not unicodedata.combining(z))
+
+def _etykieta_zawodu(nazwa, kod):
+    return f"{nazwa} ({kod})"
+
+def _wczytaj_plik_klasyfikacji(sciezka):
+    """Czyta CSV z kodami i nazwami zawodów (separator ; , lub tab). Pomija nagłówek i wiersze bez 6-cyfrowego kodu."""
+    with open(sciezka, "r", encoding="utf-8-sig", newline="") as f:
+        probka = f.read(4096)
+        f.seek(0)
         try:
-            if nazwa_pliku.lower().endswith('.pdf'):
-                with open(sciezka_pliku, "rb") as f:
-                    pdf_reader = PdfReader(f)
-                    if pdf_reader.is_encrypted: continue
-                    for page in pdf_reader.pages:
-                         pelny_tekst += (page.extract_text() or "") + "\n\n"
-            elif nazwa_pliku.lower().endswith('.txt'):
-                with open(sciezka_pliku, "r", encoding="utf-8") as f:
-                    pelny_tekst += f.read() + "\n\n"
-        except Exception as e:
-            print(f"Błąd pliku {nazwa_pliku}: {e}")
-    return pelny_tekst
\ No newline at end of file
+            separator = csv.Sniffer().sniff(probka, delimiters=";,\t").delimiter
+        except csv.Error:
+            separator = ";"
+        zawody = {}
+        for wiersz in csv.reader(f, delimiter=separator):
+            if len(wiersz) < 2:
+                continue
+            kod, nazwa = wiersz[0].strip(), " ".join(wiersz[1].split())
+            if re.fullmatch(r"\d{6}", kod) and nazwa:
+                zawody[kod] = nazwa
+    return zawody
+
+def _zbuduj_indeks_katalogu(zawody):
+    kody = sorted(zawody)
+    return {
+        "kody": kody,
+        "nazwy": [zawody[k] for k in kody],
+        "znormalizowane": [normalizuj_tekst(zawody[k]) for k in kody]
+    }
+
+def _przygotuj_katalog(indeks):
+    """Dokłada struktury pomocnicze tylko w pamięci: jeden ciąg do szukania podciągów i offsety wierszy."""
+    offsety, pozycja = [], 0
+    for nazwa in indeks["znormalizowane"]:
+        offsety.append(pozycja)
+        pozycja += len(nazwa) + 1
+    indeks["blob"] = "\n".join(indeks["znormalizowane"])
+    indeks["offsety"] = offsety
+    folder_opisow = "baza_zawodow"
+    pliki = os.listdir(folder_opisow) if os.path.isdir(folder_opisow) else []
+    indeks["z_opisem"] = {os.path.splitext(p)[0] for p in pliki if p.lower().endswith(".pdf")}
+    return indeks
+
+def _indeks_katalogu():
+    """
+    Leniwie ładuje indeks katalogu (raz na proces). Indeks jest budowany z pliku klasyfikacji
+    i zapisywany na dysku pod hashem tego pliku, więc kolejne starty tylko go wczytują.
+    """
+    global _katalog
+    if _katalog is not None:
+        return _katalog
+    with _blokada_katalogu:
+        if _katalog is not None:
+            return _katalog
+        indeks = None
+        if os.path.isfile(PLIK_KLASYFIKACJI):
+            try:
+                sha = odcisk_pliku(PLIK_KLASYFIKACJI)
+                sciezka_indeksu = os.path.join(FOLDER_CACHE, f"katalog_zawodow.{sha}.json")
+                try:
+                    with open(sciezka_indeksu, "r", encoding="utf-8") as f:
+                        indeks = json.load(f)
+                except (OSError, ValueError):
+                    zawody = _wczytaj_plik_klasyfikacji(PLIK_KLASYFIKACJI)
+                    if zawody:
+                        indeks = _zbuduj_indeks_katalogu(zawody)
+                        try:
+                            _zapisz_atomowo(sciezka_indeksu, json.dumps(indeks, ensure_ascii=False, separators=(",", ":")))
+                        except OSError as e:
+                            print(f"Nie udało się zapisać indeksu katalogu: {e}")
+            except Exception as e:
+                print(f"Błąd wczytywania klasyfikacji zawodów: {e}")
+        if not indeks:
+            indeks = _zbuduj_indeks_katalogu(ZAWODY_DOMYSLNE)
+        _katalog = _przygotuj_katalog(indeks)
+    return _katalog
+
+def nazwa_zawodu(kod_zawodu):
+    """Nazwa zawodu z katalogu dla 6-cyfrowego kodu albo None."""
+    indeks = _indeks_katalogu()
+    i = bisect.bisect_left(indeks["kody"], kod_zawodu)
+    if i < len(indeks["kody"]) and indeks["kody"][i] == kod_zawodu:
+        return indeks["nazwy"][i]
+    return None
+
+def ma_opis_zawodu(kod_zawodu):
+    """Czy w 'baza_zawodow' jest PDF z opisem dla tego kodu."""
+    return kod_zawodu in _indeks_katalogu()["z_opisem"]
+
+def szukaj_zawodow(fraza="", limit=50):
+    """
+    Wyszukuje zawody po kodzie (prefiks) lub nazwie (prefiks słowa / podciąg, bez polskich znaków).
+    Zwraca słownik {etykieta: kod} w kolejności trafności, maks. `limit` pozycji.
+    Pusta fraza zwraca najpierw zawody, dla których mamy opis w bazie.
+    """
+    indeks = _indeks_katalogu()
+    kody, nazwy, znormalizowane = indeks["kody"], indeks["nazwy"], indeks["znormalizowane"]
+    fraza_norm = " ".join(normalizuj_tekst(fraza or "").split())
+
+    if not fraza_norm:
+        z_opisem = [i for i, k in enumerate(kody) if k in indeks["z_opisem"]]
+        pozostale = (i for i, k in enumerate(kody) if k not in indeks["z_opisem"])
+        trafienia = z_opisem + [i for _, i in zip(range(max(limit - len(z_opisem), 0)), pozostale)]
+    elif fraza_norm.isdigit():
+        # Kody są posortowane, więc prefiks to ciągły przedział
+        start = bisect.bisect_left(kody, fraza_norm)
+        trafienia = []
+        for i in range(start, len(kody)):
+            if not kody[i].startswith(fraza_norm) or len(trafienia) >= limit:
+                break
+            trafienia.append(i)
+    else:
+        slowa = fraza_norm.split()
+        pierwsze = max(slowa, key=len)
+        # Kandydaci: wystąpienia najdłuższego słowa w jednym ciągu wszystkich nazw
+        kandydaci, blob, offsety = [], indeks["blob"], indeks["offsety"]
+        pozycja = blob.find(pierwsze)
+        while pozycja != -1:
+            i = bisect.bisect_right(offsety, pozycja) - 1
+            kandydaci.append(i)
+            # Przeskok na początek kolejnej nazwy
+            pozycja = blob.find(pierwsze, offsety[i] + len(znormalizowane[i]) + 1)
+        kandydaci = [i for i in kandydaci if all(s in znormalizowane[i] for s in slowa)]
+
+        def ranking(i):
+            nazwa = znormalizowane[i]
+            if nazwa.startswith(fraza_norm):
+                return (0, nazwa)
+            if all(re.search(rf"\b{re.escape(s)}", nazwa) for s in slowa):
+                return (1, nazwa)
+            return (2, nazwa)
+
+        trafienia = sorted(kandydaci, key=ranking)[:limit]
+
+    return {_etykieta_zawodu(nazwy[i], kody[i]): kody[i] for i in trafienia}
@@ -0,0 +1,284 @@
+"""
+Generowanie wsadowe szkoleń dla wielu zawodów i firm naraz (np. cały dział przy przyjęciu):
+
+    python generator_wsadowy.py manifest.csv [--wyjscie wyniki_wsadowe] [--watki 4] [--od-nowa]
+
+Manifest (CSV z separatorem ; lub , albo JSON - lista obiektów) ma kolumny:
+    firma, kod_zawodu, srodowisko, obowiazki
+oraz opcjonalne: nazwa_zawodu, dodatkowe_zagrozenia, uczestnicy ("Imię Nazwisko, DD.MM.RRRR | ..."),
+data_start (DD.MM.RRRR), nr_kursu, miejscowosc, instruktor.
+
+Każdy wiersz daje paczkę ZIP z kompletem dokumentów. Postęp jest zapisywany po każdym wierszu
+w pliku postep.jsonl w folderze wyjściowym - ponowne uruchomienie pomija wiersze już gotowe
+(zmiana treści wiersza w manifeście generuje go od nowa).
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+
+from data_manager import ma_opis_zawodu, nazwa_zawodu, normalizuj_tekst, pobierz_opis_zawodu_do_szkolenia
+from logic_ai import generuj_szkolenie_rownolegle, pytania_kontrolne
+from logic_docs import generuj_dokument_seryjny, generuj_dokument_z_tabela, generuj_docx_prosty, generuj_docx_z_konspektu, generuj_docx_z_markdown
+from utils import rozplanuj_zajecia
+from wyszukiwarka import kontekst_prawny_dla_szkolenia
+
+KOLUMNY_WYMAGANE = ("firma", "kod_zawodu")
+SRODOWISKO_DOMYSLNE = "Biuro"
+PLIK_POSTEPU = "postep.jsonl"
+
+# --- MANIFEST ---
+
+def _wczytaj_csv(sciezka):
+    with open(sciezka, "r", encoding="utf-8-sig", newline="") as f:
+        probka = f.read(4096)
+        f.seek(0)
+        try:
+            separator = csv.Sniffer().sniff(probka, delimiters=";,\t").delimiter
+        except csv.Error:
+            separator = ";"
+        return [dict(w) for w in csv.DictReader(f, delimiter=separator)]
+
+def wczytaj_manifest(sciezka):
+    """
+    Zwraca listę wierszy (słowniki z kolumnami manifestu, wartości jako tekst bez zbędnych spacji).
+    Rzuca ValueError, gdy brakuje wymaganych kolumn albo kod zawodu nie ma 6 cyfr.
+    """
+    if sciezka.lower().endswith(".json"):
+        with open(sciezka, "r", encoding="utf-8") as f:
+            wiersze = json.load(f)
+        if not isinstance(wiersze, list):
+            raise ValueError("Manifest JSON musi być listą obiektów.")
+    else:
+        wiersze = _wczytaj_csv(sciezka)
+
+    wynik = []
+    for nr, wiersz in enumerate(wiersze, 1):
+        wiersz = {str(k).strip().lower(): str(v if v is not None else "").strip() for k, v in wiersz.items() if k}
+        brakujace = [k for k in KOLUMNY_WYMAGANE if not wiersz.get(k)]
+        if brakujace:
+            raise ValueError(f"Wiersz {nr}: brak wartości w kolumnach {', '.join(brakujace)}.")
+        if not re.fullmatch(r"\d{6}", wiersz["kod_zawodu"]):
+            raise ValueError(f"Wiersz {nr}: nieprawidłowy kod zawodu '{wiersz['kod_zawodu']}' (wymagane 6 cyfr).")
+        wynik.append(wiersz)
+    return wynik
+
+def klucz_wiersza(nr, wiersz):
+    """Identyfikator wiersza w pliku postępu: numer + skrót treści."""
+    skrot = hashlib.sha1(json.dumps(wiersz, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:10]
+    return f"{nr:04d}-{skrot}"
+
+def _uczestnicy(tekst, firma, stanowisko):
+    """'Jan Kowalski, 12.05.1985 | Anna Nowak, 20.01.1990' -> lista jak w Kroku 3 aplikacji."""
+    uczestnicy = []
+    # "|" zamiast ";" - średnik bywa separatorem kolumn w CSV
+    for wpis in re.split(r"[|\n]", tekst or ""):
+        czesci = [c.strip() for c in wpis.split(",")]
+        if not czesci[0]:
+            continue
+        uczestnicy.append({
+            'index': len(uczestnicy) + 1, 'imie_nazwisko': czesci[0], 'miejsce_pracy': firma, 'funkcja': stanowisko,
+            'data_urodzenia': czesci[1] if len(czesci) > 1 else '', 'ocena': '', 'uwagi': ''
+        })
+    return uczestnicy
+
+def _data(tekst):
+    try:
+        return datetime.datetime.strptime(tekst, "%d.%m.%Y").date()
+    except (TypeError, ValueError):
+        return datetime.date.today()
+
+# --- JEDEN WIERSZ ---
+
+def _parametry_szkolenia(wiersz):
+    kod = wiersz["kod_zawodu"]
+    stanowisko = wiersz.get("nazwa_zawodu") or nazwa_zawodu(kod) or kod
+    if ma_opis_zawodu(kod):
+        opis_zawodu = pobierz_opis_zawodu_do_szkolenia(kod)
+    else:
+        opis_zawodu = f"Brak oficjalnego opisu w bazie. Stanowisko: {stanowisko}."
+    if opis_zawodu.startswith("Błąd"):
+        raise RuntimeError(opis_zawodu)
+    srodowisko = wiersz.get("srodowisko") or SRODOWISKO_DOMYSLNE
+    obowiazki = wiersz.get("obowiazki", "")
+    zagrozenia = wiersz.get("dodatkowe_zagrozenia", "")
+    return {
+        "firma": wiersz["firma"],
+        "nazwa_zawodu": stanowisko,
+        "opis_zawodu": opis_zawodu,
+        "dodatkowe_zagrozenia": zagrozenia,
+        "obowiazki": obowiazki,
+        "srodowisko": srodowisko,
+        "kontekst_prawny": kontekst_prawny_dla_szkolenia(stanowisko, srodowisko, obowiazki, zagrozenia)
+    }
+
+def _dodaj(zf, nazwa, plik, blad=None):
+    """Dokument do paczki. Brak pliku to błąd całego wiersza - paczka bez dokumentu nie może być "ok"."""
+    if not plik:
+        raise RuntimeError(f"{nazwa}: {blad or 'nie udało się wygenerować dokumentu'}")
+    zf.writestr(nazwa, plik.getvalue())
+
+def pakiet_dokumentow(wiersz, parametry, wyniki):
+    """Komplet dokumentów jednego szkolenia jako bajty ZIP (układ jak paczka z Kroku 3)."""
+    firma, stanowisko = parametry["firma"], parametry["nazwa_zawodu"]
+    data_start = _data(wiersz.get("data_start"))
+    dzis = data_start.strftime("%d.%m.%Y")
+    nr_kursu = wiersz.get("nr_kursu") or "01/BHP"
+    instruktor = wiersz.get("instruktor", "")
+    tematyka = wyniki["tematyka_z_godzinami"]
+    uczestnicy = _uczestnicy(wiersz.get("uczestnicy"), firma, stanowisko)
+
+    bufor = BytesIO()
+    with zipfile.ZipFile(bufor, "w", zipfile.ZIP_DEFLATED) as zf:
+        if wyniki["konspekt"]:
+            _dodaj(zf, "Program_Szkolenia.docx", generuj_docx_z_konspektu(wyniki["konspekt"]))
+        else:
+            _dodaj(zf, "Program_Szkolenia.docx", generuj_docx_z_markdown(wyniki["finalna_tresc"]))
+
+        total_h = sum(float(t.get('godziny', 0)) for t in tematyka)
+        tematyka_display = [{"nazwa": t.get('nazwa', ''), "godziny": t.get('godziny', 0), "praktyka": "0"} for t in tematyka]
+        tematyka_display.append({"nazwa": "RAZEM:", "godziny": f"{total_h:.1f}", "praktyka": "0"})
+        _dodaj(zf, "Tematyka_Szkolenia.docx",
+               *generuj_dokument_z_tabela("tematyka_szablon_uproszczony.docx", {}, tematyka_display, ['nazwa', 'godziny', 'praktyka']))
+
+        zajecia, data_koniec = rozplanuj_zajecia(tematyka, data_start)
+        _dodaj(zf, "Dziennik_Zajec.docx",
+               *generuj_dokument_z_tabela("dziennik_zajec_szablon_uproszczony.docx", {'nazwa_organizatora': firma},
+                                          zajecia, ['data', 'godziny', 'przedmiot', 'temat']))
+
+        # Bez pytań (np. "Błąd." z modelu) - ValueError i wiersz kończy się błędem zamiast pustego dokumentu
+        tresc_pytan = pytania_kontrolne(wyniki["finalna_tresc"])
+        _dodaj(zf, "Pytania_Kontrolne.docx", generuj_docx_prosty(
+            "test_szablon.docx", {'nazwa_szkolenia': f"Pytania kontrolne: {stanowisko}", 'tresc_testu': tresc_pytan}, "Pytania.docx"))
+
+        if uczestnicy:
+            konteksty_kart = [{
+                'nazwa_firmy': firma, 'imie_nazwisko': u['imie_nazwisko'], 'komorka_organizacyjna': u['miejsce_pracy'],
+                'stanowisko': stanowisko, 'dzien_rozpoczecia': dzis, 'instruktor_ogolny': instruktor,
+                'data_stanowiskowego': data_koniec.strftime("%d.%m.%Y"), 'instruktor_stanowiskowy': instruktor
+            } for u in uczestnicy]
+            _dodaj(zf, "Karty_Szkolenia.docx",
+                   *generuj_dokument_seryjny("Wzor-Karta-szkolenia-wstepnego-BHP.docx", konteksty_kart))
+
+            rejestr_dane = [{'numer': f"{nr_kursu}/{i + 1}", 'imie_nazwisko': u['imie_nazwisko'], 'uwagi': ''} for i, u in enumerate(uczestnicy)]
+            context_rej = {
+                'rodzaj_szkolenia': "wstępnego", 'nr_kursu': nr_kursu, 'kierownik_nazwisko': instruktor,
+                'data_wystawienia': data_koniec.strftime("%d.%m.%Y"), 'nazwa_organizatora': firma,
+                'miejsce': wiersz.get("miejscowosc", "")
+            }
+            # Szablon uproszczony ma jedną tabelę (rejestr)
+            _dodaj(zf, "Rejestr_Zaswiadczen.docx", *generuj_dokument_z_tabela(
+                "rejestr_zaswiadczen_szablon_uproszczony.docx", context_rej, rejestr_dane,
+                ['numer', 'imie_nazwisko', 'podpis_dummy', 'uwagi'], index_tabeli=0))
+            _dodaj(zf, "Wykaz_Uczestnikow.docx", *generuj_dokument_z_tabela(
+                "wykaz_uczestnikow_szablon_uproszczony.docx", {}, uczestnicy, ['imie_nazwisko', 'miejsce_pracy', 'funkcja', 'data_urodzenia']))
+
+        zf.writestr("szkolenie.json", json.dumps({
+            "firma": firma, "stanowisko": stanowisko, "kod_zawodu": wiersz["kod_zawodu"],
+            "cel_szkolenia": wyniki["cel_szkolenia"], "tematyka": tematyka, "konspekt": wyniki["konspekt"],
+            "czasy": wyniki["czasy"]
+        }, ensure_ascii=False, indent=2))
+    return bufor.getvalue()
+
+def _nazwa_paczki(klucz, wiersz):
+    firma = re.sub(r"[^a-z0-9]+", "_", normalizuj_tekst(wiersz["firma"])).strip("_")[:40] or "firma"
+    return f"{klucz[:4]}_{firma}_{wiersz['kod_zawodu']}.zip"
+
+def przetworz_wiersz(nr, wiersz, folder_wyjsciowy):
+    """Szkolenie + dokumenty dla jednego wiersza. Zwraca wpis do pliku postępu."""
+    klucz = klucz_wiersza(nr, wiersz)
+    start = time.perf_counter()
+    try:
+        parametry = _parametry_szkolenia(wiersz)
+        wyniki = generuj_szkolenie_rownolegle(**parametry)
+        if "Błąd" in wyniki["finalna_tresc"]:
+            raise RuntimeError(wyniki["finalna_tresc"])
+        dane = pakiet_dokumentow(wiersz, parametry, wyniki)
+
+        sciezka = os.path.join(folder_wyjsciowy, _nazwa_paczki(klucz, wiersz))
+        # Zapis przez plik tymczasowy: przerwany proces nie zostawi uciętej paczki
+        tymczasowy = sciezka + ".tmp"
+        with open(tymczasowy, "wb") as f:
+            f.write(dane)
+        os.replace(tymczasowy, sciezka)
+        return {"klucz": klucz, "status": "ok", "plik": os.path.basename(sciezka), "czas_s": round(time.perf_counter() - start, 2)}
+    except Exception as e:
+        return {"klucz": klucz, "status": "blad", "blad": str(e), "czas_s": round(time.perf_counter() - start, 2)}
+
+# --- CAŁY WSAD ---
+
+def wczytaj_postep(folder_wyjsciowy):
+    """Klucze wierszy zakończonych sukcesem, których paczka nadal istnieje."""
+    sciezka = os.path.join(folder_wyjsciowy, PLIK_POSTEPU)
+    gotowe = set()
+    if not os.path.isfile(sciezka):
+        return gotowe
+    with open(sciezka, "r", encoding="utf-8") as f:
+        for linia in f:
+            try:
+                wpis = json.loads(linia)
+            except ValueError:
+                continue  # ucięta ostatnia linia po przerwaniu
+            if wpis.get("status") == "ok" and os.path.isfile(os.path.join(folder_wyjsciowy, wpis.get("plik", ""))):
+                gotowe.add(wpis["klucz"])
+    return gotowe
+
+def generuj_wsadowo(wiersze, folder_wyjsciowy, watki=4, od_nowa=False, postep=None):
+    """
+    Generuje paczki dla wszystkich wierszy w ograniczonej puli wątków (wywołania modelu i tak
+    przechodzą przez wspólną bramkę limitów). Po każdym wierszu dopisuje wpis do pliku postępu.
+    `postep(wpis, gotowe, razem)` - opcjonalne powiadomienie o każdym zakończonym wierszu.
+    Zwraca statystyki z przepustowością w szkoleniach na godzinę.
+    """
+    os.makedirs(folder_wyjsciowy, exist_ok=True)
+    sciezka_postepu = os.path.join(folder_wyjsciowy, PLIK_POSTEPU)
+    if od_nowa and os.path.isfile(sciezka_postepu):
+        os.remove(sciezka_postepu)
+    gotowe = wczytaj_postep(folder_wyjsciowy)
+    zadania = [(nr, w) for nr, w in enumerate(wiersze, 1) if klucz_wiersza(nr, w) not in gotowe]
+
+    statystyki = {"wiersze": len(wiersze), "pominiete": len(wiersze) - len(zadania), "udane": 0, "bledy": 0}
+    blokada = threading.Lock()
+    start = time.perf_counter()
+    with open(sciezka_postepu, "a", encoding="utf-8") as plik_postepu, ThreadPoolExecutor(max_workers=watki) as pula:
+        futures = [pula.submit(przetworz_wiersz, nr, w, folder_wyjsciowy) for nr, w in zadania]
+        for i, future in enumerate(as_completed(futures), 1):
+            wpis = future.result()
+            with blokada:
+                plik_postepu.write(json.dumps(wpis, ensure_ascii=False) + "\n")
+                plik_postepu.flush()
+                os.fsync(plik_postepu.fileno())
+            statystyki["udane" if wpis["status"] == "ok" else "bledy"] += 1
+            if postep:
+                postep(wpis, i, len(zadania))
+
+    czas = time.perf_counter() - start
+    statystyki["czas_s"] = round(czas, 2)
+    statystyki["szkolenia_na_h"] = round(statystyki["udane"] / czas * 3600, 1) if czas > 0 else 0.0
+    return statystyki
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wsadowe generowanie szkoleń BHP z manifestu CSV/JSON.")
+    parser.add_argument("manifest", help="Plik CSV lub JSON z wierszami (firma, kod_zawodu, srodowisko, obowiazki)")
+    parser.add_argument("--wyjscie", default="wyniki_wsadowe", help="Folder na paczki ZIP i plik postępu")
+    parser.add_argument("--watki", type=int, default=4, help="Ile szkoleń naraz")
+    parser.add_argument("--od-nowa", action="store_true", help="Ignoruj zapisany postęp i generuj wszystko")
+    args = parser.parse_args()
+
+    def _wypisz(wpis, gotowe, razem):
+        opis = wpis.get("plik") or wpis.get("blad")
+        print(f"[{gotowe}/{razem}] {wpis['klucz']} {wpis['status']} ({wpis['czas_s']} s): {opis}")
+
+    statystyki = generuj_wsadowo(wczytaj_manifest(args.manifest), args.wyjscie, args.watki, args.od_nowa, _wypisz)
+    print("-" * 30)
+    print(f"Wiersze: {statystyki['wiersze']} | pominięte (gotowe wcześniej): {statystyki['pominiete']} | "
+          f"udane: {statystyki['udane']} | błędy: {statystyki['bledy']}")
+    print(f"Czas: {statystyki['czas_s']} s ({statystyki['szkolenia_na_h']} szkoleń/h)")
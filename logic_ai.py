@@ -2,19 +2,163 @@ import google.generativeai as genai
 import streamlit as st
 import re
 import json
+import os
+import queue
+import threading
 import time
-
-# Konfiguracja modelu
-MODEL_NAME = 'gemini-2.5-flash' # Możesz tu użyć 1.5-flash, 2.0-flash lub pro
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from cache_llm import klucz_odpowiedzi, odczytaj_odpowiedz, zapisz_odpowiedz
+from bramka_llm import BramkaLLM
+from router_llm import ZADANIE_CIEZKIE, ZADANIE_LEKKIE, RouterLLM, router_jednego_backendu, utworz_router
+from data_manager import normalizuj_tekst
+from wyszukiwarka import kontekst_prawny_dla_szkolenia, tokenizuj
 
 try:
     genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
 except Exception:
     pass 
 
-@st.cache_data
-def generuj_kompletne_szkolenie(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko):
-    model = genai.GenerativeModel(MODEL_NAME)
+# Backend modelu: Gemini albo lokalna zaślepka do testów offline (BHP_LLM_BACKEND=lokalny).
+# Router wybiera model wg rodzaju zadania (z bezpiecznikiem), a każde wywołanie przechodzi przez bramkę
+# danego modelu: limity zapytań/tokenów, limit równoległości, ponowienia.
+_backend = utworz_router(os.environ.get("BHP_LLM_BACKEND", "gemini"))
+
+# Model podstawowy zadań ciężkich (trasy modeli: BHP_MODELE_CIEZKIE / BHP_MODELE_LEKKIE w router_llm)
+MODEL_NAME = _backend.model
+
+def ustaw_backend(backend):
+    """
+    Podmienia backend modelu (np. na BackendLokalny o zadanych parametrach w benchmarku).
+    Backend bez bramki jest w nią owijany, a pojedynczy backend obsługuje wszystkie zadania.
+    """
+    global _backend
+    if not isinstance(backend, RouterLLM):
+        backend = router_jednego_backendu(backend if isinstance(backend, BramkaLLM) else BramkaLLM(backend))
+    _backend = backend
+
+def statystyki_modeli():
+    """Stan bezpieczników i czasy (p95) dla każdej pary zadanie/model."""
+    return _backend.statystyki()
+
+def _konfiguracja(temperatura):
+    return {"temperature": temperatura} if temperatura is not None else None
+
+def _generuj_tekst(prompt, temperatura=None, przetworz=None, zadanie=ZADANIE_CIEZKIE):
+    """
+    Jedno wywołanie modelu przez trwały cache odpowiedzi (cache_llm, SQLite).
+    `przetworz` (np. parsowanie JSON) dostaje surową odpowiedź; jeśli rzuci wyjątek, odpowiedź nie trafia do cache.
+    `zadanie` (ZADANIE_CIEZKIE / ZADANIE_LEKKIE) wybiera trasę modeli w routerze.
+    """
+    konfiguracja = _konfiguracja(temperatura)
+    backend = _backend
+    model = backend.model_zadania(zadanie)
+    klucz = klucz_odpowiedzi(model, prompt, konfiguracja)
+    tekst = odczytaj_odpowiedz(klucz)
+    if tekst is None:
+        tekst = backend.generuj(prompt, konfiguracja, zadanie)
+        wynik = przetworz(tekst) if przetworz else tekst
+        zapisz_odpowiedz(klucz, model, tekst)
+        return wynik
+    return przetworz(tekst) if przetworz else tekst
+
+# Typowe "wstępy", które model dokleja mimo zakazu w prompcie
+SMIECI_NA_POCZATKU = ["Oczywiście", "Oto", "Poniżej", "Jasne", "W odpowiedzi", "Zgoda"]
+
+def _usun_wstep(tekst):
+    """Jeśli tekst zaczyna się od "śmiecia", przycina go do właściwego tytułu."""
+    for smiec in SMIECI_NA_POCZATKU:
+        if tekst.startswith(smiec):
+            # Szukamy pierwszego wystąpienia słowa "SZCZEGÓŁOWY" lub "CZĘŚĆ" lub "#"
+            match = re.search(r"(SZCZEGÓŁOWY|CZĘŚĆ|#)", tekst)
+            if match:
+                tekst = tekst[match.start():]
+            break
+    return tekst
+
+# --- RAMOWY PROGRAM SZKOLENIA (wspólny dla generowania w całości i punkt po punkcie) ---
+
+# CZĘŚĆ I: (tytuł punktu, dopisek w nawiasie)
+PUNKTY_CZESCI_I = [
+    ("Istota bezpieczeństwa i higieny pracy", ""),
+    ("Zakres obowiązków i uprawnień pracodawcy oraz pracowników", ""),
+    ("Odpowiedzialność za naruszenie przepisów lub zasad BHP", ""),
+    ("Zasady poruszania się na terenie zakładu pracy", "uwzględnij środowisko: {srodowisko}"),
+    ("Zagrożenia wypadkowe i zagrożenia dla zdrowia występujące w zakładzie i podstawowe środki zapobiegawcze", ""),
+    ("Podstawowe zasady BHP związane z obsługą urządzeń technicznych oraz transportem wewnątrzzakładowym", ""),
+    ("Zasady przydziału odzieży roboczej i środków ochrony indywidualnej", "w tym okularów korygujących"),
+    ("Porządek i czystość w miejscu pracy", ""),
+    ("Profilaktyczna opieka lekarska", "badania wstępne, okresowe, kontrolne"),
+    ("Podstawowe zasady ochrony przeciwpożarowej oraz postępowania w razie pożaru", ""),
+    ("Postępowanie w razie wypadku i zasady udzielania pierwszej pomocy", ""),
+]
+
+# CZĘŚĆ II: (tytuł bloku, zagadnienia do rozwinięcia)
+BLOKI_CZESCI_II = [
+    ("Przygotowanie pracownika do wykonywania pracy", [
+        "Omówienie warunków pracy (oświetlenie, ogrzewanie, wentylacja w środowisku: {srodowisko}).",
+        "Elementy stanowiska roboczego i ergonomia (prawidłowa regulacja krzesła, ustawienie monitora, podnóżek, klawiatura).",
+    ]),
+    ("Przebieg procesu pracy", [
+        "Omów bezpieczne wykonywanie czynności typowych dla obowiązków: {obowiazki}.",
+        "Praca przy monitorze ekranowym (przerwy w pracy, ćwiczenia oczu).",
+    ]),
+    ("Zagrożenia i czynniki uciążliwe na stanowisku", [
+        "Czynniki fizyczne (np. prąd elektryczny, upadek, potknięcie).",
+        "Czynniki uciążliwe i psychofizyczne (obciążenie układu mięśniowo-szkieletowego, obciążenie wzroku, stres).",
+        "Omówienie ryzyka zawodowego dla tego stanowiska.",
+    ]),
+    ("Sposoby ochrony przed zagrożeniami i postępowanie w sytuacjach awaryjnych", [
+        "Zasady bezpiecznej obsługi sprzętu biurowego (niszczarki, kserokopiarki).",
+        "Postępowanie w razie awarii sprzętu lub zasilania.",
+    ]),
+]
+
+PODSTAWA_PRAWNA = ("Rozporządzenie Ministra Gospodarki i Pracy z dnia 27 lipca 2004 r. w sprawie szkolenia "
+                   "w dziedzinie bezpieczeństwa i higieny pracy (tekst jednolity: Dz.U. 2024 poz. 1327)")
+
+TYTUL_CZESCI_I = "CZĘŚĆ I: INSTRUKTAŻ OGÓLNY"
+TYTUL_CZESCI_II = "CZĘŚĆ II: INSTRUKTAŻ STANOWISKOWY"
+
+_WYTYCZNE_KRYTYCZNE = """
+    WYTYCZNE KRYTYCZNE ("SAFETY RULES"):
+    1. **LICZBY I NORMY:** Nie wymyślaj wartości liczbowych! Jeśli podajesz parametry (np. oświetlenie, dźwiganie), MUSISZ powołać się na konkretną normę (np. "zgodnie z normą PN-EN 12464-1..." lub "zgodnie z Rozporządzeniem w sprawie ręcznych prac transportowych"). Jeśli nie znasz dokładnej wartości, napisz: "parametry zgodne z obowiązującymi normami".
+    2. **PERSONALIZACJA:** W Instruktażu Stanowiskowy UŻYJ konkretnych przykładów z sekcji "Główne obowiązki" i "Dodatkowe zagrożenia".
+    3. **STYLISTYKA:** Używaj punktorów, pogrubień i języka instruktażowego.
+    4. ZAWSZE cytuj podstawy prawne (używaj słów: "zgodnie z art.", "wg normy PN-EN", "Rozporządzenie").
+    5. NIE WPISUJ czasu trwania w godzinach (jest w harmonogramie).
+    6. Styl instruktażowy, konkretny.
+"""
+
+def _tytul_punktu(nr, tytul, dopisek, srodowisko):
+    return f"{nr}. {tytul}" + (f" ({dopisek.format(srodowisko=srodowisko)})" if dopisek else "")
+
+def _zagadnienia_bloku(zagadnienia, srodowisko, obowiazki):
+    return "\n".join(f"       - {z.format(srodowisko=srodowisko, obowiazki=obowiazki)}" for z in zagadnienia)
+
+def _opis_struktury(srodowisko, obowiazki):
+    punkty = "\n".join(f"    {_tytul_punktu(nr, t, d, srodowisko)}." for nr, (t, d) in enumerate(PUNKTY_CZESCI_I, 1))
+    bloki = "\n    \n".join(f"    {litera}. {t}:\n{_zagadnienia_bloku(z, srodowisko, obowiazki)}"
+                            for litera, (t, z) in zip("ABCD", BLOKI_CZESCI_II))
+    return f"""    {TYTUL_CZESCI_I} (Czas trwania: min. 3h lekcyjne)
+    Rozwiń merytorycznie każdy z poniższych punktów ramowych:
+{punkty}
+
+    {TYTUL_CZESCI_II} (Czas trwania: min. 2h lekcyjne)
+    Skup się na specyfice pracy biurowej i ergonomii. Rozwiń następujące punkty:
+{bloki}"""
+
+def _sekcja_przepisow(kontekst_prawny):
+    # Fragmenty przepisów wybrane z bazy wiedzy (wyszukiwarka BM25) - tylko kilka KB zamiast całej bazy
+    if not kontekst_prawny:
+        return ""
+    return f"""
+    FRAGMENTY PRZEPISÓW Z BAZY WIEDZY (powołuj się na nie, jeśli dotyczą danego punktu):
+    {kontekst_prawny}
+    """
+
+def _prompt_kompletnego_szkolenia(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny=""):
+    sekcja_przepisow = _sekcja_przepisow(kontekst_prawny)
     
     prompt = f"""
     Jesteś ekspertem BHP i doświadczonym metodykiem. Twoim zadaniem jest stworzenie KOMPLETNEGO PROGRAMU SZKOLENIA WSTĘPNEGO (Instruktaż Ogólny i Stanowiskowy) dla stanowiska '{nazwa_zawodu}' w firmie '{firma}'.
@@ -27,50 +171,12 @@ def generuj_kompletne_szkolenie(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagr
 
     WYMAGANIA PRAWNE:
     Opieraj się na Rozporządzeniu Ministra Gospodarki i Pracy z dnia 27 lipca 2004 r. w sprawie szkolenia w dziedzinie bezpieczeństwa i higieny pracy (tekst jednolity: Dz.U. 2024 poz. 1327).
+    {sekcja_przepisow}
 
     NIE WPISUJ w treści czasu trwania (np. "3 godziny"), ponieważ jest on ustalany w oddzielnym harmonogramie.
     STRUKTURA (Obowiązkowa):
-    CZĘŚĆ I: INSTRUKTAŻ OGÓLNY (Czas trwania: min. 3h lekcyjne)
-    Rozwiń merytorycznie każdy z poniższych punktów ramowych:
-    1. Istota bezpieczeństwa i higieny pracy.
-    2. Zakres obowiązków i uprawnień pracodawcy oraz pracowników.
-    3. Odpowiedzialność za naruszenie przepisów lub zasad BHP.
-    4. Zasady poruszania się na terenie zakładu pracy (uwzględnij środowisko: {srodowisko}).
-    5. Zagrożenia wypadkowe i zagrożenia dla zdrowia występujące w zakładzie i podstawowe środki zapobiegawcze.
-    6. Podstawowe zasady BHP związane z obsługą urządzeń technicznych oraz transportem wewnątrzzakładowym.
-    7. Zasady przydziału odzieży roboczej i środków ochrony indywidualnej (w tym okularów korygujących).
-    8. Porządek i czystość w miejscu pracy.
-    9. Profilaktyczna opieka lekarska (badania wstępne, okresowe, kontrolne).
-    10. Podstawowe zasady ochrony przeciwpożarowej oraz postępowania w razie pożaru.
-    11. Postępowanie w razie wypadku i zasady udzielania pierwszej pomocy.
-
-    CZĘŚĆ II: INSTRUKTAŻ STANOWISKOWY (Czas trwania: min. 2h lekcyjne)
-    Skup się na specyfice pracy biurowej i ergonomii. Rozwiń następujące punkty:
-    A. Przygotowanie pracownika do wykonywania pracy:
-       - Omówienie warunków pracy (oświetlenie, ogrzewanie, wentylacja w środowisku: {srodowisko}).
-       - Elementy stanowiska roboczego i ergonomia (prawidłowa regulacja krzesła, ustawienie monitora, podnóżek, klawiatura).
-    
-    B. Przebieg procesu pracy:
-       - Omów bezpieczne wykonywanie czynności typowych dla obowiązków: {obowiazki}.
-       - Praca przy monitorze ekranowym (przerwy w pracy, ćwiczenia oczu).
-    
-    C. Zagrożenia i czynniki uciążliwe na stanowisku:
-       - Czynniki fizyczne (np. prąd elektryczny, upadek, potknięcie).
-       - Czynniki uciążliwe i psychofizyczne (obciążenie układu mięśniowo-szkieletowego, obciążenie wzroku, stres).
-       - Omówienie ryzyka zawodowego dla tego stanowiska.
-    
-    D. Sposoby ochrony przed zagrożeniami i postępowanie w sytuacjach awaryjnych:
-       - Zasady bezpiecznej obsługi sprzętu biurowego (niszczarki, kserokopiarki).
-       - Postępowanie w razie awarii sprzętu lub zasilania.
-
-    WYTYCZNE KRYTYCZNE ("SAFETY RULES"):
-    1. **LICZBY I NORMY:** Nie wymyślaj wartości liczbowych! Jeśli podajesz parametry (np. oświetlenie, dźwiganie), MUSISZ powołać się na konkretną normę (np. "zgodnie z normą PN-EN 12464-1..." lub "zgodnie z Rozporządzeniem w sprawie ręcznych prac transportowych"). Jeśli nie znasz dokładnej wartości, napisz: "parametry zgodne z obowiązującymi normami".
-    2. **PERSONALIZACJA:** W Instruktażu Stanowiskowy UŻYJ konkretnych przykładów z sekcji "Główne obowiązki" i "Dodatkowe zagrożenia".
-    3. **STYLISTYKA:** Używaj punktorów, pogrubień i języka instruktażowego.
-    4. ZAWSZE cytuj podstawy prawne (używaj słów: "zgodnie z art.", "wg normy PN-EN", "Rozporządzenie").
-    5. NIE WPISUJ czasu trwania w godzinach (jest w harmonogramie).
-    6. Styl instruktażowy, konkretny.
-
+{_opis_struktury(srodowisko, obowiazki)}
+{_WYTYCZNE_KRYTYCZNE}
     FORMATOWANIE KOŃCOWE (BARDZO WAŻNE):
     1. Nie używaj ŻADNYCH wstępów typu "Oczywiście", "Oto szkolenie", "Poniżej znajduje się...".
     2. Zacznij tekst BEZPOŚREDNIO od nagłówka tytułowego (SZCZEGÓŁOWY PROGRAM...).
@@ -79,35 +185,376 @@ def generuj_kompletne_szkolenie(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagr
 
     Stwórz teraz kompletny, profesjonalny materiał szkoleniowy.
     """
+    return prompt
+
+def generuj_kompletne_szkolenie(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny=""):
+    if TRYB_GENEROWANIA == "sekcje":
+        try:
+            return "".join(_strumien_sekcji(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny)).strip()
+        except Exception as e:
+            st.error(f"Błąd API: {e}")
+            return "Błąd generowania treści."
+
+    prompt = _prompt_kompletnego_szkolenia(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny)
     
     try:
-        response = model.generate_content(prompt, generation_config=genai.types.GenerationConfig(temperature=0.3))
+        tekst = _generuj_tekst(prompt, temperatura=0.3)
         # Dodatkowe zabezpieczenie w Pythonie - usuwamy ewentualny wstęp, jeśli model nie posłucha
-        tekst = response.text.strip()
-        smieci_na_poczatku = ["Oczywiście", "Oto", "Poniżej", "Jasne", "W odpowiedzi", "Zgoda"]
-        
-        # Jeśli tekst zaczyna się od "śmiecia", szukamy właściwego tytułu
-        for smiec in smieci_na_poczatku:
-            if tekst.startswith(smiec):
-                # Szukamy pierwszego wystąpienia słowa "SZCZEGÓŁOWY" lub "CZĘŚĆ" lub "#"
-                match = re.search(r"(SZCZEGÓŁOWY|CZĘŚĆ|#)", tekst)
-                if match:
-                    tekst = tekst[match.start():]
-                break
-                
-        return tekst
+        return _usun_wstep(tekst.strip())
     except Exception as e:
         st.error(f"Błąd API: {e}")
         return "Błąd generowania treści."
-    
-@st.cache_data
-def koryguj_tresc_szkolenia(stara_tresc, uwagi_uzytkownika):
+
+def generuj_kompletne_szkolenie_strumieniowo(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny=""):
     """
-    Pozwala użytkownikowi zmienić fragment szkolenia bez generowania całości od nowa.
-    Wersja WZMOCNIONA - wymusza edycję konkretnych sekcji.
+    Generator fragmentów programu szkolenia (do st.write_stream), w miarę jak model je produkuje.
+    Wstęp typu "Oczywiście, oto..." jest wycinany już na strumieniu: początek jest buforowany tylko
+    do momentu, gdy wiadomo, czy to "śmieć". Złączone fragmenty (po .strip()) dają ten sam tekst,
+    co generuj_kompletne_szkolenie. Odpowiedź z cache jest oddawana od razu, w całości.
+    W trybie "sekcje" kolejne punkty pojawiają się w kolejności programu, gdy tylko są gotowe.
     """
-    model = genai.GenerativeModel(MODEL_NAME)
+    if TRYB_GENEROWANIA == "sekcje":
+        try:
+            yield from _strumien_sekcji(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny)
+        except Exception as e:
+            st.error(f"Błąd API: {e}")
+            yield "\n\nBłąd generowania treści."
+        return
+
+    prompt = _prompt_kompletnego_szkolenia(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny)
+    backend = _backend
+    model = backend.model_zadania(ZADANIE_CIEZKIE)
+    klucz = klucz_odpowiedzi(model, prompt, _konfiguracja(0.3))
+    zapisana = odczytaj_odpowiedz(klucz)
+    if zapisana is not None:
+        yield _usun_wstep(zapisana.strip())
+        return
+
+    try:
+        bufor = ""
+        poczatek_gotowy = False
+        surowe = []
+        # Strumień modelu czyta wątek z puli: odczekanie bramki po błędzie nie wstrzymuje wątku skryptu
+        for fragment in strumien_w_tle(backend.generuj_strumien, prompt, _konfiguracja(0.3), ZADANIE_CIEZKIE):
+            surowe.append(fragment)
+            if poczatek_gotowy:
+                yield fragment
+                continue
+
+            bufor += fragment
+            poczatek = bufor.lstrip()
+            if any(smiec.startswith(poczatek) for smiec in SMIECI_NA_POCZATKU):
+                continue  # Za mało tekstu, żeby rozstrzygnąć (np. "Ocz")
+            if any(poczatek.startswith(smiec) for smiec in SMIECI_NA_POCZATKU):
+                if not re.search(r"(SZCZEGÓŁOWY|CZĘŚĆ|#)", poczatek):
+                    continue  # Jest wstęp, czekamy na właściwy tytuł
+            poczatek_gotowy = True
+            yield _usun_wstep(poczatek)
+
+        if not poczatek_gotowy and bufor:
+            # Strumień się skończył, a tytułu nie było - zostawiamy tekst bez zmian (jak w wersji blokującej)
+            yield bufor.lstrip()
+        # Ten sam klucz co w generuj_kompletne_szkolenie - kolejne wywołanie nie pójdzie już do API
+        zapisz_odpowiedz(klucz, model, "".join(surowe))
+    except Exception as e:
+        st.error(f"Błąd API: {e}")
+        yield "Błąd generowania treści."
     
+# --- GENEROWANIE PUNKT PO PUNKCIE ---
+
+# "sekcje" - każdy punkt/blok programu osobnym wywołaniem, równolegle; "calosc" - jeden prompt na cały program
+TRYB_GENEROWANIA = os.environ.get("BHP_TRYB_GENEROWANIA", "sekcje")
+
+# Osobna, ograniczona pula: punkty na nic nie czekają, więc nie zablokują wątków orkiestracji
+MAKS_SEKCJI_NARAZ = int(os.environ.get("BHP_SEKCJE_NARAZ", "6"))
+_pula_sekcji = ThreadPoolExecutor(max_workers=MAKS_SEKCJI_NARAZ, thread_name_prefix="sekcja")
+
+def _naglowek_instruktazu_ogolnego(firma, srodowisko, kontekst_prawny=""):
+    """
+    Kontekst punktów CZĘŚCI I. Celowo bez danych stanowiska: prompt (a więc i wpis w cache odpowiedzi)
+    jest ten sam dla wszystkich zawodów w danej firmie i środowisku pracy.
+    """
+    return f"""
+    Jesteś ekspertem BHP i doświadczonym metodykiem. Przygotowujesz INSTRUKTAŻ OGÓLNY (CZĘŚĆ I programu szkolenia wstępnego) dla pracowników firmy '{firma}'.
+    Ta część jest wspólna dla wszystkich stanowisk w firmie - nie odwołuj się do konkretnego zawodu.
+    Program powstaje punkt po punkcie - w tej odpowiedzi piszesz tylko jeden punkt.
+
+    DANE DO PERSONALIZACJI:
+    - Środowisko pracy: {srodowisko}
+
+    WYMAGANIA PRAWNE:
+    Opieraj się na: {PODSTAWA_PRAWNA}.
+    {_sekcja_przepisow(kontekst_prawny)}
+    {_WYTYCZNE_KRYTYCZNE}
+    """
+
+def _wspolny_naglowek_sekcji(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny=""):
+    """Kontekst wspólny dla wszystkich punktów CZĘŚCI II - każdy prompt bloku zaczyna się tak samo."""
+    return f"""
+    Jesteś ekspertem BHP i doświadczonym metodykiem. Przygotowujesz PROGRAM SZKOLENIA WSTĘPNEGO (Instruktaż Ogólny i Stanowiskowy) dla stanowiska '{nazwa_zawodu}' w firmie '{firma}'.
+    Program powstaje punkt po punkcie - w tej odpowiedzi piszesz tylko jeden punkt.
+
+    DANE DO PERSONALIZACJI:
+    - Opis zawodu (Baza): {opis_zawodu}
+    - Główne obowiązki: {obowiazki}
+    - Środowisko pracy: {srodowisko}
+    - Dodatkowe zagrożenia: {dodatkowe_zagrozenia}
+
+    WYMAGANIA PRAWNE:
+    Opieraj się na: {PODSTAWA_PRAWNA}.
+    {_sekcja_przepisow(kontekst_prawny)}
+    {_WYTYCZNE_KRYTYCZNE}
+    """
+
+def _plan_czesci_i(srodowisko):
+    """Lista (tytuł, zadanie) punktów CZĘŚCI I, w kolejności programu."""
+    return [(f"{nr}. {tytul}", f"Rozwiń merytorycznie punkt ramowy: {_tytul_punktu(nr, tytul, dopisek, srodowisko)}.")
+            for nr, (tytul, dopisek) in enumerate(PUNKTY_CZESCI_I, 1)]
+
+def _plan_czesci_ii(srodowisko, obowiazki):
+    """Lista (tytuł, zadanie) bloków CZĘŚCI II, w kolejności programu."""
+    return [(f"{litera}. {tytul}", "Skup się na specyfice pracy biurowej i ergonomii. Rozwiń zagadnienia:\n"
+             + _zagadnienia_bloku(zagadnienia, srodowisko, obowiazki))
+            for litera, (tytul, zagadnienia) in zip("ABCD", BLOKI_CZESCI_II)]
+
+def _prompt_sekcji(naglowek_wspolny, czesc, tytul, zadanie):
+    return f"""{naglowek_wspolny}
+    NAPISZ WYŁĄCZNIE PUNKT: "{tytul}" ({TYTUL_CZESCI_I if czesc == "I" else TYTUL_CZESCI_II}).
+    {zadanie}
+
+    FORMATOWANIE:
+    1. Zacznij BEZPOŚREDNIO od nagłówka "### {tytul}" - bez wstępów typu "Oczywiście", "Oto".
+    2. Nie pisz innych punktów programu ani podsumowania całości (powstają osobno).
+    3. Styl: Język urzędowy, instruktażowy ("Pracownik ma obowiązek...", "Zabrania się..."). Pogrubienia dla kluczowych terminów.
+    """
+
+def _sekcja_z_odpowiedzi(odpowiedz, tytul):
+    tekst = _oczysc_fragment(odpowiedz, tytul)
+    if not tekst:
+        raise ValueError("Pusta odpowiedź")
+    if not _bez_formatowania(tekst).startswith(tytul[:12]):
+        tekst = f"### {tytul}\n\n{tekst}"
+    return tekst
+
+def _generuj_sekcje(prompt, tytul, max_proby=3):
+    """
+    Jeden punkt programu. Błędy API ponawia bramka (z opóźnieniem); tu ponawiamy od razu
+    tylko bezużyteczną odpowiedź (pustą). Przy błędzie powtarzany jest wyłącznie ten punkt.
+    """
+    for proba in range(max_proby):
+        try:
+            return _generuj_tekst(prompt, temperatura=0.3, przetworz=lambda t: _sekcja_z_odpowiedzi(t, tytul))
+        except ValueError as e:
+            blad = e
+        except Exception as e:
+            raise RuntimeError(f"Punkt '{tytul}': {e}") from e
+    raise RuntimeError(f"Punkt '{tytul}': {blad}")
+
+# Punkty w trakcie generowania, wg klucza promptu. Kilka szkoleń tej samej firmy naraz (np. zadanie wsadowe)
+# czeka na jedno wywołanie CZĘŚCI I zamiast zlecać własne, zanim pierwsze trafi do cache.
+_sekcje_w_toku = {}
+_blokada_sekcji = threading.Lock()
+
+def _zlec_sekcje(prompt, tytul):
+    klucz = klucz_odpowiedzi(_backend.model_zadania(ZADANIE_CIEZKIE), prompt, _konfiguracja(0.3))
+    with _blokada_sekcji:
+        przyszly = _sekcje_w_toku.get(klucz)
+        if przyszly is None:
+            przyszly = _pula_sekcji.submit(_generuj_sekcje, prompt, tytul)
+            _sekcje_w_toku[klucz] = przyszly
+            przyszly.add_done_callback(lambda _: _sekcje_w_toku.pop(klucz, None))
+        return przyszly
+
+def _zlec_instruktaz_ogolny(firma, srodowisko):
+    """
+    Zleca punkty CZĘŚCI I - zależą tylko od firmy i środowiska pracy (nie od zawodu).
+    Kontekst prawny wywołującego (zapytanie z nazwą zawodu, obowiązkami i zagrożeniami) celowo tu nie trafia:
+    dałby każdemu zawodowi inne prompty, a więc osobne wywołania i wpisy w cache. Trafia do bloków CZĘŚCI II.
+    """
+    # Przepisy ogólne (bez nazwy zawodu), żeby prompt był identyczny dla wszystkich stanowisk
+    kontekst_prawny = kontekst_prawny_dla_szkolenia("", srodowisko)
+    naglowek = _naglowek_instruktazu_ogolnego(firma, srodowisko, kontekst_prawny)
+    return [_zlec_sekcje(_prompt_sekcji(naglowek, "I", tytul, zadanie), tytul) for tytul, zadanie in _plan_czesci_i(srodowisko)]
+
+def generuj_instruktaz_ogolny(firma, srodowisko):
+    """
+    CZĘŚĆ I programu dla firmy i środowiska pracy. Wynik jest wspólny dla wszystkich zawodów:
+    przy kolejnych stanowiskach punkty przychodzą z cache odpowiedzi.
+    """
+    return "\n\n".join(przyszly.result() for przyszly in _zlec_instruktaz_ogolny(firma, srodowisko))
+
+def _strumien_sekcji(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny=""):
+    """
+    Zleca wszystkie punkty naraz (CZĘŚĆ I: 1-11, CZĘŚĆ II: A-D) i oddaje je w kolejności programu.
+    Czas całości ~ najwolniejszy punkt, a nie suma. Gotowe punkty trafiają do cache odpowiedzi,
+    więc ponowne wywołanie po błędzie generuje tylko brakujące. CZĘŚĆ I jest wspólna dla firmy
+    i środowiska (generuj_instruktaz_ogolny), dla zawodu powstaje tylko CZĘŚĆ II.
+    """
+    naglowek = _wspolny_naglowek_sekcji(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny)
+    zadania = [("I", przyszly) for przyszly in _zlec_instruktaz_ogolny(firma, srodowisko)]
+    zadania += [("II", _zlec_sekcje(_prompt_sekcji(naglowek, "II", tytul, zadanie), tytul))
+                for tytul, zadanie in _plan_czesci_ii(srodowisko, obowiazki)]
+    # Bez anulowania przy błędzie: pozostałe punkty dokończą się i trafią do cache (mogą też czekać na nie inne szkolenia)
+    yield (f"# SZCZEGÓŁOWY PROGRAM SZKOLENIA WSTĘPNEGO BHP\n\n**Stanowisko:** {nazwa_zawodu}  \n**Firma:** {firma}  \n"
+           f"**Podstawa prawna:** {PODSTAWA_PRAWNA}")
+    biezaca_czesc = None
+    for czesc, przyszly in zadania:
+        if czesc != biezaca_czesc:
+            biezaca_czesc = czesc
+            yield f"\n\n## {TYTUL_CZESCI_I if czesc == 'I' else TYTUL_CZESCI_II}"
+        yield f"\n\n{przyszly.result()}"
+
+# --- KOREKTA TREŚCI ---
+
+_WZORZEC_CZESCI = re.compile(r"^CZ[ĘE]ŚĆ\s+([IV]+|[1-5])\b", re.IGNORECASE)
+# Model pisze czasem "CZĘŚĆ 2" - oznaczenie części jest zawsze rzymskie
+_CZESCI_ARABSKIE = {"1": "I", "2": "II", "3": "III", "4": "IV", "5": "V"}
+_WZORZEC_PUNKTU = re.compile(r"^(\d{1,2})\.\s")
+_WZORZEC_BLOKU = re.compile(r"^([A-H])\.\s")
+
+def _naglowek_linii(linia):
+    """Zwraca (tekst nagłówka bez #/*, czy_wyrozniony) albo ("", False) dla linii wciętych."""
+    if linia[:1] in (" ", "\t"):
+        return "", False
+    surowa = linia.strip()
+    naglowek = surowa.lstrip("#*").strip()
+    wyrozniony = surowa.startswith(("#", "**")) or bool(re.match(r"^(\d{1,2}|[A-H])\.\s+\*\*", naglowek))
+    return naglowek, wyrozniony
+
+def podziel_program_na_sekcje(tresc):
+    """
+    Dzieli program szkolenia na sekcje: wstęp, nagłówki CZĘŚĆ I/II, punkty 1..11 i bloki A..D.
+    Jeśli dokument wyróżnia punkty (nagłówek # albo pogrubienie), liczą się tylko wyróżnione linie
+    o rosnącym numerze; w przeciwnym razie tylko kolejny numer w sekwencji. Dzięki temu
+    wypunktowania "1. 2. 3." wewnątrz punktu zostają w jego treści.
+    Zwraca listę słowników: tytul, czesc, oznaczenie, poczatek, koniec (pozycje znaków w tresc) i tekst.
+    """
+    linie = tresc.splitlines(keepends=True)
+    naglowki = [_naglowek_linii(linia) for linia in linie]
+    # Osobno dla punktów i bloków (model potrafi pogrubić tylko jedne z nich)
+    wyroznione_punkty = any(w and _WZORZEC_PUNKTU.match(n) for n, w in naglowki)
+    wyroznione_bloki = any(w and _WZORZEC_BLOKU.match(n) for n, w in naglowki)
+
+    sekcje = []
+    pozycja = 0
+    czesc, ostatni_numer, ostatnia_litera = None, 0, "@"
+    for linia, (naglowek, wyrozniony) in zip(linie, naglowki):
+        oznaczenie = None
+        m_czesc = _WZORZEC_CZESCI.match(naglowek)
+        m_punkt = _WZORZEC_PUNKTU.match(naglowek)
+        m_blok = _WZORZEC_BLOKU.match(naglowek)
+        if m_czesc:
+            czesc = _CZESCI_ARABSKIE.get(m_czesc.group(1), m_czesc.group(1).upper())
+            oznaczenie = f"CZĘŚĆ {czesc}"
+            ostatni_numer, ostatnia_litera = 0, "@"
+        elif m_punkt and (int(m_punkt.group(1)) > ostatni_numer and wyrozniony if wyroznione_punkty
+                          else int(m_punkt.group(1)) == ostatni_numer + 1):
+            oznaczenie = m_punkt.group(1)
+            ostatni_numer = int(oznaczenie)
+        elif m_blok and (m_blok.group(1) > ostatnia_litera and wyrozniony if wyroznione_bloki
+                         else ord(m_blok.group(1)) == ord(ostatnia_litera) + 1):
+            oznaczenie = m_blok.group(1)
+            ostatnia_litera = oznaczenie
+
+        if oznaczenie or not sekcje:
+            if sekcje:
+                sekcje[-1]["koniec"] = pozycja
+            sekcje.append({"tytul": linia.strip(), "czesc": czesc, "oznaczenie": oznaczenie, "poczatek": pozycja, "koniec": None})
+        pozycja += len(linia)
+    if sekcje:
+        sekcje[-1]["koniec"] = pozycja
+    for sekcja in sekcje:
+        sekcja["tekst"] = tresc[sekcja["poczatek"]:sekcja["koniec"]]
+    return sekcje
+
+# Słowa samego polecenia - nie mówią nic o tym, której sekcji ono dotyczy
+_SLOWA_POLECEN = set(tokenizuj(
+    "dodaj dopisz usuń zmień popraw napisz rozbuduj skróć uzupełnij więcej mniej punkt punkcie sekcja sekcji "
+    "fragment informację informacje proszę należy także również tekst treść szkolenie szkolenia coś czegoś jakieś "
+    "numer nr"
+))
+
+def znajdz_sekcje_do_korekty(sekcje, uwagi_uzytkownika):
+    """
+    Wybiera sekcję, której dotyczy polecenie: najpierw jawne odwołanie ("punkt 5", "blok B", "część II"),
+    potem najlepsze dopasowanie słów polecenia do tytułów i treści. None = dotyczy całości lub niejednoznaczne.
+    """
+    uwagi = normalizuj_tekst(uwagi_uzytkownika)
+    if re.search(r"\b(caly|calym|calej|calosc\w*|wszystk\w*)\b", uwagi):
+        return None
+
+    m_czesc = re.search(r"\bczes\w*\s+(ii|i|2|1)\b", uwagi)
+    czesc = {"i": "I", "1": "I", "ii": "II", "2": "II"}[m_czesc.group(1)] if m_czesc else None
+    # "punk\w*" - także odmiana "punkcie"; opcjonalnie "nr"/"numer" przed oznaczeniem
+    m_odwolanie = re.search(r"\b(?:punk\w*|pkt\.?|blok\w*|sekcj\w*|podpunk\w*|temat\w*)\s*(?:(?:nr|numer\w*)\.?\s*)?(\d{1,2}|[a-h])\b", uwagi)
+    if m_odwolanie:
+        oznaczenie = m_odwolanie.group(1).upper()
+        for sekcja in sekcje:
+            if sekcja["oznaczenie"] == oznaczenie and (czesc is None or sekcja["czesc"] == czesc):
+                return sekcja
+
+    slowa = set(tokenizuj(uwagi_uzytkownika)) - _SLOWA_POLECEN
+    kandydaci = []
+    for sekcja in sekcje:
+        if not sekcja["oznaczenie"] or sekcja["oznaczenie"].startswith("CZĘŚĆ"):
+            continue
+        if czesc and sekcja["czesc"] != czesc:
+            continue
+        kandydaci.append((sekcja, set(tokenizuj(sekcja["tytul"])), set(tokenizuj(sekcja["tekst"]))))
+    # Waga słowa = 1 / liczba sekcji, w których występuje: jedno wyróżniające słowo wystarcza do wyboru,
+    # a słowa obecne wszędzie (np. "pracownik") prawie nie liczą się do wyniku
+    wystapienia = {s: sum(1 for _, tytul, tekst in kandydaci if s in tytul or s in tekst) for s in slowa}
+    wyniki = []
+    for sekcja, tytul, tekst in kandydaci:
+        wynik = sum((3 * (s in tytul) + (s in tekst)) / wystapienia[s] for s in slowa if wystapienia[s])
+        wyniki.append((wynik, sekcja))
+    wyniki.sort(key=lambda x: x[0], reverse=True)
+    if not wyniki or wyniki[0][0] == 0 or (len(wyniki) > 1 and wyniki[0][0] == wyniki[1][0]):
+        return None
+    return wyniki[0][1]
+
+def _bez_formatowania(linia):
+    return linia.replace("*", "").lstrip("#").strip()
+
+def _oczysc_fragment(odpowiedz, tytul):
+    """Usuwa z odpowiedzi bloki ``` i ewentualny wstęp przed nagłówkiem poprawianego fragmentu."""
+    tekst = re.sub(r"^```\w*\n|\n?```$", "", odpowiedz.strip()).strip()
+    poczatek_tytulu = _bez_formatowania(tytul)[:12]
+    if poczatek_tytulu and not _bez_formatowania(tekst).startswith(poczatek_tytulu):
+        for m in re.finditer(r"^.*$", tekst, re.MULTILINE):
+            if _bez_formatowania(m.group(0)).startswith(poczatek_tytulu):
+                return tekst[m.start():]
+    return tekst
+
+def _koryguj_sekcje(stara_tresc, sekcje, sekcja, uwagi_uzytkownika):
+    fragment = stara_tresc[sekcja["poczatek"]:sekcja["koniec"]]
+    spis = "\n".join(s["tytul"] for s in sekcje if s["oznaczenie"])
+    prompt = f"""
+    Jesteś precyzyjnym Edytorem Dokumentacji BHP.
+    Poprawiasz JEDEN fragment programu szkolenia DOKŁADNIE według instrukcji użytkownika.
+
+    INSTRUKCJA UŻYTKOWNIKA: "{uwagi_uzytkownika}"
+
+    SPIS CAŁEGO DOKUMENTU (tylko kontekst - nie przepisuj go):
+    {spis}
+
+    ZASADY EDYCJI (PRZESTRZEGAJ BEZWZGLĘDNIE):
+    1. AKCJA: Wykonaj polecenie (DODAJ treść, USUŃ treść lub ZMIEŃ treść) w obrębie fragmentu. Resztę fragmentu zostaw bez zmian.
+    2. ZAKRES: Zwróć WYŁĄCZNIE poprawiony fragment, zaczynając od jego nagłówka ("{sekcja['tytul']}"). Nie dopisuj innych punktów spisu.
+    3. FORMATOWANIE: Zachowaj nagłówki, numerację, wypunktowania i pogrubienia (Markdown).
+    4. Bez wstępów i komentarzy typu "Oto poprawiony fragment".
+
+    FRAGMENT DO EDYCJI:
+    {fragment}
+    """
+    nowy = _oczysc_fragment(_generuj_tekst(prompt, temperatura=0.4), sekcja["tytul"])
+    if not nowy:
+        raise ValueError("Model zwrócił pusty fragment")
+    # Zachowujemy odstęp po fragmencie, żeby kolejny nagłówek nie skleił się z tekstem
+    odstep = fragment[len(fragment.rstrip()):] or ("\n\n" if sekcja["koniec"] < len(stara_tresc) else "")
+    return stara_tresc[:sekcja["poczatek"]] + nowy + odstep + stara_tresc[sekcja["koniec"]:]
+
+def _koryguj_calosc(stara_tresc, uwagi_uzytkownika):
     prompt = f"""
     Jesteś precyzyjnym Edytorem Dokumentacji BHP.
     Twoim zadaniem jest zmodyfikowanie poniższego tekstu szkolenia DOKŁADNIE według instrukcji użytkownika.
@@ -124,20 +571,70 @@ def koryguj_tresc_szkolenia(stara_tresc, uwagi_uzytkownika):
     {stara_tresc}
     """
     
+    # Zwiększamy nieco temperaturę, żeby model był bardziej kreatywny przy dopisywaniu nowych treści
+    return _generuj_tekst(prompt, temperatura=0.4)
+
+def koryguj_tresc_szkolenia(stara_tresc, uwagi_uzytkownika):
+    """
+    Pozwala użytkownikowi zmienić fragment szkolenia bez generowania całości od nowa.
+    Jeśli polecenie dotyczy jednego punktu/bloku, do modelu idzie tylko ta sekcja (ze spisem jako kontekstem),
+    a poprawiony fragment jest wklejany z powrotem. Polecenia dotyczące całości lub niejednoznaczne
+    obsługuje pełna korekta dokumentu.
+    """
     try:
-        # Zwiększamy nieco temperaturę, żeby model był bardziej kreatywny przy dopisywaniu nowych treści
-        response = model.generate_content(prompt, generation_config=genai.types.GenerationConfig(temperature=0.4))
-        return response.text
+        sekcje = podziel_program_na_sekcje(stara_tresc)
+        sekcja = znajdz_sekcje_do_korekty(sekcje, uwagi_uzytkownika)
+        if sekcja is not None:
+            return _koryguj_sekcje(stara_tresc, sekcje, sekcja, uwagi_uzytkownika)
+        return _koryguj_calosc(stara_tresc, uwagi_uzytkownika)
     except Exception as e:
         return f"Błąd korekty: {e}"
 
-@st.cache_data
-def generuj_cel_szkolenia(nazwa_szkolenia):
+# Cel z szablonu jest natychmiastowy; BHP_CEL_MODELEM=1 dodatkowo dopracowuje go modelem w tle
+DOPRACOWANIE_CELU = os.environ.get("BHP_CEL_MODELEM", "0") == "1"
+
+CEL_AWARYJNY = "Przygotowanie pracownika do bezpiecznego i ergonomicznego wykonywania pracy na powierzonym stanowisku biurowym."
+
+def _skrot_obowiazkow(obowiazki, ile=3, maks_znakow=80):
+    """Kilka pierwszych obowiązków z pola tekstowego (linie, średniki, kropki) - do wplecenia w zdanie."""
+    czesci = [c.strip(" -•*\t").rstrip(",") for c in re.split(r"[\n;.]+", obowiazki or "")]
+    wynik = []
+    for c in czesci:
+        if len(c) < 4:
+            continue
+        if len(c) > maks_znakow:
+            c = c[:maks_znakow].rsplit(" ", 1)[0]
+        wynik.append(c[0].lower() + c[1:])
+        if len(wynik) == ile:
+            break
+    return wynik
+
+def generuj_cel_szkolenia(nazwa_szkolenia, srodowisko="", obowiazki=""):
+    """
+    Cel szkolenia (SMART) z szablonu - bez wywołania modelu. Konkretny (stanowisko, środowisko, obowiązki),
+    mierzalny (sprawdzian), osiągalny i istotny (Ramowy Program) oraz określony w czasie (przed dopuszczeniem do pracy).
+    """
+    stanowisko = re.sub(r"^\s*Szkolenie BHP:\s*", "", nazwa_szkolenia or "").strip()
+    if not stanowisko:
+        return CEL_AWARYJNY
+    miejsce = f" (środowisko pracy: {srodowisko.strip().lower()})" if srodowisko and srodowisko.strip() else ""
+    zadania = _skrot_obowiazkow(obowiazki)
+    zadania = f" (m.in. {'; '.join(zadania)})" if zadania else ""
+    return (
+        f"Celem szkolenia jest przekazanie pracownikowi zatrudnionemu na stanowisku {stanowisko}{miejsce} "
+        f"wiedzy o przepisach i zasadach BHP, zagrożeniach występujących na stanowisku i sposobach ochrony przed nimi "
+        f"oraz nabycie umiejętności bezpiecznego wykonywania pracy{zadania}, udzielania pierwszej pomocy "
+        f"i postępowania w razie pożaru lub awarii, potwierdzone pozytywnym wynikiem sprawdzianu wiedzy "
+        f"po instruktażu ogólnym (min. 3 godziny) i stanowiskowym (min. 2 godziny), przed dopuszczeniem do pracy."
+    )
+
+def dopracuj_cel_szkolenia(nazwa_szkolenia, cel_bazowy):
+    """Opcjonalna redakcja celu przez model (do uruchamiania w tle). Przy błędzie zwraca cel z szablonu."""
     try:
-        model = genai.GenerativeModel(MODEL_NAME)
         prompt = f"""
         Jesteś metodykiem nauczania dorosłych.
-        Sformułuj CEL SZKOLENIA wstępnego BHP dla stanowiska: '{nazwa_szkolenia}'.
+        Zredaguj CEL SZKOLENIA wstępnego BHP dla stanowiska: '{nazwa_szkolenia}'.
+        Wersja robocza: {cel_bazowy}
         ZASADY:
         1. Metoda SMART.
         2. Skup się na nabyciu wiedzy i umiejętności.
@@ -145,18 +642,26 @@ def generuj_cel_szkolenia(nazwa_szkolenia):
         4. Bez wstępów.
         5. Start: "Celem szkolenia jest..."
         """
-        response = model.generate_content(prompt)
-        tekst = response.text.replace('*', '').replace('#', '').replace('_', '')
+        tekst = _generuj_tekst(prompt, zadanie=ZADANIE_LEKKIE).replace('*', '').replace('#', '').replace('_', '')
         zbedne = ["Oczywiście", "oto propozycja", ":", "\n"]
         for z in zbedne: tekst = tekst.replace(z, ' ')
-        return " ".join(tekst.split()).strip()
+        tekst = " ".join(tekst.split()).strip()
+        return tekst if tekst.startswith("Celem szkolenia") else cel_bazowy
     except Exception:
-        return "Przygotowanie pracownika do bezpiecznego i ergonomicznego wykonywania pracy na powierzonym stanowisku biurowym."
+        return cel_bazowy
 
-@st.cache_data
-def generuj_test_bhp(_finalna_tresc):
-    """Generuje listę pytań kontrolnych (otwartych)."""
-    model = genai.GenerativeModel(MODEL_NAME)
+# "sekcje" - pytania z każdego punktu osobno (równolegle) i lokalny wybór; "calosc" - jeden prompt na cały program
+TRYB_PYTAN = os.environ.get("BHP_TRYB_PYTAN", "sekcje")
+
+LICZBA_PYTAN = 10
+PYTANIA_NA_FRAGMENT = 3
+MAKS_ZNAKOW_FRAGMENTU = 6000
+# Pytania o co najmniej takim podobieństwie zbiorów rdzeni słów uznajemy za powtórzenie
+PROG_PODOBIENSTWA_PYTAN = 0.6
+
+_WZORZEC_PYTANIA = re.compile(r"^\s*\d{1,2}[.)]\s+(.+)$")
+
+def _generuj_test_calosc(_finalna_tresc):
     prompt = f"""
     Jesteś instruktorem BHP. Przygotuj zestaw 10 PYTAŃ KONTROLNYCH (otwartych) oraz ZADAŃ PRAKTYCZNYCH do instruktażu stanowiskowego.
 
@@ -168,13 +673,121 @@ def generuj_test_bhp(_finalna_tresc):
     
     Nie dodawaj wstępów. Tylko lista numerowana.
     """
+    return _generuj_tekst(prompt, zadanie=ZADANIE_LEKKIE).strip()
+
+def _fragmenty_do_pytan(tresc):
+    """
+    (część, tytuł, tekst) dla każdego punktu programu; punkty dłuższe niż MAKS_ZNAKOW_FRAGMENTU
+    są dzielone na granicach linii. Tekst bez rozpoznanych punktów dzielony jest w całości.
+    """
+    sekcje = [s for s in podziel_program_na_sekcje(tresc) if s["oznaczenie"] and not s["oznaczenie"].startswith("CZĘŚĆ")]
+    if not sekcje:
+        sekcje = [{"czesc": None, "tytul": "Program szkolenia", "tekst": tresc}]
+    fragmenty = []
+    for sekcja in sekcje:
+        biezacy = ""
+        for linia in sekcja["tekst"].splitlines(keepends=True):
+            if biezacy and len(biezacy) + len(linia) > MAKS_ZNAKOW_FRAGMENTU:
+                fragmenty.append((sekcja["czesc"], _bez_formatowania(sekcja["tytul"]), biezacy))
+                biezacy = ""
+            biezacy += linia
+        if biezacy.strip():
+            fragmenty.append((sekcja["czesc"], _bez_formatowania(sekcja["tytul"]), biezacy))
+    return fragmenty
+
+def _pytania_fragmentu(tytul, tekst):
+    """Pytania-kandydaci z jednego fragmentu programu (lista tekstów 'Pytanie - Odpowiedź')."""
+    prompt = f"""
+    Jesteś instruktorem BHP. Przygotuj {PYTANIA_NA_FRAGMENT} PYTAŃ KONTROLNYCH (otwartych) lub ZADAŃ PRAKTYCZNYCH
+    sprawdzających wiedzę z punktu programu szkolenia: "{tytul}".
+
+    FORMAT:
+    1. [Pytanie/Zadanie] - [Oczekiwana odpowiedź/Działanie]
+
+    Oprzyj pytania wyłącznie na poniższym materiale:
+    {tekst}
+
+    Nie dodawaj wstępów. Tylko lista numerowana.
+    """
+    odpowiedz = _generuj_tekst(prompt, zadanie=ZADANIE_LEKKIE)
+    pytania = []
+    for linia in odpowiedz.splitlines():
+        m = _WZORZEC_PYTANIA.match(linia)
+        if m:
+            pytania.append(" ".join(m.group(1).replace("*", "").split()))
+    return pytania
+
+def _rowny_podzial(ile, koszyki):
+    """Rozkłada `ile` miejsc możliwie równo na `koszyki` (przy ile < koszyki - co któryś koszyk, nie pierwsze)."""
+    return [(j + 1) * ile // koszyki - j * ile // koszyki for j in range(koszyki)]
+
+def wybierz_pytania(kandydaci, liczba=LICZBA_PYTAN):
+    """
+    Redukcja: usuwa powtórzenia (podobieństwo rdzeni słów) i wybiera `liczba` pytań równo z części programu,
+    a w części - równo z punktów. Brakujące miejsca uzupełnia pozostałymi pytaniami w kolejności programu.
+    `kandydaci` - lista (część, tytuł punktu, [pytania]) w kolejności programu.
+    """
+    widziane, grupy = [], []
+    for czesc, tytul, pytania in kandydaci:
+        unikalne = []
+        for pytanie in pytania:
+            rdzenie = set(tokenizuj(pytanie.split(" - ")[0]))
+            if not rdzenie or any(len(rdzenie & w) / len(rdzenie | w) >= PROG_PODOBIENSTWA_PYTAN for w in widziane):
+                continue
+            widziane.append(rdzenie)
+            unikalne.append(pytanie)
+        if unikalne:
+            grupy.append((czesc, unikalne))
+
+    czesci = list(dict.fromkeys(czesc for czesc, _ in grupy))
+    wybrane = set()
+    for czesc, miejsca in zip(czesci, _rowny_podzial(liczba, len(czesci))):
+        grupy_czesci = [pytania for c, pytania in grupy if c == czesc]
+        for pytania, ile in zip(grupy_czesci, _rowny_podzial(miejsca, len(grupy_czesci))):
+            wybrane.update(pytania[:ile])
+    wszystkie = [pytanie for _, pytania in grupy for pytanie in pytania]
+    for pytanie in wszystkie:
+        if len(wybrane) >= liczba:
+            break
+        wybrane.add(pytanie)
+    return [pytanie for pytanie in wszystkie if pytanie in wybrane][:liczba]
+
+def _generuj_test_sekcjami(_finalna_tresc):
+    """Map-reduce: kandydaci z każdego fragmentu równolegle, potem lokalny wybór LICZBA_PYTAN pytań."""
+    fragmenty = _fragmenty_do_pytan(_finalna_tresc)
+    zlecone = [_pula_sekcji.submit(_pytania_fragmentu, tytul, tekst) for _, tytul, tekst in fragmenty]
+    kandydaci, bledy = [], []
+    for (czesc, tytul, _), przyszly in zip(fragmenty, zlecone):
+        try:
+            kandydaci.append((czesc, tytul, przyszly.result()))
+        except Exception as e:
+            # Brak pytań z jednego punktu nie przekreśla zestawu
+            bledy.append(e)
+            print(f"Pytania dla '{tytul}' pominięte: {e}")
+    pytania = wybierz_pytania(kandydaci)
+    if not pytania:
+        raise RuntimeError(bledy[0] if bledy else "Brak pytań w odpowiedziach modelu")
+    return "\n".join(f"{nr}. {pytanie}" for nr, pytanie in enumerate(pytania, 1))
+
+def generuj_test_bhp(_finalna_tresc):
+    """Generuje listę pytań kontrolnych (otwartych)."""
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip(), None 
+        if TRYB_PYTAN == "sekcje":
+            return _generuj_test_sekcjami(_finalna_tresc), None
+        return _generuj_test_calosc(_finalna_tresc), None
     except Exception as e:
         st.error(f"Błąd generowania pytań: {e}")
         return "Błąd.", None
 
+def pytania_kontrolne(finalna_tresc, gotowe=None):
+    """Treść pytań kontrolnych do dokumentu: gotowa (np. z sesji) albo wygenerowana. Bez pytań - ValueError."""
+    if gotowe:
+        return gotowe
+    tresc, _ = generuj_test_bhp(finalna_tresc)
+    if not tresc or tresc == "Błąd.":
+        raise ValueError("Nie udało się wygenerować pytań kontrolnych.")
+    return tresc
+
 @st.cache_data
 def przeprowadz_audyt_tresci(tekst):
     """
@@ -209,46 +822,116 @@ def przeprowadz_audyt_tresci(tekst):
         
     return wyniki
 
-@st.cache_data
+def _parsuj_bloki_godzin(text_resp):
+    text_resp = text_resp.strip()
+    if text_resp.startswith("```json"): text_resp = text_resp[7:-3]
+    elif text_resp.startswith("```"): text_resp = text_resp[3:-3]
+
+    dane = json.loads(text_resp)
+
+    if not dane or not isinstance(dane, list):
+        raise ValueError("Pusty lub niepoprawny JSON")
+    return dane
+
+# --- NOWA LISTA AWARYJNA (Zgodna z Rozporządzeniem) ---
+LISTA_AWARYJNA_GODZIN = [
+    {
+        "nazwa": "Istota BHP, zakres obowiązków i uprawnień, odpowiedzialność pracownicza",
+        "godziny": 0.6
+    },
+    {
+        "nazwa": "Zasady poruszania się po zakładzie, zagrożenia wypadkowe i środki zapobiegawcze",
+        "godziny": 0.5
+    },
+    {
+        "nazwa": "Zasady BHP przy obsłudze urządzeń technicznych i transporcie wewnątrzzakładowym",
+        "godziny": 0.4
+    },
+    {
+        "nazwa": "Odzież robocza, porządek w miejscu pracy, profilaktyka lekarska",
+        "godziny": 0.5
+    },
+    {
+        "nazwa": "Ochrona przeciwpożarowa i pierwsza pomoc",
+        "godziny": 1.0
+    },
+    {
+        "nazwa": "INSTRUKTAŻ STANOWISKOWY: Przygotowanie, proces pracy, zagrożenia, wyposażenie",
+        "godziny": 2.0
+    }
+]
+
+# Rdzenie słów kluczowych (bez polskich znaków) dla 6 bloków Ramowego Programu, w kolejności listy awaryjnej
+SLOWA_BLOKOW = [
+    ["istota", "bezpieczenstwa i higieny", "obowiazk", "uprawnien", "odpowiedzialn", "prawo pracy", "kodeks", "przepis"],
+    ["poruszani", "teren", "zagrozen", "wypadkow", "zapobiegawcz", "organizac"],
+    ["urzadzen", "maszyn", "transport", "technicz", "narzedzi"],
+    ["odziez", "ochrony indywidualnej", "porzad", "czystos", "lekarsk", "profilaktyczn", "badani", "higieniczn"],
+    ["pozar", "ppoz", "pierwszej pomocy", "pierwsza pomoc", "wypadku", "wypadek", "ewakuac", "ratown", "gasni"],
+    ["stanowisk", "ergonom", "monitor", "komputer", "proces pracy", "przygotowanie pracownika"],
+]
+INDEKS_BLOKU_STANOWISKOWEGO = 5
+
+# Poniżej tego odsetka jednoznacznie sklasyfikowanych tematów pytamy model
+PROG_PEWNOSCI_GODZIN = 0.8
+
+def _klasyfikuj_temat(temat):
+    """Indeks bloku dla tematu albo None (brak słów kluczowych lub remis)."""
+    # Bloki A-D to CZĘŚĆ II, czyli instruktaż stanowiskowy - niezależnie od słów
+    if re.match(r"^\s*[A-H][.)]\s", temat):
+        return INDEKS_BLOKU_STANOWISKOWEGO
+    tekst = normalizuj_tekst(temat)
+    wyniki = [sum(1 for slowo in slowa if slowo in tekst) for slowa in SLOWA_BLOKOW]
+    najlepszy = max(wyniki)
+    if najlepszy == 0 or wyniki.count(najlepszy) > 1:
+        return None
+    return wyniki.index(najlepszy)
+
+def przypisz_godziny_lokalnie(spis_tresci_lista, lista_awaryjna):
+    """
+    Przydział tematów do bloków bez modelu (słowa kluczowe). Godziny są stałe dla bloku,
+    nazwa bloku to lista przypisanych tematów (albo nazwa z listy awaryjnej, gdy blok jest pusty).
+    Temat bez jednoznacznego bloku nie znika z tematyki: trafia do bloku poprzedniego tematu
+    (program idzie blokami po kolei), a na początku spisu - do bloku pierwszego rozpoznanego tematu.
+    Zwraca (lista bloków, pewność = odsetek tematów przypisanych jednoznacznie).
+    """
+    indeksy = [_klasyfikuj_temat(temat) for temat in spis_tresci_lista]
+    pewne = sum(1 for indeks in indeksy if indeks is not None)
+    biezacy = next((indeks for indeks in indeksy if indeks is not None), 0)
+    tematy = [[] for _ in lista_awaryjna]
+    for temat, indeks in zip(spis_tresci_lista, indeksy):
+        if indeks is not None:
+            biezacy = indeks
+        tematy[biezacy].append(re.sub(r"^\s*(\d{1,2}|[A-H])[.)]\s*", "", temat).strip())
+    return _bloki_z_tematami(tematy, lista_awaryjna), (pewne / len(spis_tresci_lista)) if spis_tresci_lista else 0.0
+
+def _bloki_z_tematami(tematy, lista_awaryjna):
+    """Lista bloków z godzinami; `tematy` - tytuły przypisane do kolejnych bloków."""
+    wynik = []
+    for nr, (blok, przypisane) in enumerate(zip(lista_awaryjna, tematy), 1):
+        nazwa = "; ".join(przypisane) if przypisane else blok["nazwa"]
+        if przypisane and nr - 1 == INDEKS_BLOKU_STANOWISKOWEGO:
+            nazwa = f"INSTRUKTAŻ STANOWISKOWY: {nazwa}"
+        wynik.append({"nazwa": f"{nr}. {nazwa}", "godziny": blok["godziny"]})
+    return wynik
+
 def przypisz_godziny_do_tematow(_spis_tresci_lista):
     """
     Funkcja przypisuje godziny zgodnie z Ramowym Programem Szkolenia (Dz.U.).
     Obsługuje ułamkowe godziny lekcyjne.
     """
     
-    # --- NOWA LISTA AWARYJNA (Zgodna z Rozporządzeniem) ---
-    lista_awaryjna = [
-        {
-            "nazwa": "Istota BHP, zakres obowiązków i uprawnień, odpowiedzialność pracownicza",
-            "godziny": 0.6
-        },
-        {
-            "nazwa": "Zasady poruszania się po zakładzie, zagrożenia wypadkowe i środki zapobiegawcze",
-            "godziny": 0.5
-        },
-        {
-            "nazwa": "Zasady BHP przy obsłudze urządzeń technicznych i transporcie wewnątrzzakładowym",
-            "godziny": 0.4
-        },
-        {
-            "nazwa": "Odzież robocza, porządek w miejscu pracy, profilaktyka lekarska",
-            "godziny": 0.5
-        },
-        {
-            "nazwa": "Ochrona przeciwpożarowa i pierwsza pomoc",
-            "godziny": 1.0
-        },
-        {
-            "nazwa": "INSTRUKTAŻ STANOWISKOWY: Przygotowanie, proces pracy, zagrożenia, wyposażenie",
-            "godziny": 2.0
-        }
-    ]
+    lista_awaryjna = [dict(blok) for blok in LISTA_AWARYJNA_GODZIN]
 
     # Szybki fallback
     if not _spis_tresci_lista:
         return lista_awaryjna
 
-    model = genai.GenerativeModel(MODEL_NAME)
+    # Zadanie jest deterministyczne (stałe bloki i godziny) - model tylko wtedy, gdy słowa kluczowe nie wystarczą
+    lista_lokalna, pewnosc = przypisz_godziny_lokalnie(_spis_tresci_lista, lista_awaryjna)
+    if pewnosc >= PROG_PEWNOSCI_GODZIN:
+        return lista_lokalna
+
     tekst_spisu = "\n".join(_spis_tresci_lista)
     
     prompt = f"""
@@ -275,25 +958,305 @@ def przypisz_godziny_do_tematow(_spis_tresci_lista):
     {tekst_spisu}
     """
     
+    # Błędy API (limity, przeciążenie) ponawia bramka z opóźnieniem - tu nie usypiamy wątku skryptu.
+    # Niepoprawny JSON nie trafia do cache, więc kolejna próba od razu pyta model ponownie.
     max_proby = 3
     for proba in range(max_proby):
         try:
-            response = model.generate_content(prompt)
-            text_resp = response.text.strip()
-            
-            if text_resp.startswith("```json"): text_resp = text_resp[7:-3]
-            elif text_resp.startswith("```"): text_resp = text_resp[3:-3]
-            
-            dane = json.loads(text_resp)
-            
-            if not dane or not isinstance(dane, list):
-                raise ValueError("Pusty lub niepoprawny JSON")
-                
-            return dane
+            return _generuj_tekst(prompt, przetworz=_parsuj_bloki_godzin, zadanie=ZADANIE_LEKKIE)
+        except ValueError:
+            continue
+        except Exception:
+            break
 
-        except Exception as e:
-            wait_time = (proba + 1) * 2
-            time.sleep(wait_time)
+    return lista_lokalna
+
+# --- KONSPEKT (STRUKTURA PROGRAMU JAKO JSON) ---
+# Program jest raz rozbierany na typowaną strukturę i walidowany; godziny, audyt i zapis DOCX
+# korzystają z niej bezpośrednio, bez ponownego parsowania markdownu:
+#
+# {"wersja": 1, "tytul": str, "metryka": [akapit], "czesci": [
+#     {"oznaczenie": "I", "tytul": str, "akapity": [akapit], "punkty": [
+#         {"oznaczenie": "1", "tytul": str, "blok": int | None, "akapity": [akapit], "przepisy": [str]}]}]}
+# akapit = {"rodzaj": "tekst" | "lista" | "naglowek", "poziom": int, "tekst": str (pogrubienia jako **)}
+
+WERSJA_KONSPEKTU = 1
+RODZAJE_AKAPITOW = ("tekst", "lista", "naglowek")
+
+# Punkt ramowy CZĘŚCI I -> indeks bloku godzin (kolejność jak w PUNKTY_CZESCI_I)
+BLOKI_PUNKTOW_CZESCI_I = [0, 0, 0, 1, 1, 2, 3, 3, 3, 4, 4]
+
+_WZORZEC_LISTY = re.compile(r"^(\s*)(?:[-*•]|\d{1,2}[.)])\s+(.*)$")
+_WZORZEC_PRZEPISU = re.compile(
+    r"\bart\.\s*\d+\w*(?:\s*§\s*\d+)?(?:\s+(?:Kodeksu pracy|k\.p\.))?"
+    r"|\bPN-(?:EN-?)?(?:\s*ISO)?\s*\d[\d-]*(?::\d{4})?"
+    r"|\bRozporządzeni\w*\s[^.;\n]{0,150}",
+    re.IGNORECASE
+)
+
+def _akapity(linie):
+    akapity = []
+    for linia in linie:
+        if not linia.strip():
+            continue
+        if linia.lstrip().startswith("#"):
+            akapity.append({"rodzaj": "naglowek", "poziom": 0, "tekst": _bez_formatowania(linia)})
+            continue
+        m = _WZORZEC_LISTY.match(linia)
+        if m:
+            akapity.append({"rodzaj": "lista", "poziom": len(m.group(1).expandtabs(4)) // 2, "tekst": m.group(2).strip()})
+        else:
+            akapity.append({"rodzaj": "tekst", "poziom": 0, "tekst": linia.strip()})
+    return akapity
+
+def _przepisy(tekst):
+    """Cytowane podstawy prawne i normy w kolejności wystąpienia, bez powtórzeń."""
+    widziane = {}
+    for m in _WZORZEC_PRZEPISU.finditer(tekst.replace("*", "")):
+        przepis = " ".join(m.group(0).split()).rstrip(",:")
+        widziane.setdefault(przepis.lower(), przepis)
+    return list(widziane.values())
+
+def _blok_punktu(czesc, oznaczenie, tytul):
+    """Blok godzin punktu: z Ramowego Programu, gdy punkt mu odpowiada, inaczej wg słów kluczowych."""
+    if czesc == "II" or not oznaczenie.isdigit():
+        return INDEKS_BLOKU_STANOWISKOWEGO
+    nr = int(oznaczenie)
+    if nr <= len(PUNKTY_CZESCI_I) and normalizuj_tekst(tytul).startswith(normalizuj_tekst(PUNKTY_CZESCI_I[nr - 1][0])[:15]):
+        return BLOKI_PUNKTOW_CZESCI_I[nr - 1]
+    return _klasyfikuj_temat(tytul)
+
+def waliduj_konspekt(konspekt):
+    """Sprawdza typy i wymagane pola konspektu. Rzuca ValueError z opisem pierwszego problemu."""
+    if not isinstance(konspekt, dict) or konspekt.get("wersja") != WERSJA_KONSPEKTU:
+        raise ValueError("Konspekt: nieznana wersja lub zły typ")
+    if not isinstance(konspekt.get("tytul"), str) or not isinstance(konspekt.get("metryka"), list):
+        raise ValueError("Konspekt: brak tytułu lub metryki")
+    czesci = konspekt.get("czesci")
+    if not isinstance(czesci, list) or not czesci:
+        raise ValueError("Konspekt: brak części programu")
+    akapity = list(konspekt["metryka"])
+    for czesc in czesci:
+        if not isinstance(czesc.get("oznaczenie"), str) or not isinstance(czesc.get("punkty"), list):
+            raise ValueError(f"Konspekt: niepoprawna część {czesc.get('oznaczenie')!r}")
+        akapity += czesc.get("akapity", [])
+        for punkt in czesc["punkty"]:
+            if not punkt.get("oznaczenie") or not isinstance(punkt.get("tytul"), str) or not punkt["tytul"]:
+                raise ValueError(f"Konspekt: punkt bez oznaczenia lub tytułu w części {czesc['oznaczenie']}")
+            blok = punkt.get("blok")
+            if blok is not None and not (isinstance(blok, int) and 0 <= blok < len(LISTA_AWARYJNA_GODZIN)):
+                raise ValueError(f"Konspekt: punkt {punkt['oznaczenie']} ma niepoprawny blok {blok!r}")
+            if not isinstance(punkt.get("akapity"), list) or not all(isinstance(p, str) for p in punkt.get("przepisy", [None])):
+                raise ValueError(f"Konspekt: punkt {punkt['oznaczenie']} ma niepoprawną treść")
+            akapity += punkt["akapity"]
+    for akapit in akapity:
+        if akapit.get("rodzaj") not in RODZAJE_AKAPITOW or not isinstance(akapit.get("tekst"), str):
+            raise ValueError(f"Konspekt: niepoprawny akapit {akapit!r}")
+    if not any(czesc["punkty"] for czesc in czesci):
+        raise ValueError("Konspekt: program nie ma żadnego punktu")
+
+def konspekt_z_tresci(tresc):
+    """
+    Jednorazowe rozebranie programu (markdown) na konspekt i jego walidacja.
+    Zwraca słownik (patrz opis wyżej) albo None, gdy tekstu nie da się ułożyć w strukturę programu.
+    """
+    konspekt = {"wersja": WERSJA_KONSPEKTU, "tytul": "", "metryka": [], "czesci": []}
+    for sekcja in podziel_program_na_sekcje(tresc or ""):
+        linie = sekcja["tekst"].splitlines()
+        oznaczenie = sekcja["oznaczenie"]
+        if not oznaczenie:
+            # Wstęp: tytuł dokumentu i metryka (stanowisko, firma, podstawa prawna)
+            niepuste = [l for l in linie if l.strip()]
+            if niepuste:
+                konspekt["tytul"] = _bez_formatowania(niepuste[0])
+                konspekt["metryka"] = _akapity(niepuste[1:])
             continue
+        if oznaczenie.startswith("CZĘŚĆ"):
+            konspekt["czesci"].append({"oznaczenie": sekcja["czesc"], "tytul": _bez_formatowania(sekcja["tytul"]),
+                                       "punkty": [], "akapity": _akapity(linie[1:])})
+            continue
+        if not konspekt["czesci"]:
+            # Punkty bez nagłówka części - przyjmujemy CZĘŚĆ I
+            konspekt["czesci"].append({"oznaczenie": "I", "tytul": TYTUL_CZESCI_I, "punkty": [], "akapity": []})
+        tytul = re.sub(r"^(\d{1,2}|[A-H])\.\s*", "", _bez_formatowania(sekcja["tytul"]))
+        konspekt["czesci"][-1]["punkty"].append({
+            "oznaczenie": oznaczenie,
+            "tytul": tytul,
+            "blok": _blok_punktu(konspekt["czesci"][-1]["oznaczenie"], oznaczenie, tytul),
+            "akapity": _akapity(linie[1:]),
+            "przepisy": _przepisy(sekcja["tekst"]),
+        })
+    try:
+        waliduj_konspekt(konspekt)
+    except ValueError as e:
+        print(f"Nie udało się zbudować konspektu: {e}")
+        return None
+    return konspekt
+
+def spis_tresci_z_konspektu(konspekt):
+    return [f"{p['oznaczenie']}. {p['tytul']}" for czesc in konspekt["czesci"] for p in czesc["punkty"]]
+
+def przypisz_godziny_z_konspektu(konspekt):
+    """
+    Bloki godzin wprost z pól "blok" konspektu - bez klasyfikacji i bez modelu.
+    Model (przypisz_godziny_do_tematow) tylko wtedy, gdy jakiegoś punktu nie da się przypisać.
+    """
+    punkty = [p for czesc in konspekt["czesci"] for p in czesc["punkty"]]
+    if any(p["blok"] is None for p in punkty):
+        return przypisz_godziny_do_tematow(spis_tresci_z_konspektu(konspekt))
+    tematy = [[] for _ in LISTA_AWARYJNA_GODZIN]
+    for p in punkty:
+        tematy[p["blok"]].append(p["tytul"])
+    return _bloki_z_tematami(tematy, LISTA_AWARYJNA_GODZIN)
+
+# --- ORKIESTRACJA RÓWNOLEGŁYCH WYWOŁAŃ ---
+
+# Wywołania API czekają na sieć, więc wątki wystarczą (GIL nie jest tu ograniczeniem)
+_pula_watkow = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm")
+
+def uruchom_w_tle(funkcja, *args, **kwargs):
+    """
+    Zleca funkcję do puli wątków i zwraca Future. Przekazuje kontekst sesji Streamlit,
+    żeby st.error działał także poza głównym wątkiem skryptu.
+    """
+    kontekst = get_script_run_ctx()
+
+    def _zadanie():
+        if kontekst is not None:
+            add_script_run_ctx(None, kontekst)
+        return funkcja(*args, **kwargs)
+
+    return _pula_watkow.submit(_zadanie)
+
+_KONIEC_STRUMIENIA = object()
+
+def strumien_w_tle(funkcja, *args, **kwargs):
+    """
+    Generator z fragmentami `funkcja(*args, **kwargs)` (też generatora), który jest czytany w puli wątków
+    (uruchom_w_tle). Wywołujący tylko odbiera gotowe fragmenty z kolejki, więc ponowienia i odczekania
+    bramki po błędach nie dzieją się w jego wątku. Błąd producenta jest rzucany dalej u odbiorcy;
+    porzucenie strumienia zatrzymuje producenta po bieżącym fragmencie.
+    """
+    kolejka = queue.Queue()
+    porzucony = threading.Event()
+
+    def _produkuj():
+        strumien = funkcja(*args, **kwargs)
+        try:
+            for fragment in strumien:
+                if porzucony.is_set():
+                    break
+                kolejka.put(fragment)
+        except Exception as e:
+            kolejka.put(e)
+        finally:
+            strumien.close()
+            kolejka.put(_KONIEC_STRUMIENIA)
+
+    uruchom_w_tle(_produkuj)
+    try:
+        while True:
+            fragment = kolejka.get()
+            if fragment is _KONIEC_STRUMIENIA:
+                return
+            if isinstance(fragment, Exception):
+                raise fragment
+            yield fragment
+    finally:
+        porzucony.set()
+
+def wyciagnij_spis_tresci(tresc):
+    """Tytuły punktów i bloków programu (np. "1. Temat", "A. Blok") - wejście dla przypisz_godziny_do_tematow."""
+    return [_bez_formatowania(s["tytul"]) for s in podziel_program_na_sekcje(tresc)
+            if s["oznaczenie"] and not s["oznaczenie"].startswith("CZĘŚĆ")]
+
+def _struktura_programu(tresc):
+    """(konspekt, spis treści, tematyka z godzinami) gotowego programu. Bez konspektu - dawna ścieżka ze spisu."""
+    konspekt = konspekt_z_tresci(tresc)
+    if konspekt is None:
+        spis = wyciagnij_spis_tresci(tresc)
+        return None, spis, przypisz_godziny_do_tematow(spis)
+    return konspekt, spis_tresci_z_konspektu(konspekt), przypisz_godziny_z_konspektu(konspekt)
+
+def _cel_z_dopracowaniem(nazwa_zawodu, srodowisko, obowiazki):
+    """Cel z szablonu od razu i - jeśli włączone - Future z wersją dopracowaną przez model (inaczej None)."""
+    nazwa = f"Szkolenie BHP: {nazwa_zawodu}"
+    cel = generuj_cel_szkolenia(nazwa, srodowisko, obowiazki)
+    return cel, (uruchom_w_tle(dopracuj_cel_szkolenia, nazwa, cel) if DOPRACOWANIE_CELU else None)
+
+def generuj_szkolenie_rownolegle(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny=""):
+    """
+    Krok 1 bez czekania w kolejce: cel powstaje od razu z szablonu, program startuje w tle,
+    a przydział godzin rusza, gdy tylko program jest gotowy.
+    Czas całości ~ najdłuższa ścieżka (program + godziny), a nie suma wszystkich wywołań.
+    Zwraca słownik z wynikami (w tym "konspekt" - patrz konspekt_z_tresci) i czasami kroków (w sekundach); "cel_dopracowywany"
+    to Future z celem zredagowanym przez model (gdy DOPRACOWANIE_CELU) albo None.
+    """
+    start = time.perf_counter()
+    czasy = {}
+
+    def _mierz(nazwa, funkcja, *args, **kwargs):
+        t0 = time.perf_counter()
+        wynik = funkcja(*args, **kwargs)
+        czasy[nazwa] = round(time.perf_counter() - t0, 2)
+        return wynik
+
+    f_program = uruchom_w_tle(_mierz, "program", generuj_kompletne_szkolenie, firma, nazwa_zawodu, opis_zawodu,
+                              dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny=kontekst_prawny)
+    cel_szkolenia, f_cel = _cel_z_dopracowaniem(nazwa_zawodu, srodowisko, obowiazki)
+
+    def _godziny_po_programie():
+        tresc = f_program.result()
+        if "Błąd" in tresc:
+            return None, [], []
+        return _mierz("godziny", _struktura_programu, tresc)
+
+    f_godziny = uruchom_w_tle(_godziny_po_programie)
+
+    finalna_tresc = f_program.result()
+    konspekt, spis_tresci, tematyka_z_godzinami = f_godziny.result()
+    czasy["razem"] = round(time.perf_counter() - start, 2)
+
+    return {
+        "finalna_tresc": finalna_tresc,
+        "cel_szkolenia": cel_szkolenia,
+        "cel_dopracowywany": f_cel,
+        "spis_tresci": spis_tresci,
+        "konspekt": konspekt,
+        "tematyka_z_godzinami": tematyka_z_godzinami,
+        "czasy": czasy
+    }
+
+def generuj_szkolenie_strumieniowo(wyswietl, firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia, obowiazki, srodowisko, kontekst_prawny=""):
+    """
+    Jak generuj_szkolenie_rownolegle, ale program szkolenia jest przekazywany na bieżąco do `wyswietl`
+    (np. st.write_stream, które zwraca złożony tekst). Cel jest z szablonu (ewentualna redakcja modelem w tle).
+    Gotowy program trafia do cache odpowiedzi jak przy zwykłym wywołaniu generuj_kompletne_szkolenie.
+    """
+    start = time.perf_counter()
+    czasy = {}
+    cel_szkolenia, f_cel = _cel_z_dopracowaniem(nazwa_zawodu, srodowisko, obowiazki)
 
-    return lista_awaryjna
+    strumien = generuj_kompletne_szkolenie_strumieniowo(firma, nazwa_zawodu, opis_zawodu, dodatkowe_zagrozenia,
+                                                        obowiazki, srodowisko, kontekst_prawny=kontekst_prawny)
+    finalna_tresc = (wyswietl(strumien) or "").strip()
+    czasy["program"] = round(time.perf_counter() - start, 2)
+
+    konspekt, spis_tresci, tematyka_z_godzinami = None, [], []
+    if finalna_tresc and "Błąd" not in finalna_tresc:
+        t0 = time.perf_counter()
+        # W tle i z czekaniem na wynik: awaryjny przydział godzin modelem może odczekiwać po błędach
+        konspekt, spis_tresci, tematyka_z_godzinami = uruchom_w_tle(_struktura_programu, finalna_tresc).result()
+        czasy["godziny"] = round(time.perf_counter() - t0, 2)
+
+    czasy["razem"] = round(time.perf_counter() - start, 2)
+
+    return {
+        "finalna_tresc": finalna_tresc or "Błąd generowania treści.",
+        "cel_szkolenia": cel_szkolenia,
+        "cel_dopracowywany": f_cel,
+        "spis_tresci": spis_tresci,
+        "konspekt": konspekt,
+        "tematyka_z_godzinami": tematyka_z_godzinami,
+        "czasy": czasy
+    }
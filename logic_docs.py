@@ -1,40 +1,201 @@
 from docxtpl import DocxTemplate
 from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
 from io import BytesIO
+from jinja2 import Environment
+import copy
+import os
+import threading
 import streamlit as st
 
+# --- REJESTR SZABLONÓW ---
+# Każdy szablon .docx jest otwierany i przygotowywany raz na proces: dokument jest trzymany
+# w pamięci i klonowany (deepcopy) na każde renderowanie, a wynik patch_xml i skompilowane
+# szablony Jinja są zapamiętywane. Zmiana pliku (mtime/rozmiar) unieważnia wpis.
+
+class _SrodowiskoSzablonu(Environment):
+    """Środowisko Jinja, które kompiluje dany tekst szablonu tylko raz."""
+
+    def __init__(self):
+        super().__init__()
+        self._skompilowane = {}
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals is not None or template_class is not None:
+            return super().from_string(source, globals, template_class)
+        szablon = self._skompilowane.get(source)
+        if szablon is None:
+            szablon = self._skompilowane[source] = super().from_string(source)
+        return szablon
+
+class _WpisSzablonu:
+    def __init__(self, sciezka, sygnatura):
+        self.sciezka = sciezka
+        self.sygnatura = sygnatura
+        self.dokument = Document(sciezka)
+        self.srodowisko = _SrodowiskoSzablonu()
+        self.latki = {}  # xml części dokumentu -> xml po patch_xml
+
+    def klon(self):
+        return copy.deepcopy(self.dokument)
+
+class _SzablonZRejestru(DocxTemplate):
+    """DocxTemplate, który zamiast czytać plik bierze klon dokumentu i pamięć przygotowań z rejestru."""
+
+    def __init__(self, wpis):
+        super().__init__(wpis.sciezka)
+        self._wpis = wpis
+        self.docx = wpis.klon()
+
+    def init_docx(self, reload=True):
+        if not self.docx or (self.is_rendered and reload):
+            self.docx = self._wpis.klon()
+            self.is_rendered = False
+
+    def patch_xml(self, src_xml):
+        wynik = self._wpis.latki.get(src_xml)
+        if wynik is None:
+            wynik = self._wpis.latki[src_xml] = super().patch_xml(src_xml)
+        return wynik
+
+    def renderuj_cialo(self, context):
+        """Samo ciało dokumentu (w:body) wyrenderowane z kontekstem - bez podmiany w self.docx, nagłówków i właściwości."""
+        self.render_init()
+        return self.fix_tables(self.build_xml(context, self._wpis.srodowisko))
+
+    def render(self, context, jinja_env=None, autoescape=False):
+        # Wspólne środowisko tylko bez autoescape (docxtpl przestawia je na obiekcie środowiska)
+        if jinja_env is None and not autoescape:
+            jinja_env = self._wpis.srodowisko
+        super().render(context, jinja_env, autoescape)
+
+_REJESTR_SZABLONOW = {}
+_blokada_rejestru = threading.Lock()
+
+def _sygnatura_pliku(sciezka):
+    stat = os.stat(sciezka)
+    return stat.st_mtime_ns, stat.st_size
+
+def szablon_docx(nazwa_szablonu):
+    """
+    Świeży DocxTemplate dla szablonu z rejestru (zamiennik DocxTemplate(nazwa_szablonu)).
+    Plik jest parsowany tylko przy pierwszym użyciu i po jego zmianie na dysku.
+    """
+    sciezka = os.path.abspath(nazwa_szablonu)
+    sygnatura = _sygnatura_pliku(sciezka)
+    with _blokada_rejestru:
+        wpis = _REJESTR_SZABLONOW.get(sciezka)
+        if wpis is None or wpis.sygnatura != sygnatura:
+            wpis = _REJESTR_SZABLONOW[sciezka] = _WpisSzablonu(sciezka, sygnatura)
+    return _SzablonZRejestru(wpis)
+
+def wyczysc_rejestr_szablonow():
+    with _blokada_rejestru:
+        _REJESTR_SZABLONOW.clear()
+
+def dopisz_wiersze(table, wiersze):
+    """
+    Dopisuje na końcu tabeli wiersze (listy tekstów kolejnych komórek), dając ten sam XML co
+    table.add_row() + cell.text, ale bez obiektów python-docx na każdą komórkę: wiersz-prototyp
+    jest budowany raz, a kolejne wiersze to jego kopie z wpisanym tekstem w gotowe węzły w:t.
+    Wartości ponad liczbę komórek wiersza są pomijane.
+    """
+    if not wiersze:
+        return
+    prototyp = table.add_row()
+    komorki = prototyp.cells[:max(len(w) for w in wiersze)]
+    for komorka in komorki:
+        komorka.text = "-"  # tekst zastępczy, żeby każda komórka miała swój węzeł w:t
+    # add_row() tworzy po jednej komórce na kolumnę siatki, więc k-ty węzeł w:t to k-ta kolumna
+    tr = prototyp._tr
+    wzor = copy.deepcopy(tr)
+
+    poprzedni = None
+    for wiersz in wiersze:
+        nowy = tr if poprzedni is None else copy.deepcopy(wzor)
+        wezly = list(nowy.iter(qn('w:t')))
+        for t, wartosc in zip(wezly, wiersz):
+            if not wartosc:
+                # cell.text = "" zostawia pusty przebieg bez w:t
+                t.getparent().remove(t)
+                continue
+            if '\t' in wartosc or '\n' in wartosc or '\r' in wartosc:
+                # Tabulatory i nowe linie: setter przebiegu python-docx zamienia je na w:tab / w:br
+                t.getparent().text = wartosc
+                continue
+            t.text = wartosc
+            if len(wartosc.strip()) < len(wartosc):
+                t.set(qn('xml:space'), 'preserve')
+            else:
+                t.attrib.pop(qn('xml:space'), None)
+        if poprzedni is not None:
+            poprzedni.addnext(nowy)
+        poprzedni = nowy
+
 def generuj_dokument_z_tabela(nazwa_szablonu, context, dane_tabeli=None, mapowanie_kolumn=None, index_tabeli=0):
-    """Generuje dokument Word z dynamiczną tabelą."""
+    """Generuje dokument Word z dynamiczną tabelą (kontekst i wiersze trafiają do tego samego drzewa, jeden zapis)."""
     try:
-        doc_tpl = DocxTemplate(nazwa_szablonu)
+        doc_tpl = szablon_docx(nazwa_szablonu)
         doc_tpl.render(context)
-        
-        temp_bio = BytesIO()
-        doc_tpl.save(temp_bio)
-        temp_bio.seek(0)
 
         if dane_tabeli and mapowanie_kolumn:
-            doc = Document(temp_bio)
+            # Po renderze doc_tpl.docx to już gotowy dokument python-docx - bez zapisu i ponownego wczytania
+            doc = doc_tpl.docx
             if doc.tables and len(doc.tables) > index_tabeli:
-                table = doc.tables[index_tabeli]
-                for i, wiersz_dane in enumerate(dane_tabeli):
-                    row_cells = table.add_row().cells
-                    row_cells[0].text = str(i + 1) # Kolumna 0 to zawsze Lp.
-                    
-                    for col_idx, klucz in enumerate(mapowanie_kolumn):
-                        target_idx = col_idx + 1
-                        if target_idx < len(row_cells):
-                            wartosc = str(wiersz_dane.get(klucz, ''))
-                            row_cells[target_idx].text = wartosc
+                # Kolumna 0 to zawsze Lp.
+                wiersze = [[str(i + 1)] + [str(wiersz_dane.get(klucz, '')) for klucz in mapowanie_kolumn]
+                           for i, wiersz_dane in enumerate(dane_tabeli)]
+                dopisz_wiersze(doc.tables[index_tabeli], wiersze)
             else:
                 return None, f"Brak tabeli o indeksie {index_tabeli} w szablonie."
 
-            final_bio = BytesIO()
-            doc.save(final_bio)
-            final_bio.seek(0)
-            return final_bio, None
-        
-        return temp_bio, None
+        return _zapisz_do_bufora(doc_tpl), None
+
+    except Exception as e:
+        return None, str(e)
+
+def generuj_dokument_seryjny(nazwa_szablonu, konteksty):
+    """
+    Korespondencja seryjna: jeden dokument, w którym każdy kontekst to osobna sekcja od nowej strony
+    (np. karty szkolenia wszystkich uczestników). Style, numeracja, motyw i czcionki są w pliku raz.
+    Nagłówki, stopki i właściwości dokumentu są wspólne - renderowane z pierwszym kontekstem.
+    """
+    if not konteksty:
+        return None, "Brak danych do korespondencji seryjnej."
+    try:
+        doc_tpl = szablon_docx(nazwa_szablonu)
+        doc_tpl.render(konteksty[0])
+        body = doc_tpl.docx.element.body
+        sect_pr = body.find(qn('w:sectPr'))
+
+        # Kolejne karty to tylko ciało szablonu - bez klonowania całego pakietu na każdą
+        karta = szablon_docx(nazwa_szablonu)
+        for kontekst in konteksty[1:]:
+            # Podział sekcji: kopia ustawień strony w ostatnim akapicie poprzedniej karty
+            ostatni = sect_pr.getprevious()
+            if ostatni is None or ostatni.tag != qn('w:p') or ostatni.find(qn('w:pPr') + '/' + qn('w:sectPr')) is not None:
+                ostatni = OxmlElement('w:p')
+                sect_pr.addprevious(ostatni)
+            p_pr = ostatni.find(qn('w:pPr'))
+            if p_pr is None:
+                p_pr = OxmlElement('w:pPr')
+                ostatni.insert(0, p_pr)
+            p_pr.append(copy.deepcopy(sect_pr))
+
+            cialo = karta.renderuj_cialo(kontekst)
+            # Zakładki (np. _GoBack) powtórzone w każdej karcie dałyby zdublowane identyfikatory
+            for zakladka in list(cialo.iter(qn('w:bookmarkStart'), qn('w:bookmarkEnd'))):
+                zakladka.getparent().remove(zakladka)
+            for element in list(cialo):
+                if element.tag != qn('w:sectPr'):
+                    sect_pr.addprevious(element)
+
+        # Identyfikatory obiektów rysunkowych muszą być unikalne w całym dokumencie
+        for i, doc_pr in enumerate(body.iter(qn('wp:docPr')), 1):
+            doc_pr.set('id', str(i))
+
+        return _zapisz_do_bufora(doc_tpl), None
 
     except Exception as e:
         return None, str(e)
@@ -42,7 +203,7 @@ def generuj_dokument_z_tabela(nazwa_szablonu, context, dane_tabeli=None, mapowan
 def generuj_docx_prosty(nazwa_szablonu, kontekst, nazwa_pliku_wynikowego):
     """Wrapper dla prostych dokumentów bez dynamicznych tabel."""
     try:
-        doc = DocxTemplate(nazwa_szablonu)
+        doc = szablon_docx(nazwa_szablonu)
         doc.render(kontekst)
         bio = BytesIO()
         doc.save(bio)
@@ -55,10 +216,7 @@ def generuj_docx_prosty(nazwa_szablonu, kontekst, nazwa_pliku_wynikowego):
 import re
 from docx.shared import Pt, RGBColor
 
-def generuj_docx_z_markdown(tekst_markdown):
-    """
-    Konwertuje tekst Markdown (nagłówki #, pogrubienia **) na sformatowany dokument Word.
-    """
+def _nowy_dokument():
     doc = Document()
     
     # Ustawiamy domyślną czcionkę
@@ -66,6 +224,33 @@ def generuj_docx_z_markdown(tekst_markdown):
     font = style.font
     font.name = 'Calibri'
     font.size = Pt(11)
+    return doc
+
+def _dodaj_tekst_z_pogrubieniami(p, tekst):
+    # Rozdzielamy tekst wg znaczników ** (pogrubienie)
+    # Przykład: "To jest **ważne** zdanie." -> ["To jest ", "ważne", " zdanie."]
+    czesci = re.split(r'(\*\*.*?\*\*)', tekst)
+    
+    for czesc in czesci:
+        if czesc.startswith('**') and czesc.endswith('**'):
+            # To jest tekst pogrubiony
+            run = p.add_run(czesc[2:-2]) # Usuwamy gwiazdki
+            run.bold = True
+        else:
+            # To jest zwykły tekst
+            p.add_run(czesc)
+
+def _zapisz_do_bufora(doc):
+    bio = BytesIO()
+    doc.save(bio)
+    bio.seek(0)
+    return bio
+
+def generuj_docx_z_markdown(tekst_markdown):
+    """
+    Konwertuje tekst Markdown (nagłówki #, pogrubienia **) na sformatowany dokument Word.
+    """
+    doc = _nowy_dokument()
 
     # Dzielimy tekst na akapity
     akapity = tekst_markdown.split('\n')
@@ -85,22 +270,39 @@ def generuj_docx_z_markdown(tekst_markdown):
         else:
             # Obsługa zwykłego tekstu z pogrubieniami
             p = doc.add_paragraph()
-            
-            # Rozdzielamy tekst wg znaczników ** (pogrubienie)
-            # Przykład: "To jest **ważne** zdanie." -> ["To jest ", "ważne", " zdanie."]
-            czesci = re.split(r'(\*\*.*?\*\*)', akapit)
-            
-            for czesc in czesci:
-                if czesc.startswith('**') and czesc.endswith('**'):
-                    # To jest tekst pogrubiony
-                    run = p.add_run(czesc[2:-2]) # Usuwamy gwiazdki
-                    run.bold = True
-                else:
-                    # To jest zwykły tekst
-                    p.add_run(czesc)
+            _dodaj_tekst_z_pogrubieniami(p, akapit)
                     
     # Zapis do bufora
-    bio = BytesIO()
-    doc.save(bio)
-    bio.seek(0)
-    return bio
\ No newline at end of file
+    return _zapisz_do_bufora(doc)
+
+def _dodaj_akapit(doc, akapit):
+    if akapit["rodzaj"] == "naglowek":
+        doc.add_heading(akapit["tekst"], level=4)
+        return
+    if akapit["rodzaj"] == "lista":
+        # Wbudowane style Worda: "List Bullet", "List Bullet 2", "List Bullet 3"
+        poziom = min(akapit.get("poziom", 0), 2)
+        p = doc.add_paragraph(style="List Bullet" if poziom == 0 else f"List Bullet {poziom + 1}")
+    else:
+        p = doc.add_paragraph()
+    _dodaj_tekst_z_pogrubieniami(p, akapit["tekst"])
+
+def generuj_docx_z_konspektu(konspekt):
+    """
+    Dokument Word wprost z konspektu programu (logic_ai.konspekt_z_tresci) - bez parsowania markdownu.
+    Wypunktowania dostają prawdziwe style list Worda.
+    """
+    doc = _nowy_dokument()
+    if konspekt["tytul"]:
+        doc.add_heading(konspekt["tytul"], level=1)
+    for akapit in konspekt["metryka"]:
+        _dodaj_akapit(doc, akapit)
+    for czesc in konspekt["czesci"]:
+        doc.add_heading(czesc["tytul"], level=2)
+        for akapit in czesc.get("akapity", []):
+            _dodaj_akapit(doc, akapit)
+        for punkt in czesc["punkty"]:
+            doc.add_heading(f"{punkt['oznaczenie']}. {punkt['tytul']}", level=3)
+            for akapit in punkt["akapity"]:
+                _dodaj_akapit(doc, akapit)
+    return _zapisz_do_bufora(doc)
\ No newline at end of file
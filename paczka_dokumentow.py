@@ -0,0 +1,187 @@
+"""
+Paczka dokumentów szkolenia budowana jako graf zadań.
+
+Każdy dokument (i każdy półprodukt, np. harmonogram zajęć albo treść pytań) to Zadanie z funkcją
+i zadeklarowanymi wejściami {argument: nazwa zadania}. Zadanie startuje, gdy gotowe są wszystkie
+jego wejścia, więc niezależne dokumenty powstają równolegle:
+
+- renderowanie DOCX (CPU) - w puli procesów (BHP_PROCESY_DOKUMENTOW, 0 = w wątkach),
+- wywołania modelu i drobne obliczenia - w wątkach (w aplikacji: logic_ai.uruchom_w_tle,
+  który przekazuje kontekst sesji Streamlit).
+
+Moduł nie importuje logic_ai: procesy robocze ładują tylko to, co potrzebne do renderowania.
+
+Błąd zadania nie przerywa paczki: pomijane są tylko zadania od niego zależne. Dla każdego
+zadania mierzony jest czas wykonania.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from logic_docs import generuj_dokument_seryjny, generuj_dokument_z_tabela, generuj_docx_prosty
+from utils import rozplanuj_zajecia
+
+# Jeden rdzeń zostaje dla serwera aplikacji; na maszynie jednordzeniowej renderowanie idzie do wątków
+LICZBA_PROCESOW = int(os.environ.get("BHP_PROCESY_DOKUMENTOW", str(min(4, (os.cpu_count() or 1) - 1))))
+
+class Zadanie:
+    """
+    Węzeł grafu. `funkcja(**parametry, **{argument: wynik zadania})` dla par z `wejscia`.
+    `w_procesie` - zadanie CPU (funkcja i parametry muszą dać się przesłać do procesu),
+    `plik` - nazwa w ZIP-ie dla zadań, których wynikiem są bajty dokumentu.
+    """
+
+    def __init__(self, nazwa, funkcja, wejscia=None, w_procesie=False, plik=None, **parametry):
+        self.nazwa = nazwa
+        self.funkcja = funkcja
+        self.wejscia = wejscia or {}
+        self.w_procesie = w_procesie
+        self.plik = plik
+        self.parametry = parametry
+
+# --- FUNKCJE ZADAŃ (na poziomie modułu, żeby dało się je wysłać do procesu) ---
+
+def _bajty(plik, blad):
+    if plik is None:
+        raise ValueError(blad or "Nie udało się wygenerować dokumentu.")
+    return plik.getvalue()
+
+def dokument_z_tabela(nazwa_szablonu, context, dane_tabeli, mapowanie_kolumn, index_tabeli=0):
+    return _bajty(*generuj_dokument_z_tabela(nazwa_szablonu, context, dane_tabeli, mapowanie_kolumn, index_tabeli))
+
+def dokument_seryjny(nazwa_szablonu, konteksty):
+    return _bajty(*generuj_dokument_seryjny(nazwa_szablonu, konteksty))
+
+def dokument_prosty(nazwa_szablonu, kontekst=None, **pola):
+    """Dokument z szablonu; `pola` (np. wyniki zadań wejściowych) uzupełniają kontekst."""
+    return _bajty(generuj_docx_prosty(nazwa_szablonu, {**(kontekst or {}), **pola}, nazwa_szablonu), None)
+
+def harmonogram_zajec(tematyka_lista, data_start):
+    """Zajęcia rozpisane na dni (rozplanuj_zajecia bez daty końca) - wejście dziennika zajęć."""
+    zajecia, _ = rozplanuj_zajecia(tematyka_lista, data_start)
+    return zajecia
+
+# --- WYKONANIE GRAFU ---
+
+_pula_watkow = ThreadPoolExecutor(max_workers=8, thread_name_prefix="paczka")
+_pula_procesow = None
+_blokada_puli = threading.Lock()
+
+def _pula():
+    """Wspólna pula procesów (rejestr szablonów w procesach zostaje ciepły między paczkami) albo None."""
+    global _pula_procesow
+    if LICZBA_PROCESOW <= 0:
+        return None
+    with _blokada_puli:
+        if _pula_procesow is None:
+            # spawn: fork procesu z wątkami serwera Streamlit może skopiować zajęte blokady
+            _pula_procesow = ProcessPoolExecutor(max_workers=LICZBA_PROCESOW, mp_context=multiprocessing.get_context("spawn"))
+        return _pula_procesow
+
+def _porzuc_pule(pula):
+    """Kolejne zadania dostaną nową pulę. Bez anulowania: w tej puli mogą czekać zadania innych paczek."""
+    global _pula_procesow
+    with _blokada_puli:
+        if _pula_procesow is pula:
+            _pula_procesow = None
+    pula.shutdown(wait=False)
+
+def _mierz(funkcja, argumenty):
+    start = time.perf_counter()
+    wynik = funkcja(**argumenty)
+    return wynik, time.perf_counter() - start
+
+def _kolejnosc(po_nazwie):
+    """Sprawdza graf: nieznane wejścia i cykle dają ValueError."""
+    stan = {}
+    def odwiedz(nazwa, sciezka):
+        if stan.get(nazwa) == "gotowe":
+            return
+        if stan.get(nazwa) == "w_toku":
+            raise ValueError(f"Cykl w grafie zadań: {' -> '.join(sciezka + [nazwa])}")
+        stan[nazwa] = "w_toku"
+        for wejscie in po_nazwie[nazwa].wejscia.values():
+            if wejscie not in po_nazwie:
+                raise ValueError(f"Zadanie '{nazwa}' wymaga nieznanego zadania '{wejscie}'")
+            odwiedz(wejscie, sciezka + [nazwa])
+        stan[nazwa] = "gotowe"
+    for nazwa in po_nazwie:
+        odwiedz(nazwa, [])
+
+def wykonaj_zadania(zadania, w_tle=None):
+    """
+    Wykonuje graf zadań. Zwraca (wyniki, czasy, bledy) - słowniki po nazwie zadania.
+    `w_tle(funkcja, *args) -> Future` zleca zadania wątkowe (domyślnie własna pula wątków).
+    """
+    w_tle = w_tle or _pula_watkow.submit
+    po_nazwie = {z.nazwa: z for z in zadania}
+    _kolejnosc(po_nazwie)
+    wyniki, czasy, bledy = {}, {}, {}
+    oczekujace = dict(po_nazwie)
+    w_toku = {}  # Future -> (zadanie, argumenty, pula procesów albo None)
+
+    def zlec(zadanie, argumenty, w_procesie):
+        pula = _pula() if w_procesie else None
+        if pula is not None:
+            try:
+                w_toku[pula.submit(_mierz, zadanie.funkcja, argumenty)] = (zadanie, argumenty, pula)
+                return
+            except (BrokenProcessPool, RuntimeError):
+                _porzuc_pule(pula)
+        w_toku[w_tle(_mierz, zadanie.funkcja, argumenty)] = (zadanie, argumenty, None)
+
+    while oczekujace or w_toku:
+        for nazwa, zadanie in list(oczekujace.items()):
+            if not all(w in wyniki or w in bledy for w in zadanie.wejscia.values()):
+                continue
+            del oczekujace[nazwa]
+            brakujace = [w for w in zadanie.wejscia.values() if w in bledy]
+            if brakujace:
+                bledy[nazwa] = f"Pominięte - błąd zadania: {', '.join(brakujace)}"
+                continue
+            argumenty = {**zadanie.parametry, **{arg: wyniki[w] for arg, w in zadanie.wejscia.items()}}
+            zlec(zadanie, argumenty, zadanie.w_procesie)
+
+        if not w_toku:
+            continue
+        gotowe, _ = wait(w_toku, return_when=FIRST_COMPLETED)
+        for future in gotowe:
+            zadanie, argumenty, pula = w_toku.pop(future)
+            try:
+                wyniki[zadanie.nazwa], czasy[zadanie.nazwa] = future.result()
+            except (BrokenProcessPool, CancelledError) as e:
+                if pula is None:
+                    bledy[zadanie.nazwa] = f"Zadanie przerwane: {type(e).__name__}"
+                    continue
+                # Proces roboczy padł (np. brak pamięci) albo zadanie anulowano w puli - jeszcze raz w wątku
+                _porzuc_pule(pula)
+                zlec(zadanie, argumenty, False)
+            except Exception as e:
+                bledy[zadanie.nazwa] = str(e)
+    return wyniki, czasy, bledy
+
+def zbuduj_paczke(zadania, pliki_dodatkowe=None, w_tle=None):
+    """
+    ZIP z wyników zadań, które mają `plik` (w kolejności listy zadań), plus `pliki_dodatkowe` {nazwa: tekst/bajty}.
+    Zwraca (bufor ZIP, raport, wyniki) - raport to wiersze {dokument, czas_s, blad} dla wszystkich zadań.
+    """
+    start = time.perf_counter()
+    wyniki, czasy, bledy = wykonaj_zadania(zadania, w_tle)
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as zf:
+        for zadanie in zadania:
+            if zadanie.plik and zadanie.nazwa in wyniki:
+                zf.writestr(zadanie.plik, wyniki[zadanie.nazwa])
+        for nazwa, tresc in (pliki_dodatkowe or {}).items():
+            zf.writestr(nazwa, tresc)
+    zip_buffer.seek(0)
+
+    raport = [{"dokument": z.plik or z.nazwa, "czas_s": round(czasy[z.nazwa], 3) if z.nazwa in czasy else None,
+               "blad": bledy.get(z.nazwa, "")} for z in zadania]
+    raport.append({"dokument": "RAZEM (zegarowo)", "czas_s": round(time.perf_counter() - start, 3), "blad": ""})
+    return zip_buffer, raport, wyniki
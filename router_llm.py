@@ -0,0 +1,231 @@
+"""
+Wybór modelu wg rodzaju zadania z bezpiecznikiem (circuit breaker):
+
+- zadania "ciezkie" (program, punkty programu, korekta) i "lekkie" (cel, pytania, godziny) mają
+  własne listy modeli w kolejności preferencji (BHP_MODELE_CIEZKIE / BHP_MODELE_LEKKIE, po przecinku),
+- dla każdej pary (zadanie, model) liczone są w oknie ostatnich wywołań czas (p95) i odsetek błędów,
+- przekroczenie SLO czasu albo progu błędów otwiera bezpiecznik: model jest pomijany przez
+  CZAS_OTWARCIA_S, potem przepuszczane jest jedno wywołanie próbne,
+- gdy żaden model nie jest dostępny, wywołanie od razu kończy się BladBackendu - logic_ai ma wtedy
+  ścieżki lokalne (cel z szablonu, godziny ze słów kluczowych).
+
+Przy starcie sprawdzana jest (w tle) lista modeli dostępnych dla klucza API (genai.list_models,
+jak w spr.py); modele spoza listy są wyłączane z tras.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import google.generativeai as genai
+
+from backend_llm import BladBackendu, utworz_backend
+from bramka_llm import BramkaLLM
+
+ZADANIE_CIEZKIE = "ciezkie"
+ZADANIE_LEKKIE = "lekkie"
+
+MODELE_CIEZKIE = os.environ.get("BHP_MODELE_CIEZKIE", "gemini-2.5-flash,gemini-2.0-flash")
+MODELE_LEKKIE = os.environ.get("BHP_MODELE_LEKKIE", "gemini-2.5-flash-lite,gemini-2.5-flash")
+
+# SLO: p95 czasu wywołania (s) w oknie ostatnich wywołań
+SLO_S = {
+    ZADANIE_CIEZKIE: float(os.environ.get("BHP_SLO_CIEZKIE_S", "90")),
+    ZADANIE_LEKKIE: float(os.environ.get("BHP_SLO_LEKKIE_S", "15")),
+}
+OKNO_WYWOLAN = 20
+MIN_PROBEK = 5
+MAKS_ODSETEK_BLEDOW = 0.5
+CZAS_OTWARCIA_S = float(os.environ.get("BHP_BEZPIECZNIK_S", "30"))
+
+class Bezpiecznik:
+    """Statystyki kroczące i stan bezpiecznika dla jednej pary (zadanie, model)."""
+
+    def __init__(self, slo_s):
+        self.slo_s = slo_s
+        self.okno = deque(maxlen=OKNO_WYWOLAN)  # (czas_s, ok)
+        self.otwarty_do = 0.0
+        self.proba_w_toku = False
+        self.niedostepny = False
+        self._blokada = threading.Lock()
+
+    def przepusc(self):
+        """Czy wolno teraz wywołać model. Po czasie otwarcia przepuszcza jedno wywołanie próbne."""
+        with self._blokada:
+            if self.niedostepny:
+                return False
+            if self.otwarty_do == 0.0:
+                return True
+            if time.monotonic() < self.otwarty_do or self.proba_w_toku:
+                return False
+            self.proba_w_toku = True
+            return True
+
+    def _p95(self):
+        czasy = sorted(c for c, _ in self.okno)
+        return czasy[min(len(czasy) - 1, int(len(czasy) * 0.95))] if czasy else 0.0
+
+    def _odsetek_bledow(self):
+        return sum(1 for _, ok in self.okno if not ok) / len(self.okno) if self.okno else 0.0
+
+    def zapisz(self, czas_s, ok):
+        with self._blokada:
+            proba = self.proba_w_toku
+            self.proba_w_toku = False
+            if proba:
+                # Wynik wywołania próbnego decyduje sam: sukces w SLO zamyka bezpiecznik od czystego okna
+                if ok and czas_s <= self.slo_s:
+                    self.otwarty_do = 0.0
+                    self.okno.clear()
+                else:
+                    self.otwarty_do = time.monotonic() + CZAS_OTWARCIA_S
+                self.okno.append((czas_s, ok))
+                return
+            self.okno.append((czas_s, ok))
+            if len(self.okno) >= MIN_PROBEK and (self._odsetek_bledow() >= MAKS_ODSETEK_BLEDOW or self._p95() > self.slo_s):
+                self.otwarty_do = time.monotonic() + CZAS_OTWARCIA_S
+
+    def porzuc(self):
+        """Wywołanie przerwane przez odbiorcę (porzucony strumień): bez wpisu do okna, zwalnia miejsce na próbę."""
+        with self._blokada:
+            self.proba_w_toku = False
+
+    def stan(self):
+        with self._blokada:
+            if self.niedostepny:
+                opis = "niedostępny"
+            elif self.otwarty_do == 0.0:
+                opis = "zamknięty"
+            else:
+                opis = "otwarty" if time.monotonic() < self.otwarty_do else "próba"
+            return {"stan": opis, "wywolania": len(self.okno), "p95_s": round(self._p95(), 2),
+                    "bledy": round(self._odsetek_bledow(), 2)}
+
+class RouterLLM:
+    """
+    Backend z wyborem modelu: generuj / generuj_strumien przyjmują dodatkowo `zadanie`.
+    `trasy` - {zadanie: [backend, ...]} w kolejności preferencji (bramki BramkaLLM z atrybutem model).
+    Do bezpiecznika trafia czas ostatniej próby zmierzony w bramce - sam model, bez kolejki
+    do limitów i bez odczekań przed ponowieniem.
+    """
+
+    def __init__(self, trasy, slo_s=SLO_S):
+        self.trasy = trasy
+        self._bezpieczniki = {(zadanie, b.model): Bezpiecznik(slo_s.get(zadanie, SLO_S[ZADANIE_CIEZKIE]))
+                              for zadanie, backendy in trasy.items() for b in backendy}
+
+    def model_zadania(self, zadanie):
+        """Nazwa modelu podstawowego dla zadania - stała część klucza cache (niezależna od awaryjnego wyboru)."""
+        return self.trasy[zadanie][0].model
+
+    @property
+    def model(self):
+        return self.model_zadania(ZADANIE_CIEZKIE)
+
+    def _kandydaci(self, zadanie):
+        return [(b, self._bezpieczniki[(zadanie, b.model)]) for b in self.trasy[zadanie]]
+
+    def _brak_modelu(self, zadanie, ostatni_blad):
+        komunikat = f"Brak dostępnego modelu dla zadania '{zadanie}'"
+        if ostatni_blad is not None:
+            komunikat += f" (ostatni błąd: {ostatni_blad})"
+        return BladBackendu(komunikat)
+
+    @staticmethod
+    def _czas_modelu(czasy, start):
+        """Czas ostatniej próby z bramki; gdy do modelu nie doszło - czas od startu."""
+        return czasy[-1] if czasy else time.monotonic() - start
+
+    def generuj(self, prompt, konfiguracja=None, zadanie=ZADANIE_CIEZKIE):
+        ostatni_blad = None
+        for backend, bezpiecznik in self._kandydaci(zadanie):
+            if not bezpiecznik.przepusc():
+                continue
+            start, czasy = time.monotonic(), []
+            try:
+                tekst = backend.generuj(prompt, konfiguracja, pomiar=czasy.append)
+            except Exception as e:
+                bezpiecznik.zapisz(self._czas_modelu(czasy, start), False)
+                ostatni_blad = e
+                continue
+            bezpiecznik.zapisz(self._czas_modelu(czasy, start), True)
+            return tekst
+        raise self._brak_modelu(zadanie, ostatni_blad) from ostatni_blad
+
+    def generuj_strumien(self, prompt, konfiguracja=None, zadanie=ZADANIE_CIEZKIE):
+        """
+        Przejście na kolejny model tylko przed pierwszym fragmentem (jak ponowienia w bramce).
+        Strumień porzucony przez odbiorcę nie jest ani sukcesem, ani błędem modelu.
+        """
+        ostatni_blad = None
+        for backend, bezpiecznik in self._kandydaci(zadanie):
+            if not bezpiecznik.przepusc():
+                continue
+            start, czasy = time.monotonic(), []
+            wyslano = False
+            ok = None  # None do końca - strumień porzucony (GeneratorExit) albo przerwany innym BaseException
+            try:
+                for fragment in backend.generuj_strumien(prompt, konfiguracja, pomiar=czasy.append):
+                    wyslano = True
+                    yield fragment
+                ok = True
+            except Exception as e:
+                ok = False
+                if wyslano:
+                    raise
+                ostatni_blad = e
+                continue
+            finally:
+                if ok is None:
+                    bezpiecznik.porzuc()
+                else:
+                    bezpiecznik.zapisz(self._czas_modelu(czasy, start), ok)
+            return
+        raise self._brak_modelu(zadanie, ostatni_blad) from ostatni_blad
+
+    def wylacz_niedostepne(self, dostepne):
+        """Wyłącza z tras modele spoza zbioru `dostepne` (nazwy bez prefiksu 'models/')."""
+        for (_, model), bezpiecznik in self._bezpieczniki.items():
+            if model not in dostepne:
+                bezpiecznik.niedostepny = True
+
+    def statystyki(self):
+        return {f"{zadanie}/{model}": b.stan() for (zadanie, model), b in self._bezpieczniki.items()}
+
+def dostepne_modele_gemini(limit_s=10):
+    """Modele obsługujące generateContent dla bieżącego klucza API (zbiór nazw) albo None, gdy sprawdzenie się nie udało."""
+    try:
+        return {m.name.removeprefix("models/") for m in genai.list_models(request_options={"timeout": limit_s})
+                if 'generateContent' in m.supported_generation_methods}
+    except Exception as e:
+        print(f"Nie udało się pobrać listy modeli: {e}")
+        return None
+
+def _lista_modeli(tekst):
+    return list(dict.fromkeys(m.strip() for m in tekst.split(",") if m.strip()))
+
+def utworz_router(rodzaj):
+    """
+    Router dla backendu wg nazwy (jak utworz_backend). Każdy model ma własną bramkę limitów.
+    Dla Gemini lista dostępnych modeli jest sprawdzana w tle, żeby nie opóźniać startu aplikacji.
+    """
+    if rodzaj != "gemini":
+        # Zaślepka i inne backendy jednomodelowe: ta sama instancja dla wszystkich zadań
+        return router_jednego_backendu(BramkaLLM(utworz_backend(rodzaj, _lista_modeli(MODELE_CIEZKIE)[0])))
+
+    bramki = {}
+    def _backendy(modele):
+        return [bramki.setdefault(m, BramkaLLM(utworz_backend("gemini", m))) for m in _lista_modeli(modele)]
+
+    router = RouterLLM({ZADANIE_CIEZKIE: _backendy(MODELE_CIEZKIE), ZADANIE_LEKKIE: _backendy(MODELE_LEKKIE)})
+
+    def _sprawdz():
+        dostepne = dostepne_modele_gemini()
+        if dostepne:
+            router.wylacz_niedostepne(dostepne)
+    threading.Thread(target=_sprawdz, name="sprawdz-modele", daemon=True).start()
+    return router
+
+def router_jednego_backendu(backend):
+    """Router, w którym wszystkie zadania idą do jednego backendu (np. zaślepki w benchmarku)."""
+    return RouterLLM({ZADANIE_CIEZKIE: [backend], ZADANIE_LEKKIE: [backend]})
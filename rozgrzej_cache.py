@@ -0,0 +1,122 @@
+"""
+Wstępne wypełnienie trwałego magazynu tekstów (uruchamiane przy starcie wdrożenia):
+
+    python rozgrzej_cache.py [--procesy 4] [--strony-na-zadanie 8]
+
+Ekstrahuje wszystkie PDF-y z 'baza_zawodow' i 'baza_wiedzy' w puli procesów, żeby pierwszy
+użytkownik nie czekał na parsowanie. Opisy zawodów idą jako jeden plik na zadanie,
+duże dokumenty bazy wiedzy są dzielone na zakresy stron.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PyPDF2 import PdfReader
+
+from data_manager import (
+    RODZAJ_BAZY, SEPARATOR_BAZY,
+    ekstrahuj_opis_zawodu, ekstrahuj_strony_pdf, odczytaj_tekst_z_cache,
+    rodzaj_opisu_zawodu, zapisz_tekst_w_cache
+)
+
+FOLDERY_BAZY_WIEDZY = ['baza_wiedzy', 'baza_wiedzy_new']
+
+def _zadanie_opis_zawodu(sciezka_pdf, rodzaj):
+    tekst = ekstrahuj_opis_zawodu(sciezka_pdf)
+    zapisz_tekst_w_cache(sciezka_pdf, tekst, rodzaj)
+    return len(tekst)
+
+def _zadanie_strony(sciezka_pdf, od, do):
+    return ekstrahuj_strony_pdf(sciezka_pdf, od, do, separator=SEPARATOR_BAZY)
+
+def _liczba_stron(sciezka_pdf):
+    with open(sciezka_pdf, "rb") as f:
+        pdf_reader = PdfReader(f)
+        return 0 if pdf_reader.is_encrypted else len(pdf_reader.pages)
+
+def _pliki_pdf(folder):
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.join(folder, p) for p in os.listdir(folder) if p.lower().endswith('.pdf'))
+
+def rozgrzej_cache(procesy=None, strony_na_zadanie=8, wymus=False):
+    """
+    Wypełnia magazyn tekstów dla wszystkich PDF-ów. Pliki z aktualnym wpisem są pomijane
+    (chyba że wymus=True). Zwraca statystyki: pliki, strony, bajty, czas.
+    """
+    start = time.perf_counter()
+    statystyki = {"pliki": 0, "pominiete": 0, "strony": 0, "bajty": 0, "bledy": 0}
+
+    zadania_zawodow = []
+    for sciezka in _pliki_pdf('baza_zawodow'):
+        rodzaj = rodzaj_opisu_zawodu(sciezka)
+        if not wymus and odczytaj_tekst_z_cache(sciezka, rodzaj) is not None:
+            statystyki["pominiete"] += 1
+            continue
+        zadania_zawodow.append((sciezka, rodzaj))
+
+    # Dokumenty bazy wiedzy: podział na zakresy stron, składane z powrotem w kolejności
+    zakresy = {}
+    for folder in FOLDERY_BAZY_WIEDZY:
+        for sciezka in _pliki_pdf(folder):
+            if not wymus and odczytaj_tekst_z_cache(sciezka, RODZAJ_BAZY) is not None:
+                statystyki["pominiete"] += 1
+                continue
+            try:
+                liczba = _liczba_stron(sciezka)
+            except Exception as e:
+                print(f"Błąd pliku {sciezka}: {e}")
+                statystyki["bledy"] += 1
+                continue
+            zakresy[sciezka] = [(od, min(od + strony_na_zadanie, liczba)) for od in range(0, liczba, strony_na_zadanie)]
+            statystyki["strony"] += liczba
+
+    with ProcessPoolExecutor(max_workers=procesy) as pula:
+        przyszle = {}
+        for sciezka, rodzaj in zadania_zawodow:
+            przyszle[pula.submit(_zadanie_opis_zawodu, sciezka, rodzaj)] = (sciezka, None)
+        for sciezka, lista in zakresy.items():
+            for od, do in lista:
+                przyszle[pula.submit(_zadanie_strony, sciezka, od, do)] = (sciezka, od)
+
+        czesci = {sciezka: {} for sciezka in zakresy}
+        for przyszly in as_completed(przyszle):
+            sciezka, od = przyszle[przyszly]
+            try:
+                wynik = przyszly.result()
+            except Exception as e:
+                print(f"Błąd pliku {sciezka}: {e}")
+                statystyki["bledy"] += 1
+                czesci.pop(sciezka, None)
+                continue
+            if od is None:
+                statystyki["pliki"] += 1
+                statystyki["bajty"] += os.path.getsize(sciezka)
+                print(f"✅ {sciezka} ({wynik} znaków)")
+            elif sciezka in czesci:
+                czesci[sciezka][od] = wynik
+                if len(czesci[sciezka]) == len(zakresy[sciezka]):
+                    tekst = "".join(czesci[sciezka][k] for k in sorted(czesci[sciezka]))
+                    zapisz_tekst_w_cache(sciezka, tekst, RODZAJ_BAZY)
+                    statystyki["pliki"] += 1
+                    statystyki["bajty"] += os.path.getsize(sciezka)
+                    print(f"✅ {sciezka} ({len(zakresy[sciezka])} zadań, {len(tekst)} znaków)")
+
+    statystyki["czas"] = time.perf_counter() - start
+    return statystyki
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wstępna ekstrakcja PDF-ów do trwałego cache tekstów.")
+    parser.add_argument("--procesy", type=int, default=None, help="Liczba procesów (domyślnie: liczba rdzeni)")
+    parser.add_argument("--strony-na-zadanie", type=int, default=8, help="Ile stron dużego PDF-a przypada na jedno zadanie")
+    parser.add_argument("--wymus", action="store_true", help="Ekstrahuj ponownie także pliki z aktualnym wpisem")
+    args = parser.parse_args()
+
+    wynik = rozgrzej_cache(args.procesy, args.strony_na_zadanie, args.wymus)
+    czas = max(wynik["czas"], 1e-9)
+    print("-" * 30)
+    print(f"Pliki: {wynik['pliki']} (pominięte jako aktualne: {wynik['pominiete']}, błędy: {wynik['bledy']})")
+    print(f"Strony bazy wiedzy: {wynik['strony']}")
+    print(f"Czas: {czas:.2f} s | {wynik['pliki'] / czas:.1f} plików/s | "
+          f"{wynik['strony'] / czas:.1f} stron/s | {wynik['bajty'] / czas / 1e6:.1f} MB/s")
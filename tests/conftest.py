@@ -0,0 +1,14 @@
+"""Testy działają offline: zaślepka modelu zamiast Gemini, a magazyn tekstów i cache odpowiedzi w katalogu tymczasowym."""
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("BHP_LLM_BACKEND", "lokalny")
+os.environ.setdefault("BHP_STUB_OPOZNIENIE", "0")
+os.environ.setdefault("BHP_STUB_TOKENY_NA_S", "0")
+# Bez setdefault: testy nie mogą czytać ani zapisywać prawdziwego .cache_bhp (moduły czytają te ścieżki przy imporcie)
+_KATALOG_TESTOW = tempfile.mkdtemp(prefix="bhp_testy_")
+os.environ["BHP_CACHE_DIR"] = os.path.join(_KATALOG_TESTOW, "cache_bhp")
+os.environ["BHP_LLM_CACHE"] = os.path.join(_KATALOG_TESTOW, "odpowiedzi_llm.sqlite")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
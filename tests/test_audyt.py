@@ -0,0 +1,42 @@
+from logic_ai import PODSTAWA_PRAWNA, konspekt_z_tresci, podziel_program_na_sekcje
+from utils import weryfikuj_tresc_szkolenia
+
+NAGLOWEK = f"""# SZCZEGÓŁOWY PROGRAM SZKOLENIA WSTĘPNEGO BHP
+
+**Stanowisko:** Kasjer  
+**Podstawa prawna:** {PODSTAWA_PRAWNA}
+"""
+
+def _program(podstawa_w_tresci, czesc_i="CZĘŚĆ I", czesc_ii="CZĘŚĆ II"):
+    przepis = "Rozporządzenie MGiP z 27 lipca 2004 r. w sprawie szkolenia" if podstawa_w_tresci else "Kodeks pracy"
+    return NAGLOWEK + f"""
+## {czesc_i}: INSTRUKTAŻ OGÓLNY
+
+1. **Istota bezpieczeństwa i higieny pracy**
+- Podstawa: {przepis}. Szkolenie trwa 3 godz.
+
+## {czesc_ii}: INSTRUKTAŻ STANOWISKOWY
+
+A. **Przygotowanie do pracy**
+- Ustawienie krzesła i monitora.
+"""
+
+def _podstawa(tresc):
+    raport = weryfikuj_tresc_szkolenia(tresc, "", konspekt_z_tresci(tresc))
+    return next(r["status"] for r in raport if r["test"] == "Podstawa prawna")
+
+def test_podstawa_prawna_tylko_w_metryce_to_brak():
+    assert _podstawa(_program(False)) == "BRAK ODWOŁANIA"
+
+def test_podstawa_prawna_w_tresci_punktu():
+    assert _podstawa(_program(True)) == "OK"
+
+def test_czesci_z_numerami_arabskimi():
+    tresc = _program(True, "CZĘŚĆ 1", "CZĘŚĆ 2")
+    oznaczenia = [s["oznaczenie"] for s in podziel_program_na_sekcje(tresc) if s["oznaczenie"]]
+    assert oznaczenia == ["CZĘŚĆ I", "1", "CZĘŚĆ II", "A"]
+
+    konspekt = konspekt_z_tresci(tresc)
+    assert [c["oznaczenie"] for c in konspekt["czesci"]] == ["I", "II"]
+    raport = {r["test"]: r["status"] for r in weryfikuj_tresc_szkolenia(tresc, "", konspekt)}
+    assert raport["Struktura: Instruktaż Stanowiskowy"] == "OK"
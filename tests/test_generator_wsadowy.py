@@ -0,0 +1,30 @@
+import zipfile
+
+import logic_ai
+from generator_wsadowy import przetworz_wiersz
+
+WIERSZ = {"firma": "Firma X", "kod_zawodu": "242307", "srodowisko": "Biuro", "obowiazki": "Praca przy komputerze",
+          "uczestnicy": "Jan Kowalski, 12.05.1985 | Anna Nowak, 20.01.1990"}
+
+
+def test_paczka_ma_rejestr_zaswiadczen(tmp_path):
+    wpis = przetworz_wiersz(1, WIERSZ, str(tmp_path))
+    assert wpis["status"] == "ok", wpis
+    with zipfile.ZipFile(tmp_path / wpis["plik"]) as zf:
+        assert "Rejestr_Zaswiadczen.docx" in zf.namelist()
+
+
+def test_blad_pytan_konczy_wiersz_bledem(tmp_path, monkeypatch):
+    monkeypatch.setattr(logic_ai, "generuj_test_bhp", lambda tresc: ("Błąd.", None))
+    wpis = przetworz_wiersz(2, WIERSZ, str(tmp_path))
+    assert wpis["status"] == "blad"
+    assert "pytań" in wpis["blad"]
+    assert not list(tmp_path.glob("*.zip"))
+
+
+def test_brak_dokumentu_konczy_wiersz_bledem(tmp_path, monkeypatch):
+    import generator_wsadowy
+    monkeypatch.setattr(generator_wsadowy, "generuj_dokument_seryjny", lambda *a: (None, "Zły szablon"))
+    wpis = przetworz_wiersz(3, WIERSZ, str(tmp_path))
+    assert wpis["status"] == "blad"
+    assert wpis["blad"] == "Karty_Szkolenia.docx: Zły szablon"
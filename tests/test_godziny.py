@@ -0,0 +1,18 @@
+from logic_ai import LISTA_AWARYJNA_GODZIN, przypisz_godziny_lokalnie
+
+SPIS = ["1. Wstęp", "2. Obowiązki pracownika", "3. Zagrożenia w zakładzie", "4. Ochrona przeciwpożarowa",
+        "5. Pierwsza pomoc", "A. Przygotowanie do pracy"]
+
+
+def test_temat_bez_bloku_nie_znika_z_tematyki():
+    bloki, pewnosc = przypisz_godziny_lokalnie(SPIS, LISTA_AWARYJNA_GODZIN)
+    nazwy = " ".join(b["nazwa"] for b in bloki)
+    assert all(temat.split(". ", 1)[1] in nazwy for temat in SPIS)
+    # "Wstęp" jest przypisany z sąsiedztwa, nie jednoznacznie - liczy się do pewności jako niepewny
+    assert pewnosc == 5 / 6
+    assert bloki[0]["nazwa"] == "1. Wstęp; Obowiązki pracownika"
+
+
+def test_godziny_blokow_bez_zmian():
+    bloki, _ = przypisz_godziny_lokalnie(SPIS, LISTA_AWARYJNA_GODZIN)
+    assert [b["godziny"] for b in bloki] == [b["godziny"] for b in LISTA_AWARYJNA_GODZIN]
@@ -0,0 +1,58 @@
+import threading
+import uuid
+
+import logic_ai
+from backend_llm import BackendLokalny
+
+ZAWODY = [
+    ("Kasjer", "[Źródło: A]\nobsługa kasy fiskalnej", "obsługa kasy"),
+    ("Magazynier", "[Źródło: B]\ntransport ręczny ładunków", "przenoszenie ładunków"),
+]
+
+
+class LiczacyBackend(BackendLokalny):
+    def __init__(self):
+        super().__init__(0, 0)
+        self.prompty = []
+        self._lista = threading.Lock()
+
+    def generuj(self, prompt, konfiguracja=None):
+        with self._lista:
+            self.prompty.append(prompt)
+        return super().generuj(prompt, konfiguracja)
+
+
+def _czesc_i(prompty):
+    return [p for p in prompty if "INSTRUKTAŻ OGÓLNY (CZĘŚĆ I" in p]
+
+
+def test_czesc_i_wspolna_dla_zawodow_firmy(monkeypatch):
+    backend = LiczacyBackend()
+    monkeypatch.setattr(logic_ai, "_backend", logic_ai.router_jednego_backendu(logic_ai.BramkaLLM(backend)))
+    firma = f"Firma {uuid.uuid4().hex[:8]}"  # świeże klucze - bez trafień z wcześniejszych testów
+
+    prompty_zawodow = []
+    for nazwa, kontekst_prawny, obowiazki in ZAWODY:
+        przed = len(backend.prompty)
+        program = "".join(logic_ai._strumien_sekcji(firma, nazwa, "opis", "", obowiazki, "biuro", kontekst_prawny))
+        assert "Błąd" not in program
+        prompty_zawodow.append(backend.prompty[przed:])
+
+    pierwszy, drugi = (_czesc_i(prompty) for prompty in prompty_zawodow)
+    # Pierwszy zawód generuje CZĘŚĆ I, drugi bierze ją w całości z cache
+    assert len(pierwszy) == len(logic_ai._plan_czesci_i("biuro"))
+    assert drugi == []
+    assert not any(kontekst in p for p in pierwszy for _, kontekst, _ in ZAWODY)
+    # Kontekst zawodu trafia do bloków CZĘŚCI II
+    assert any(ZAWODY[1][1] in p for p in prompty_zawodow[1])
+
+
+def test_prompty_czesci_i_nie_zaleza_od_zawodu(monkeypatch):
+    prompty = []
+    monkeypatch.setattr(logic_ai, "_zlec_sekcje", lambda prompt, tytul: prompty.append(prompt))
+    prompty_i = []
+    for nazwa, kontekst_prawny, obowiazki in ZAWODY:
+        prompty.clear()
+        next(logic_ai._strumien_sekcji("Firma", nazwa, "opis", "", obowiazki, "biuro", kontekst_prawny))
+        prompty_i.append(_czesc_i(prompty))
+    assert prompty_i[0] and prompty_i[0] == prompty_i[1]
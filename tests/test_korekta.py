@@ -0,0 +1,52 @@
+import pytest
+
+from logic_ai import podziel_program_na_sekcje, znajdz_sekcje_do_korekty
+
+PROGRAM = """# SZCZEGÓŁOWY PROGRAM SZKOLENIA WSTĘPNEGO BHP: Kasjer
+
+## CZĘŚĆ I: INSTRUKTAŻ OGÓLNY
+
+1. **Istota bezpieczeństwa i higieny pracy**
+- Pracownik poznaje podstawowe pojęcia.
+
+2. **Zakres obowiązków pracodawcy oraz pracowników**
+- Obowiązki pracownika wynikające z Kodeksu pracy.
+
+3. **Zasady poruszania się na terenie zakładu pracy**
+- Drogi komunikacyjne i ewakuacyjne, pracownik korzysta z poręczy.
+
+4. **Zagrożenia wypadkowe i zagrożenia dla zdrowia**
+- Pracownik zna czynniki szkodliwe.
+
+5. **Porządek w miejscu pracy**
+- Utrzymanie czystości stanowiska.
+
+## CZĘŚĆ II: INSTRUKTAŻ STANOWISKOWY
+
+### A. Przygotowanie do pracy
+- Ustawienie krzesła i monitora ekranowego przed rozpoczęciem pracy.
+
+### B. Przebieg procesu pracy
+- Obsługa kasy fiskalnej, pracownik robi przerwy.
+"""
+
+@pytest.fixture(scope="module")
+def sekcje():
+    return podziel_program_na_sekcje(PROGRAM)
+
+@pytest.mark.parametrize("polecenie, oczekiwane", [
+    ("W punkcie 5 dodaj schody", "5"),
+    ("punkt nr 5 dodaj schody", "5"),
+    ("w punkcie numer 3 popraw drogi ewakuacyjne", "3"),
+    ("pkt. 2 rozbuduj", "2"),
+    ("w bloku B dodaj przerwy", "B"),
+])
+def test_jawne_odwolanie_do_punktu(sekcje, polecenie, oczekiwane):
+    assert znajdz_sekcje_do_korekty(sekcje, polecenie)["oznaczenie"] == oczekiwane
+
+def test_jedno_wyrozniajace_slowo_wybiera_sekcje(sekcje):
+    assert znajdz_sekcje_do_korekty(sekcje, "Dodaj coś o monitorze")["oznaczenie"] == "A"
+
+def test_polecenie_dla_calosci_lub_bez_dopasowania(sekcje):
+    assert znajdz_sekcje_do_korekty(sekcje, "Popraw cały dokument") is None
+    assert znajdz_sekcje_do_korekty(sekcje, "Dodaj coś o wózkach widłowych") is None
@@ -0,0 +1,27 @@
+import shutil
+
+import pytest
+
+from data_manager import SEKCJE_BHP, ekstrahuj_opis_zawodu, podziel_opis_na_sekcje
+
+KOD = "242307"
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    sciezka = tmp_path / f"{KOD}.pdf"
+    shutil.copy(f"baza_zawodow/{KOD}.pdf", sciezka)
+    return sciezka
+
+
+def test_wyciag_z_rozdzialu_2_nie_zastepuje_pdf(pdf):
+    # Dołączony plik pomocniczy to wyciąg: pasuje nazwą zawodu, ale nie ma rozdziału 3
+    shutil.copy(f"{KOD}.txt", pdf.with_suffix(".txt"))
+    sekcje = podziel_opis_na_sekcje(ekstrahuj_opis_zawodu(str(pdf)))
+    assert all(numer in sekcje for numer in SEKCJE_BHP)
+
+
+def test_kompletny_plik_pomocniczy_jest_uzywany(pdf):
+    pelny = ekstrahuj_opis_zawodu(str(pdf))
+    pdf.with_suffix(".txt").write_text(pelny + "\nZNACZNIK PLIKU POMOCNICZEGO", encoding="utf-8")
+    assert ekstrahuj_opis_zawodu(str(pdf)).endswith("ZNACZNIK PLIKU POMOCNICZEGO")
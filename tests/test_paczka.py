@@ -0,0 +1,45 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import paczka_dokumentow
+from paczka_dokumentow import Zadanie, wykonaj_zadania
+
+
+def podwoj(liczba):
+    return 2 * liczba
+
+
+class PulaZBledem:
+    """Pula procesów, której zadania kończą się danym wyjątkiem (np. anulowane przez inną paczkę)."""
+
+    def __init__(self, blad):
+        self.blad = blad
+        self.zamknieta = False
+
+    def submit(self, *args):
+        future = Future()
+        if self.blad is None:
+            future.cancel()
+            future.set_running_or_notify_cancel()
+        else:
+            future.set_exception(self.blad)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        assert not cancel_futures
+        self.zamknieta = True
+
+
+@pytest.mark.parametrize("blad", [None, BrokenProcessPool("padł proces")], ids=["anulowane", "zepsuta_pula"])
+def test_zadanie_z_przerwanej_puli_wraca_do_watku(monkeypatch, blad):
+    pula = PulaZBledem(blad)
+    monkeypatch.setattr(paczka_dokumentow, "_pula", lambda: pula)
+    zadania = [Zadanie("liczba", podwoj, liczba=2), Zadanie("wynik", podwoj, {"liczba": "liczba"}, w_procesie=True)]
+
+    wyniki, _, bledy = wykonaj_zadania(zadania)
+
+    assert not bledy
+    assert wyniki == {"liczba": 4, "wynik": 8}
+    assert pula.zamknieta
@@ -0,0 +1,58 @@
+import time
+
+from bramka_llm import BramkaLLM
+from router_llm import ZADANIE_CIEZKIE, RouterLLM
+
+
+class Backend:
+    model = "testowy"
+
+    def __init__(self, bledy=0):
+        self.bledy = bledy
+
+    def generuj(self, prompt, konfiguracja=None):
+        if self.bledy:
+            self.bledy -= 1
+            raise RuntimeError("503 Service Unavailable")
+        return "odpowiedź"
+
+    def generuj_strumien(self, prompt, konfiguracja=None):
+        for fragment in ("a", "b", "c"):
+            yield fragment
+
+
+def _router(backend):
+    bramka = BramkaLLM(backend)
+    router = RouterLLM({ZADANIE_CIEZKIE: [bramka]})
+    return router, router._bezpieczniki[(ZADANIE_CIEZKIE, "testowy")]
+
+
+def test_czas_dla_bezpiecznika_bez_odczekania_przed_ponowieniem(monkeypatch):
+    monkeypatch.setattr(BramkaLLM, "_odczekaj_po_bledzie", lambda self, proba, blad: time.sleep(0.3))
+    router, bezpiecznik = _router(Backend(bledy=1))
+    assert router.generuj("prompt") == "odpowiedź"
+    (czas, ok), = bezpiecznik.okno
+    assert ok and czas < 0.1
+
+
+def test_porzucony_strumien_jest_neutralny_i_zwalnia_probe():
+    router, bezpiecznik = _router(Backend())
+    bezpiecznik.otwarty_do = time.monotonic() - 1  # po czasie otwarcia - następne wywołanie jest próbne
+
+    strumien = router.generuj_strumien("prompt")
+    assert next(strumien) == "a"
+    assert bezpiecznik.proba_w_toku
+    strumien.close()
+
+    assert not bezpiecznik.proba_w_toku
+    assert not bezpiecznik.okno
+    assert bezpiecznik.przepusc()
+
+
+def test_dokonczony_strumien_zamyka_bezpiecznik():
+    router, bezpiecznik = _router(Backend())
+    bezpiecznik.otwarty_do = time.monotonic() - 1
+
+    assert "".join(router.generuj_strumien("prompt")) == "abc"
+    assert bezpiecznik.otwarty_do == 0.0
+    assert not bezpiecznik.proba_w_toku
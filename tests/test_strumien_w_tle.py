@@ -0,0 +1,47 @@
+import threading
+import time
+
+import pytest
+
+from logic_ai import strumien_w_tle
+
+
+def test_fragmenty_czyta_inny_watek():
+    watki = []
+
+    def strumien():
+        for fragment in ("a", "b", "c"):
+            watki.append(threading.current_thread())
+            yield fragment
+
+    assert list(strumien_w_tle(strumien)) == ["a", "b", "c"]
+    assert threading.current_thread() not in watki
+
+
+def test_blad_producenta_trafia_do_odbiorcy():
+    def strumien():
+        yield "a"
+        raise RuntimeError("awaria")
+
+    odebrane = []
+    with pytest.raises(RuntimeError, match="awaria"):
+        for fragment in strumien_w_tle(strumien):
+            odebrane.append(fragment)
+    assert odebrane == ["a"]
+
+
+def test_porzucenie_zatrzymuje_producenta():
+    zamkniety = threading.Event()
+
+    def strumien():
+        try:
+            while True:
+                yield "x"
+                time.sleep(0.01)
+        finally:
+            zamkniety.set()
+
+    odbiorca = strumien_w_tle(strumien)
+    assert next(odbiorca) == "x"
+    odbiorca.close()
+    assert zamkniety.wait(2)
@@ -57,20 +57,32 @@ def rozplanuj_zajecia(tematyka_lista, data_start):
 
     return harmonogram, faktyczna_data_koniec
 
-def weryfikuj_tresc_szkolenia(tekst, uzyte_obowiazki_i_zagrozenia):
+def weryfikuj_tresc_szkolenia(tekst, uzyte_obowiazki_i_zagrozenia, konspekt=None):
     """
     Automatyczny audyt wygenerowanej treści. Sprawdza obecność kluczowych elementów.
+    Z konspektem (logic_ai.konspekt_z_tresci) struktura i podstawa prawna są sprawdzane na nim - podstawa
+    tylko w treści części i punktów: metryka zawsze ją podaje, więc nie świadczy o tym, co napisał model.
     Zwraca raport (lista słowników).
     """
     raport = []
+    if konspekt:
+        czesci = {c["oznaczenie"] for c in konspekt["czesci"] if c["punkty"]}
+        ma_ogolny, ma_stanowiskowy = "I" in czesci, "II" in czesci
+        przepisy = [a["tekst"] for c in konspekt["czesci"] for a in c["akapity"]]
+        przepisy += [p for c in konspekt["czesci"] for punkt in c["punkty"] for p in punkt["przepisy"]]
+        ma_podstawe = any(re.search(r"Rozporządzeni.*2004", p, re.IGNORECASE) for p in przepisy)
+    else:
+        ma_ogolny = re.search(r"CZĘŚĆ\s+1|INSTRUKTAŻ\s+OGÓLNY", tekst, re.IGNORECASE)
+        ma_stanowiskowy = re.search(r"CZĘŚĆ\s+2|INSTRUKTAŻ\s+STANOWISKOWY", tekst, re.IGNORECASE)
+        ma_podstawe = re.search(r"Rozporządzeni.*2004", tekst, re.IGNORECASE)
     
     # 1. Sprawdzenie struktury (Części)
-    if re.search(r"CZĘŚĆ\s+1|INSTRUKTAŻ\s+OGÓLNY", tekst, re.IGNORECASE):
+    if ma_ogolny:
         raport.append({"test": "Struktura: Instruktaż Ogólny", "status": "OK", "icon": "✅"})
     else:
         raport.append({"test": "Struktura: Instruktaż Ogólny", "status": "BRAK", "icon": "❌"})
 
-    if re.search(r"CZĘŚĆ\s+2|INSTRUKTAŻ\s+STANOWISKOWY", tekst, re.IGNORECASE):
+    if ma_stanowiskowy:
         raport.append({"test": "Struktura: Instruktaż Stanowiskowy", "status": "OK", "icon": "✅"})
     else:
         raport.append({"test": "Struktura: Instruktaż Stanowiskowy", "status": "BRAK", "icon": "❌"})
@@ -82,7 +94,7 @@ def weryfikuj_tresc_szkolenia(tekst, uzyte_obowiazki_i_zagrozenia):
         raport.append({"test": "Wymiar czasu", "status": "Ostrzeżenie (nie wykryto zapisu)", "icon": "⚠️"})
 
     # 3. Podstawa prawna (Rozporządzenie)
-    if re.search(r"Rozporządzeni.*2004", tekst, re.IGNORECASE):
+    if ma_podstawe:
         raport.append({"test": "Podstawa prawna", "status": "OK", "icon": "✅"})
     else:
         raport.append({"test": "Podstawa prawna", "status": "BRAK ODWOŁANIA", "icon": "❌"})
@@ -8,13 +8,15 @@ from docxtpl import DocxTemplate
 from docx import Document        
 import google.generativeai as genai
 # --- IMPORTY Z MODUŁÓW ---
-from data_manager import wczytaj_liste_zawodow_lokalnie, pobierz_opis_zawodu_lokalnie, laduj_baze_wiedzy
-from logic_ai import generuj_kompletne_szkolenie, generuj_cel_szkolenia, generuj_test_bhp, przypisz_godziny_do_tematow, MODEL_NAME
+from data_manager import szukaj_zawodow, ma_opis_zawodu, pobierz_opis_zawodu_do_szkolenia, laduj_baze_wiedzy
+from logic_ai import generuj_test_bhp, generuj_szkolenie_strumieniowo, MODEL_NAME
 from logic_docs import generuj_dokument_z_tabela, generuj_docx_prosty
 from utils import rozplanuj_zajecia
 from utils import rozplanuj_zajecia, weryfikuj_tresc_szkolenia
-from logic_docs import generuj_dokument_z_tabela, generuj_docx_prosty, generuj_docx_z_markdown # <--- DODANO
-from logic_ai import koryguj_tresc_szkolenia
+from logic_docs import generuj_dokument_z_tabela, generuj_docx_prosty, generuj_docx_z_markdown, generuj_docx_z_konspektu # <--- DODANO
+from logic_ai import koryguj_tresc_szkolenia, konspekt_z_tresci, pytania_kontrolne, uruchom_w_tle
+from paczka_dokumentow import Zadanie, dokument_prosty, dokument_seryjny, dokument_z_tabela, harmonogram_zajec, zbuduj_paczke
+from wyszukiwarka import kontekst_prawny_dla_szkolenia
 # ----- Konfiguracja Aplikacji
 st.set_page_config(page_title="Inteligentny Generator Szkoleń BHP", page_icon="🎓", layout="wide")
 
@@ -42,6 +44,8 @@ if 'cel_szkolenia_text' not in st.session_state:
     st.session_state.cel_szkolenia_text = ""
 if 'tematyka_z_godzinami' not in st.session_state:
     st.session_state.tematyka_z_godzinami = []
+if 'konspekt' not in st.session_state:
+    st.session_state.konspekt = None
 if 'cached_test_content' not in st.session_state:
     st.session_state.cached_test_content = None
 if 'cached_key_content' not in st.session_state:
@@ -59,8 +63,12 @@ if st.session_state.etap == 1:
     col1, col2 = st.columns(2)
     
     with col1:
-        lista_zawodow = wczytaj_liste_zawodow_lokalnie()
+        # Katalog może mieć tysiące pozycji - do listy trafiają tylko wyniki wyszukiwania
+        fraza_zawodu = st.text_input("Szukaj stanowiska (kod lub nazwa):", placeholder="Np. kadr, 2423, ksiegowy...")
+        lista_zawodow = szukaj_zawodow(fraza_zawodu, limit=50)
         wybrany_zawod_nazwa = st.selectbox("Stanowisko pracy:", options=list(lista_zawodow.keys()), index=None, placeholder="Wybierz zawód...")
+        if wybrany_zawod_nazwa and not ma_opis_zawodu(lista_zawodow[wybrany_zawod_nazwa]):
+            st.caption("ℹ️ Brak opisu tego zawodu w bazie - program powstanie na podstawie nazwy stanowiska i obowiązków.")
         nazwa_firmy = st.text_input("Nazwa firmy:", value="Przykładowa Firma S.A.")
 
     with col2:
@@ -132,67 +140,87 @@ if st.session_state.etap == 1:
         else:
             with st.spinner(f"Tworzenie materiałów dla: {wybrany_zawod_nazwa}..."):
                 kod_zawodu = lista_zawodow[wybrany_zawod_nazwa]
-                opis_zawodu = pobierz_opis_zawodu_lokalnie(kod_zawodu)
+                if ma_opis_zawodu(kod_zawodu):
+                    # Tylko sekcje istotne dla BHP (synteza, opis pracy, zagrożenia, zadania) - krótszy prompt
+                    opis_zawodu = pobierz_opis_zawodu_do_szkolenia(kod_zawodu)
+                else:
+                    opis_zawodu = f"Brak oficjalnego opisu w bazie. Stanowisko: {wybrany_zawod_nazwa}."
                 
                 # --- TUTAJ JEST ZMIANA (Łączenie środowisk) ---
                 # Tworzymy jedną zmienną tekstową z obu pól
                 srodowisko_full = srodowisko_glowne
                 if srodowiska_dodatkowe:
-                    # Dodajemy po przecinku wybrane dodatkowe miejsca
-                    lista_dodatkowych = ", ".join(srodowiska_dodatkowe)
+                    # Dodajemy po przecinku wybrane dodatkowe miejsca (posortowane - ten sam zestaw
+                    # środowisk daje ten sam tekst, więc CZĘŚĆ I firmy jest brana z cache)
+                    lista_dodatkowych = ", ".join(sorted(srodowiska_dodatkowe))
                     srodowisko_full += f" oraz okresowo: {lista_dodatkowych}"
                 
                 if "Błąd:" in opis_zawodu:
                     st.error(opis_zawodu)
                 else:
-                    # --- TUTAJ PRZEKAZUJESZ srodowisko_full ---
-                    finalna_tresc = generuj_kompletne_szkolenie(
-                        nazwa_firmy, 
-                        wybrany_zawod_nazwa, 
-                        opis_zawodu, 
-                        dodatkowe_zagrozenia,
-                        obowiazki,        # Pamiętaj o tym argumencie
-                        srodowisko_full   # <--- TU WSTAWIASZ NOWĄ ZMIENNĄ
-                    )
-                    
-               
-                
-                if "Błąd" not in finalna_tresc:
-                    # Zapisujemy główne dane
-                    st.session_state.finalna_tresc = finalna_tresc
+                    # Kilka najtrafniejszych fragmentów przepisów z bazy wiedzy (BM25)
+                    kontekst_prawny = kontekst_prawny_dla_szkolenia(wybrany_zawod_nazwa, srodowisko_full, obowiazki, dodatkowe_zagrozenia)
+
+                    # Program jest generowany strumieniowo już w Kroku 2 (podgląd na żywo)
+                    st.session_state.parametry_generowania = {
+                        "firma": nazwa_firmy,
+                        "nazwa_zawodu": wybrany_zawod_nazwa,
+                        "opis_zawodu": opis_zawodu,
+                        "dodatkowe_zagrozenia": dodatkowe_zagrozenia,
+                        "obowiazki": obowiazki,
+                        "srodowisko": srodowisko_full,
+                        "kontekst_prawny": kontekst_prawny
+                    }
                     st.session_state.zapisana_firma = nazwa_firmy
                     st.session_state.wybrany_zawod = wybrany_zawod_nazwa
                     st.session_state.dane_do_audytu = f"{obowiazki} {dodatkowe_zagrozenia}"
-                    
-                    # 2. Generowanie Celu Szkolenia (SMART)
-                    st.session_state.cel_szkolenia_text = generuj_cel_szkolenia(f"Szkolenie BHP: {wybrany_zawod_nazwa}")
-                    
-                    # 3. Wyciąganie spisu treści (Regex)
-                    # Próbujemy znaleźć linie wyglądające jak punkty spisu (np. "1. Temat")
-                    st.session_state.spis_tresci_do_tematyki = re.findall(r"^(?:\d+)\.\s.*", finalna_tresc, re.MULTILINE)
-
-                    # 4. Generowanie Tematyki z godzinami (KLUCZOWA POPRAWKA)
-                    # Wywołujemy to BEZWARUNKOWO. Funkcja w logic_ai.py sama zdecyduje:
-                    # - czy użyć AI (jeśli spis treści istnieje)
-                    # - czy użyć Listy Awaryjnej (jeśli spis jest pusty lub AI padnie)
-                    st.session_state.tematyka_z_godzinami = przypisz_godziny_do_tematow(st.session_state.spis_tresci_do_tematyki)
 
                     # Przejście dalej
                     st.session_state.etap = 2
                     st.rerun()
-                else:
-                    st.error(finalna_tresc) # Wyświetl błąd API jeśli wystąpił
 
 # --- Etap 2: Weryfikacja i Edycja Programu ---
 elif st.session_state.etap == 2:
     st.header("✅ Krok 2: Weryfikacja i Edycja Treści")
+
+    # === GENEROWANIE NA ŻYWO (tylko raz, zaraz po Kroku 1) ===
+    parametry = st.session_state.get('parametry_generowania')
+    if parametry:
+        st.info(f"Tworzenie materiałów dla: {parametry['nazwa_zawodu']}... Treść pojawia się na bieżąco.")
+        # Program płynie do st.write_stream, cel liczy się w tle, godziny zaraz po programie (logic_ai)
+        wyniki = generuj_szkolenie_strumieniowo(st.write_stream, **parametry)
+        st.session_state.parametry_generowania = None
+
+        finalna_tresc = wyniki["finalna_tresc"]
+        if "Błąd" in finalna_tresc:
+            st.error(finalna_tresc) # Wyświetl błąd API jeśli wystąpił
+            st.session_state.etap = 1
+            st.stop()
+
+        # Cel szkolenia (SMART), spis treści i tematyka z godzinami
+        # (przypisz_godziny_do_tematow sama wybiera AI albo Listę Awaryjną)
+        st.session_state.finalna_tresc = finalna_tresc
+        st.session_state.cel_szkolenia_text = wyniki["cel_szkolenia"]
+        st.session_state.cel_dopracowywany = wyniki["cel_dopracowywany"]
+        st.session_state.spis_tresci_do_tematyki = wyniki["spis_tresci"]
+        st.session_state.tematyka_z_godzinami = wyniki["tematyka_z_godzinami"]
+        # Struktura programu (JSON) - audyt i plik Word korzystają z niej bez ponownego parsowania
+        st.session_state.konspekt = wyniki["konspekt"]
+        st.rerun()
+
     st.success("Szkolenie wygenerowane pomyślnie!")
 
+    # Cel z szablonu podmieniamy na wersję zredagowaną przez model, gdy ta jest gotowa (bez czekania)
+    f_cel = st.session_state.get('cel_dopracowywany')
+    if f_cel is not None and f_cel.done():
+        st.session_state.cel_szkolenia_text = f_cel.result()
+        st.session_state.cel_dopracowywany = None
+
     # === AUDYT JAKOŚCI ===
     with st.expander("🔍 Raport Automatycznej Kontroli Jakości (Audyt Prawny)", expanded=True):
         st.markdown("System przeanalizował wygenerowany tekst pod kątem wymogów formalnych:")
         tekst_wsadowy = st.session_state.get('dane_do_audytu', '')
-        wyniki_audytu = weryfikuj_tresc_szkolenia(st.session_state.finalna_tresc, tekst_wsadowy)
+        wyniki_audytu = weryfikuj_tresc_szkolenia(st.session_state.finalna_tresc, tekst_wsadowy, st.session_state.konspekt)
         for wynik in wyniki_audytu:
             c1, c2 = st.columns([0.7, 0.3])
             c1.write(f"**{wynik['test']}**")
@@ -258,6 +286,7 @@ elif st.session_state.etap == 2:
         st.text_area("Edycja treści:", value=st.session_state.finalna_tresc, height=300, key="edycja_tekstu_area")
         if st.session_state.edycja_tekstu_area != st.session_state.finalna_tresc:
             st.session_state.finalna_tresc = st.session_state.edycja_tekstu_area
+            st.session_state.konspekt = konspekt_z_tresci(st.session_state.finalna_tresc)
             st.rerun()
 
     # --- ZMIANA TUTAJ: UŻYCIE EXPANDER ZAMIAST CONTAINER ---
@@ -274,9 +303,10 @@ elif st.session_state.etap == 2:
         if st.button("✨ Preredaguj treść z uwzględnieniem uwag"):
             if uwagi_do_korekty:
                 with st.spinner("AI nanosi poprawki..."):
-                    nowa_tresc = koryguj_tresc_szkolenia(st.session_state.finalna_tresc, uwagi_do_korekty)
+                    nowa_tresc = uruchom_w_tle(koryguj_tresc_szkolenia, st.session_state.finalna_tresc, uwagi_do_korekty).result()
                     if "Błąd" not in nowa_tresc:
                         st.session_state.finalna_tresc = nowa_tresc
+                        st.session_state.konspekt = konspekt_z_tresci(nowa_tresc)
                         st.rerun()
                     else:
                         st.error(nowa_tresc)
@@ -287,7 +317,10 @@ elif st.session_state.etap == 2:
     col_btn1, col_btn2 = st.columns([1, 1])
     
     with col_btn1:
-        docx_file = generuj_docx_z_markdown(st.session_state.finalna_tresc)
+        if st.session_state.konspekt:
+            docx_file = generuj_docx_z_konspektu(st.session_state.konspekt)
+        else:
+            docx_file = generuj_docx_z_markdown(st.session_state.finalna_tresc)
         st.download_button(
             label="📥 Pobierz treść jako WORD (.docx)",
             data=docx_file,
@@ -492,7 +525,7 @@ elif st.session_state.etap == 3:
                             'data_wystawienia': data_wystawienia.strftime("%d.%m.%Y"),
                             'nazwa_organizatora': st.session_state.zapisana_firma, 'miejsce': miejscowosc
                         }
-                        plik, blad = generuj_dokument_z_tabela("rejestr_zaswiadczen_szablon_uproszczony.docx", context, rejestr_dane, ['numer', 'imie_nazwisko', 'podpis_dummy', 'uwagi'], index_tabeli=2)
+                        plik, blad = generuj_dokument_z_tabela("rejestr_zaswiadczen_szablon_uproszczony.docx", context, rejestr_dane, ['numer', 'imie_nazwisko', 'podpis_dummy', 'uwagi'], index_tabeli=0)
                         if plik: st.download_button("📥 Pobierz Rejestr", plik, "Rejestr.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", use_container_width=True, key="dl_rejestr_final")
                         else: st.error(blad)
                     else: st.error("Brak uczestników.")
@@ -538,30 +571,13 @@ elif st.session_state.etap == 3:
                         zajecia, faktyczna_data = rozplanuj_zajecia(tematyka, data_start)
                         st.session_state.faktyczna_data_koniec = faktyczna_data
                         
-                        doc_tpl = DocxTemplate("dziennik_zajec_szablon_uproszczony.docx")
-                        doc_tpl.render({'nazwa_organizatora': st.session_state.zapisana_firma})
-                        bio = BytesIO(); doc_tpl.save(bio); bio.seek(0)
-                        
-                        # --- POPRAWKA: UŻYWAMY TABELI INDEX 0 (Wg Diagnostyki) ---
-                        doc = Document(bio)
-                        if doc.tables:
-                            # Tabela nr 0 to ta z lekcjami
-                            table = doc.tables[0] 
-                            
-                            for i, z in enumerate(zajecia):
-                                row = table.add_row().cells
-                                if len(row) >= 6:
-                                    row[0].text = str(i + 1)
-                                    row[1].text = z['data']
-                                    row[2].text = str(z['godziny'])
-                                    row[3].text = z['przedmiot']
-                                    row[4].text = z['temat']
-                                    row[5].text = "" # Podpis
-                        
-                        final_bio = BytesIO()
-                        doc.save(final_bio)
-                        final_bio.seek(0)
-                        st.download_button("📥 Pobierz Dziennik Zajęć", final_bio, "Dziennik_Zajec.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", use_container_width=True)
+                        # Tabela nr 0 to ta z lekcjami (Lp., data, godziny, przedmiot, temat, podpis)
+                        final_bio, blad = generuj_dokument_z_tabela("dziennik_zajec_szablon_uproszczony.docx", {'nazwa_organizatora': st.session_state.zapisana_firma},
+                                                                    zajecia, ['data', 'godziny', 'przedmiot', 'temat'])
+                        if final_bio:
+                            st.download_button("📥 Pobierz Dziennik Zajęć", final_bio, "Dziennik_Zajec.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", use_container_width=True)
+                        else:
+                            st.error(blad)
                     else:
                         st.error("Brak tematyki.")
 
@@ -700,7 +716,7 @@ elif st.session_state.etap == 3:
                     if st.session_state.finalna_tresc:
                         with st.spinner("AI opracowuje pytania sprawdzające..."):
                             # Funkcja generuj_test_bhp w logic_ai.py generuje teraz pytania otwarte!
-                            tresc_pytan, _ = generuj_test_bhp(st.session_state.finalna_tresc)
+                            tresc_pytan, _ = uruchom_w_tle(generuj_test_bhp, st.session_state.finalna_tresc).result()
                             st.session_state.cached_test_content = tresc_pytan
                     else:
                         st.warning("Najpierw wygeneruj program szkolenia w Kroku 1.")
@@ -731,166 +747,149 @@ elif st.session_state.etap == 3:
         elif not st.session_state.tematyka_z_godzinami:
             st.error("Brakuje tematyki szkolenia!")
         else:
-            zip_buffer = BytesIO()
             try:
-                with zipfile.ZipFile(zip_buffer, "w") as zf:
-                    
-                    # 1. KARTY SZKOLENIA (Zamiast Certyfikatów)
-                    inst_ogolny_zip = st.session_state.get("inst_ogolny_sel", "Instruktor")
-                    inst_stan_zip = st.session_state.get("inst_stan_sel", "Kierownik")
-                    data_stan_input = st.session_state.get("date_stanowiskowy_input", data_koniec)
-                    
-                    # Bezpieczne pobieranie nazwisk (pierwszy człon)
-                    i_ogolny = str(inst_ogolny_zip).split(',')[0].strip()
-                    i_stan = str(inst_stan_zip).split(',')[0].strip()
-                    d_stan = data_stan_input.strftime("%d.%m.%Y")
-
-                    for u in uczestnicy_dane_lista:
-                        context_karta = {
-                            'nazwa_firmy': st.session_state.zapisana_firma,
-                            'imie_nazwisko': u['imie_nazwisko'],
-                            'komorka_organizacyjna': u['miejsce_pracy'],
-                            'stanowisko': u['funkcja'],
-                            'dzien_rozpoczecia': data_start.strftime("%d.%m.%Y"),
-                            'instruktor_ogolny': i_ogolny,
-                            'data_stanowiskowego': d_stan,
-                            'instruktor_stanowiskowy': i_stan
-                        }
-                        plik = generuj_docx_prosty("Wzor-Karta-szkolenia-wstepnego-BHP.docx", context_karta, "temp.docx")
-                        if plik: zf.writestr(f"Karty_Szkolenia/Karta_{u['imie_nazwisko']}.docx", plik.getvalue())
-
-                    # 2. REJESTR (Z numeracją)
-                    rejestr_dane = []
-                    for i, u in enumerate(uczestnicy_dane_lista):
-                        rejestr_dane.append({'numer': f"{nr_kursu}/{i+1}", 'imie_nazwisko': u['imie_nazwisko'], 'uwagi': ''})
-                    
-                    context_rej = {
-                        'rodzaj_szkolenia': "wstępnego", 'nr_kursu': nr_kursu,
-                        'kierownik_nazwisko': kierownik_kursu,
-                        'data_wystawienia': data_wystawienia.strftime("%d.%m.%Y"),
-                        'nazwa_organizatora': st.session_state.zapisana_firma, 'miejsce': miejscowosc
-                    }
-                    plik, _ = generuj_dokument_z_tabela("rejestr_zaswiadczen_szablon_uproszczony.docx", context_rej, rejestr_dane, ['numer', 'imie_nazwisko', 'podpis_dummy', 'uwagi'], index_tabeli=2)
-                    if plik: zf.writestr("Rejestr_Zaswiadczen.docx", plik.getvalue())
-
-                    # 3. TEMATYKA
-                    tematyka = st.session_state.tematyka_z_godzinami
-                    total_h = sum(t.get('godziny', 0) for t in tematyka if isinstance(t.get('godziny'), (int, float)))
-                    tematyka_display = [{"nazwa": t.get('nazwa',''), "godziny": t.get('godziny',0), "praktyka": "0"} for t in tematyka]
-                    tematyka_display.append({"nazwa": "RAZEM:", "godziny": f"{total_h:.1f}", "praktyka": "0"})
-                    plik, _ = generuj_dokument_z_tabela("tematyka_szablon_uproszczony.docx", {}, tematyka_display, ['nazwa', 'godziny', 'praktyka'])
-                    if plik: zf.writestr("Tematyka_Szkolenia.docx", plik.getvalue())
-
-                   # 4. DZIENNIK ZAJĘĆ
-                    zajecia, _ = rozplanuj_zajecia(tematyka, data_start)
-                    doc_tpl = DocxTemplate("dziennik_zajec_szablon_uproszczony.docx")
-                    doc_tpl.render({'nazwa_organizatora': st.session_state.zapisana_firma})
-                    bio = BytesIO(); doc_tpl.save(bio); bio.seek(0)
-                    
-                    # --- POPRAWKA: INDEX 0 ---
-                    doc = Document(bio)
-                    if doc.tables:
-                        table = doc.tables[0] # <--- TU BYŁA ZMIANA (Na 0)
-                        for i, z in enumerate(zajecia):
-                            row = table.add_row().cells
-                            if len(row) >= 6:
-                                row[0].text = str(i+1); row[1].text = z['data']; row[2].text = str(z['godziny']); row[3].text = z['przedmiot']; row[4].text = z['temat']
-                    
-                    final_bio = BytesIO(); doc.save(final_bio); final_bio.seek(0)
-                    zf.writestr("Dziennik_Zajec.docx", final_bio.getvalue())
-
-                    # 5. DZIENNIK LEKCYJNY (ZIP - ZLOGICZNYM PODZIAŁEM GODZIN)
-                    
-                    # Krok A: Pobieramy listę wykładowców (Wybranych lub Wszystkich)
-                    wybrani_wykladowcy_zip = st.session_state.get("wykladowcy_multiselect", [])
-                    baza_wyk_raw = st.session_state.get("baza_wykladowcow_key", "")
-                    opcje_bazy_wyk = [x.strip() for x in baza_wyk_raw.splitlines() if x.strip()]
+                # Każdy dokument to zadanie z zadeklarowanymi wejściami - niezależne renderują się równolegle
+                # (DOCX w procesach, pytania z modelu w wątku), a kolejność plików w ZIP-ie jest stała.
+                zadania = []
+
+                # 1. KARTY SZKOLENIA (Zamiast Certyfikatów)
+                inst_ogolny_zip = st.session_state.get("inst_ogolny_sel", "Instruktor")
+                inst_stan_zip = st.session_state.get("inst_stan_sel", "Kierownik")
+                data_stan_input = st.session_state.get("date_stanowiskowy_input", data_koniec)
+                
+                # Bezpieczne pobieranie nazwisk (pierwszy człon)
+                i_ogolny = str(inst_ogolny_zip).split(',')[0].strip()
+                i_stan = str(inst_stan_zip).split(',')[0].strip()
+                d_stan = data_stan_input.strftime("%d.%m.%Y")
+
+                # Wszystkie karty w jednym pliku (korespondencja seryjna: karta = sekcja od nowej strony)
+                konteksty_kart = [{
+                    'nazwa_firmy': st.session_state.zapisana_firma,
+                    'imie_nazwisko': u['imie_nazwisko'],
+                    'komorka_organizacyjna': u['miejsce_pracy'],
+                    'stanowisko': u['funkcja'],
+                    'dzien_rozpoczecia': data_start.strftime("%d.%m.%Y"),
+                    'instruktor_ogolny': i_ogolny,
+                    'data_stanowiskowego': d_stan,
+                    'instruktor_stanowiskowy': i_stan
+                } for u in uczestnicy_dane_lista]
+                zadania.append(Zadanie("karty", dokument_seryjny, w_procesie=True, plik="Karty_Szkolenia.docx",
+                                       nazwa_szablonu="Wzor-Karta-szkolenia-wstepnego-BHP.docx", konteksty=konteksty_kart))
+
+                # 2. REJESTR (Z numeracją)
+                rejestr_dane = []
+                for i, u in enumerate(uczestnicy_dane_lista):
+                    rejestr_dane.append({'numer': f"{nr_kursu}/{i+1}", 'imie_nazwisko': u['imie_nazwisko'], 'uwagi': ''})
+                
+                context_rej = {
+                    'rodzaj_szkolenia': "wstępnego", 'nr_kursu': nr_kursu,
+                    'kierownik_nazwisko': kierownik_kursu,
+                    'data_wystawienia': data_wystawienia.strftime("%d.%m.%Y"),
+                    'nazwa_organizatora': st.session_state.zapisana_firma, 'miejsce': miejscowosc
+                }
+                zadania.append(Zadanie("rejestr", dokument_z_tabela, w_procesie=True, plik="Rejestr_Zaswiadczen.docx",
+                                       nazwa_szablonu="rejestr_zaswiadczen_szablon_uproszczony.docx", context=context_rej, dane_tabeli=rejestr_dane,
+                                       mapowanie_kolumn=['numer', 'imie_nazwisko', 'podpis_dummy', 'uwagi'], index_tabeli=0))
+
+                # 3. TEMATYKA
+                tematyka = st.session_state.tematyka_z_godzinami
+                total_h = sum(t.get('godziny', 0) for t in tematyka if isinstance(t.get('godziny'), (int, float)))
+                tematyka_display = [{"nazwa": t.get('nazwa',''), "godziny": t.get('godziny',0), "praktyka": "0"} for t in tematyka]
+                tematyka_display.append({"nazwa": "RAZEM:", "godziny": f"{total_h:.1f}", "praktyka": "0"})
+                zadania.append(Zadanie("tematyka", dokument_z_tabela, w_procesie=True, plik="Tematyka_Szkolenia.docx",
+                                       nazwa_szablonu="tematyka_szablon_uproszczony.docx", context={}, dane_tabeli=tematyka_display,
+                                       mapowanie_kolumn=['nazwa', 'godziny', 'praktyka']))
+
+                # 4. DZIENNIK ZAJĘĆ (zależy od harmonogramu z rozplanuj_zajecia)
+                zadania.append(Zadanie("zajecia", harmonogram_zajec, tematyka_lista=tematyka, data_start=data_start))
+                zadania.append(Zadanie("dziennik_zajec", dokument_z_tabela, wejscia={'dane_tabeli': "zajecia"}, w_procesie=True, plik="Dziennik_Zajec.docx",
+                                       nazwa_szablonu="dziennik_zajec_szablon_uproszczony.docx", context={'nazwa_organizatora': st.session_state.zapisana_firma},
+                                       mapowanie_kolumn=['data', 'godziny', 'przedmiot', 'temat']))
+
+                # 5. DZIENNIK LEKCYJNY (ZIP - ZLOGICZNYM PODZIAŁEM GODZIN)
+                
+                # Krok A: Pobieramy listę wykładowców (Wybranych lub Wszystkich)
+                wybrani_wykladowcy_zip = st.session_state.get("wykladowcy_multiselect", [])
+                baza_wyk_raw = st.session_state.get("baza_wykladowcow_key", "")
+                opcje_bazy_wyk = [x.strip() for x in baza_wyk_raw.splitlines() if x.strip()]
+                
+                finalna_lista_zip = wybrani_wykladowcy_zip if wybrani_wykladowcy_zip else opcje_bazy_wyk
+                
+                if finalna_lista_zip:
+                    # Krok B: Obliczamy całkowitą liczbę godzin szkolenia
+                    total_h_szkolenia = 0
+                    if tematyka:
+                        total_h_szkolenia = sum(float(t.get('godziny', 0)) for t in tematyka)
                     
-                    finalna_lista_zip = wybrani_wykladowcy_zip if wybrani_wykladowcy_zip else opcje_bazy_wyk
+                    # Krok C: Dzielimy godziny po równo na liczbę wykładowców
+                    liczba_wykladowcow = len(finalna_lista_zip)
+                    godziny_na_glowe = total_h_szkolenia / liczba_wykladowcow if liczba_wykladowcow > 0 else 0
                     
-                    if finalna_lista_zip:
-                        # Krok B: Obliczamy całkowitą liczbę godzin szkolenia
-                        total_h_szkolenia = 0
-                        if tematyka:
-                            total_h_szkolenia = sum(float(t.get('godziny', 0)) for t in tematyka)
-                        
-                        # Krok C: Dzielimy godziny po równo na liczbę wykładowców
-                        liczba_wykladowcow = len(finalna_lista_zip)
-                        godziny_na_glowe = total_h_szkolenia / liczba_wykladowcow if liczba_wykladowcow > 0 else 0
-                        
-                        wykladowcy_lista = []
-                        for linia in finalna_lista_zip:
-                            parts = [p.strip() for p in linia.split(',', 2)]
-                            if len(parts) == 3:
-                                wykladowcy_lista.append({
-                                    'imie_nazwisko': parts[0], 
-                                    'miejsce_pracy': parts[1], 
-                                    'funkcja': parts[2], 
-                                    'przedmiot': 'Szkolenie wstępne BHP', 
-                                    # Formatujemy do 1 miejsca po przecinku (np. "2.5")
-                                    'godziny_plan': f"{godziny_na_glowe:.1f}", 
-                                    'godziny_wykonanie': f"{godziny_na_glowe:.1f}"
-                                })
-                        
-                        if wykladowcy_lista:
-                            # Wiersz RAZEM
+                    wykladowcy_lista = []
+                    for linia in finalna_lista_zip:
+                        parts = [p.strip() for p in linia.split(',', 2)]
+                        if len(parts) == 3:
                             wykladowcy_lista.append({
-                                'imie_nazwisko': '', 'miejsce_pracy': '', 'funkcja': '', 
-                                'przedmiot': 'RAZEM:', 
-                                'godziny_plan': f"{total_h_szkolenia:.1f}", 
-                                'godziny_wykonanie': f"{total_h_szkolenia:.1f}"
+                                'imie_nazwisko': parts[0], 
+                                'miejsce_pracy': parts[1], 
+                                'funkcja': parts[2], 
+                                'przedmiot': 'Szkolenie wstępne BHP', 
+                                # Formatujemy do 1 miejsca po przecinku (np. "2.5")
+                                'godziny_plan': f"{godziny_na_glowe:.1f}", 
+                                'godziny_wykonanie': f"{godziny_na_glowe:.1f}"
                             })
-                            
-                            context_lek = {
-                                'nazwa_organizatora': st.session_state.zapisana_firma,
-                                'dla_kogo': f"Szkolenie dla: {st.session_state.wybrany_zawod}",
-                                'data_od': data_start.strftime("%d.%m.%Y"), 
-                                'data_do': data_koniec.strftime("%d.%m.%Y"),
-                                'miejsce': miejscowosc, 
-                                'kierownik_nazwisko': kierownik_kursu, 
-                                'kierownik_miejsce_pracy_funkcja': "Kierownik Szkolenia"
-                            }
-                            
-                            # Pamiętaj, żeby ustawić tu taki sam index_tabeli jaki wyjdzie Ci z diagnostyki! (Domyślnie 4)
-                            plik, _ = generuj_dokument_z_tabela(
-                                "dziennik_lekcyjny_szablon_uproszczony.docx", 
-                                context_lek, 
-                                wykladowcy_lista, 
-                                ['imie_nazwisko', 'miejsce_pracy', 'funkcja', 'przedmiot', 'godziny_plan', 'godziny_wykonanie'], 
-                                index_tabeli=4 
-                            )
-                            if plik: zf.writestr("Dziennik_Lekcyjny.docx", plik.getvalue())
-
-                    # 6. WYKAZ UCZESTNIKÓW
-                    plik, _ = generuj_dokument_z_tabela("wykaz_uczestnikow_szablon_uproszczony.docx", {}, uczestnicy_dane_lista, ['imie_nazwisko', 'miejsce_pracy', 'funkcja', 'data_urodzenia'])
-                    if plik: zf.writestr("Wykaz_Uczestnikow.docx", plik.getvalue())
-
-                    # 7. PYTANIA KONTROLNE (Auto-generowanie w locie)
                     
-                    # Krok A: Sprawdzamy, czy pytania już istnieją. Jeśli NIE, generujemy je teraz.
-                    if not st.session_state.cached_test_content and st.session_state.finalna_tresc:
-                        # Nie używamy st.spinner tutaj, bo jesteśmy wewnątrz bloku ZIP, 
-                        # ale funkcja zadziała szybko w tle.
-                        try:
-                            tresc_pytan, _ = generuj_test_bhp(st.session_state.finalna_tresc)
-                            st.session_state.cached_test_content = tresc_pytan
-                        except Exception as e:
-                            print(f"Nie udało się wygenerować pytań w locie: {e}")
-
-                    # Krok B: Dodajemy do ZIP (teraz mamy pewność, że dane są, chyba że API padło)
-                    if st.session_state.cached_test_content:
-                         ctx_pytania = {
-                             'nazwa_szkolenia': f"Pytania kontrolne: {st.session_state.wybrany_zawod}", 
-                             'tresc_testu': st.session_state.cached_test_content
-                         }
-                         plik = generuj_docx_prosty("test_szablon.docx", ctx_pytania, "temp.docx")
-                         if plik: zf.writestr("Pytania_Kontrolne.docx", plik.getvalue())
-
-                    # 8. TREŚĆ MERYTORYCZNA
-                    zf.writestr(f"Program_Szkolenia_{st.session_state.wybrany_zawod}.txt", st.session_state.finalna_tresc)
-
-                zip_buffer.seek(0)
+                    if wykladowcy_lista:
+                        # Wiersz RAZEM
+                        wykladowcy_lista.append({
+                            'imie_nazwisko': '', 'miejsce_pracy': '', 'funkcja': '', 
+                            'przedmiot': 'RAZEM:', 
+                            'godziny_plan': f"{total_h_szkolenia:.1f}", 
+                            'godziny_wykonanie': f"{total_h_szkolenia:.1f}"
+                        })
+                        
+                        context_lek = {
+                            'nazwa_organizatora': st.session_state.zapisana_firma,
+                            'dla_kogo': f"Szkolenie dla: {st.session_state.wybrany_zawod}",
+                            'data_od': data_start.strftime("%d.%m.%Y"), 
+                            'data_do': data_koniec.strftime("%d.%m.%Y"),
+                            'miejsce': miejscowosc, 
+                            'kierownik_nazwisko': kierownik_kursu, 
+                            'kierownik_miejsce_pracy_funkcja': "Kierownik Szkolenia"
+                        }
+                        
+                        # Pamiętaj, żeby ustawić tu taki sam index_tabeli jaki wyjdzie Ci z diagnostyki! (Domyślnie 4)
+                        zadania.append(Zadanie("dziennik_lekcyjny", dokument_z_tabela, w_procesie=True, plik="Dziennik_Lekcyjny.docx",
+                                               nazwa_szablonu="dziennik_lekcyjny_szablon_uproszczony.docx", context=context_lek, dane_tabeli=wykladowcy_lista,
+                                               mapowanie_kolumn=['imie_nazwisko', 'miejsce_pracy', 'funkcja', 'przedmiot', 'godziny_plan', 'godziny_wykonanie'],
+                                               index_tabeli=4))
+
+                # 6. WYKAZ UCZESTNIKÓW
+                zadania.append(Zadanie("wykaz", dokument_z_tabela, w_procesie=True, plik="Wykaz_Uczestnikow.docx",
+                                       nazwa_szablonu="wykaz_uczestnikow_szablon_uproszczony.docx", context={}, dane_tabeli=uczestnicy_dane_lista,
+                                       mapowanie_kolumn=['imie_nazwisko', 'miejsce_pracy', 'funkcja', 'data_urodzenia']))
+
+                # 7. PYTANIA KONTROLNE (gotowe z sesji albo generowane w wątku - reszta paczki na nie nie czeka)
+                if st.session_state.cached_test_content or st.session_state.finalna_tresc:
+                    zadania.append(Zadanie("tresc_pytan", pytania_kontrolne, finalna_tresc=st.session_state.finalna_tresc,
+                                           gotowe=st.session_state.cached_test_content))
+                    zadania.append(Zadanie("pytania", dokument_prosty, wejscia={'tresc_testu': "tresc_pytan"}, w_procesie=True, plik="Pytania_Kontrolne.docx",
+                                           nazwa_szablonu="test_szablon.docx", kontekst={'nazwa_szkolenia': f"Pytania kontrolne: {st.session_state.wybrany_zawod}"}))
+
+                # 8. TREŚĆ MERYTORYCZNA
+                pliki_tekstowe = {f"Program_Szkolenia_{st.session_state.wybrany_zawod}.txt": st.session_state.finalna_tresc}
+
+                with st.spinner("Generowanie dokumentów..."):
+                    zip_buffer, raport, wyniki_paczki = zbuduj_paczke(zadania, pliki_tekstowe, w_tle=uruchom_w_tle)
+                if wyniki_paczki.get("tresc_pytan"):
+                    st.session_state.cached_test_content = wyniki_paczki["tresc_pytan"]
+
                 st.success("Paczka dokumentów gotowa!")
+                pominiete = [r for r in raport if r["blad"]]
+                if pominiete:
+                    st.warning("Nie wszystkie dokumenty trafiły do paczki: " + "; ".join(f"{r['dokument']}: {r['blad']}" for r in pominiete))
+                with st.expander("⏱️ Czasy generowania dokumentów"):
+                    st.dataframe(pd.DataFrame(raport), use_container_width=True, hide_index=True)
                 st.download_button(
                     label="📦 POBIERZ PLIK ZIP",
                     data=zip_buffer,
@@ -0,0 +1,157 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from data_manager import normalizuj_tekst, stan_folderu_bazy, wczytaj_dokumenty_bazy
+
+# Parametry BM25 (wartości standardowe)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Docelowy rozmiar fragmentu (w znakach) - akapity są łączone do tej długości
+DLUGOSC_FRAGMENTU = 900
+MAKS_DLUGOSC_FRAGMENTU = 1500
+
+# Polski odmienia końcówki, więc porównujemy początki słów (prosty "stemming" przez obcięcie)
+DLUGOSC_RDZENIA = 6
+
+STOP_SLOWA = {
+    "a", "aby", "albo", "ale", "bez", "by", "byc", "czy", "dla", "do", "gdy", "i", "ich", "ile", "im",
+    "innych", "jak", "jako", "je", "jego", "jej", "jest", "jesli", "juz", "lub", "ma", "moze", "na",
+    "nad", "nie", "niz", "o", "od", "oraz", "po", "pod", "przed", "przez", "przy", "sa", "sie", "ta",
+    "tak", "te", "tego", "tej", "ten", "to", "tym", "u", "w", "we", "z", "za", "ze", "zgodnie", "ktore",
+    "ktory", "ktorych", "ktorej", "pkt", "ust", "lit", "poz", "r", "dnia", "oraz"
+}
+
+# Linie, które zaczynają nową jednostkę tekstu prawnego
+_WZORZEC_POCZATKU_JEDNOSTKI = re.compile(r"^\s*(§\s*\d|Art\.\s*\d|Rozdział\s|\d{1,2}\.\s+[A-ZĄĆĘŁŃÓŚŹŻ]|[IVX]+\.\s)")
+
+def tokenizuj(tekst):
+    """Małe litery, bez polskich znaków i stop-słów, słowa obcięte do rdzenia."""
+    slowa = re.findall(r"[a-z0-9]+", normalizuj_tekst(tekst))
+    return [s[:DLUGOSC_RDZENIA] for s in slowa if len(s) > 1 and s not in STOP_SLOWA]
+
+def _jednostki_tekstu(tekst):
+    """Dzieli tekst na akapity: po pustych liniach i przed paragrafami/artykułami/punktami."""
+    # Łączymy słowa przeniesione do nowej linii ("rozpo-\nrządzenia")
+    tekst = re.sub(r"(\w)-\n(\w)", r"\1\2", tekst)
+    jednostki, biezaca = [], []
+    for linia in tekst.splitlines():
+        if not linia.strip() or _WZORZEC_POCZATKU_JEDNOSTKI.match(linia):
+            if biezaca:
+                jednostki.append(" ".join(biezaca))
+                biezaca = []
+        if linia.strip():
+            biezaca.append(" ".join(linia.split()))
+    if biezaca:
+        jednostki.append(" ".join(biezaca))
+    return jednostki
+
+def podziel_na_fragmenty(tekst):
+    """Łączy sąsiednie akapity we fragmenty ok. DLUGOSC_FRAGMENTU znaków; zbyt długie akapity tnie po zdaniach."""
+    fragmenty, biezacy = [], ""
+    for jednostka in _jednostki_tekstu(tekst):
+        while len(jednostka) > MAKS_DLUGOSC_FRAGMENTU:
+            ciecie = jednostka.rfind(". ", 0, MAKS_DLUGOSC_FRAGMENTU)
+            ciecie = ciecie + 1 if ciecie > DLUGOSC_FRAGMENTU // 2 else MAKS_DLUGOSC_FRAGMENTU
+            if biezacy:
+                fragmenty.append(biezacy)
+                biezacy = ""
+            fragmenty.append(jednostka[:ciecie].strip())
+            jednostka = jednostka[ciecie:].strip()
+        if biezacy and len(biezacy) + len(jednostka) > DLUGOSC_FRAGMENTU:
+            fragmenty.append(biezacy)
+            biezacy = ""
+        biezacy = f"{biezacy}\n{jednostka}" if biezacy else jednostka
+    if biezacy:
+        fragmenty.append(biezacy)
+    return fragmenty
+
+# Pocięte i stokenizowane dokumenty, wg odcisku treści - przy zmianie folderu liczymy tylko nowe pliki
+_fragmenty_dokumentow = {}
+
+def _fragmenty_dokumentu(dokument):
+    odcisk = dokument.get("odcisk")
+    if odcisk and odcisk in _fragmenty_dokumentow:
+        return _fragmenty_dokumentow[odcisk]
+    fragmenty = []
+    for tresc in podziel_na_fragmenty(dokument["tekst"]):
+        tokeny = tokenizuj(tresc)
+        if tokeny:
+            fragmenty.append((tresc, len(tokeny), Counter(tokeny)))
+    if odcisk:
+        _fragmenty_dokumentow[odcisk] = fragmenty
+    return fragmenty
+
+def zbuduj_indeks(dokumenty):
+    """
+    Buduje odwrócony indeks BM25 z listy dokumentów ({"nazwa", "tekst", "odcisk"}).
+    Zwraca słownik: fragmenty, długości, średnia długość i postingi {termin: [(id_fragmentu, tf), ...]}.
+    """
+    fragmenty, dlugosci = [], []
+    postingi = defaultdict(list)
+    for dokument in dokumenty:
+        for tresc, dlugosc, liczniki in _fragmenty_dokumentu(dokument):
+            id_fragmentu = len(fragmenty)
+            fragmenty.append({"zrodlo": dokument["nazwa"], "tekst": tresc})
+            dlugosci.append(dlugosc)
+            for termin, tf in liczniki.items():
+                postingi[termin].append((id_fragmentu, tf))
+    return {
+        "fragmenty": fragmenty,
+        "dlugosci": dlugosci,
+        "srednia_dlugosc": (sum(dlugosci) / len(dlugosci)) if dlugosci else 0.0,
+        "postingi": dict(postingi)
+    }
+
+def szukaj(indeks, zapytanie, k=5):
+    """Zwraca k najlepszych fragmentów dla zapytania (lista słowników: zrodlo, tekst, wynik)."""
+    liczba_fragmentow = len(indeks["fragmenty"])
+    if not liczba_fragmentow:
+        return []
+    wyniki = defaultdict(float)
+    for termin in set(tokenizuj(zapytanie)):
+        lista = indeks["postingi"].get(termin)
+        if not lista:
+            continue
+        idf = math.log(1 + (liczba_fragmentow - len(lista) + 0.5) / (len(lista) + 0.5))
+        for id_fragmentu, tf in lista:
+            norma = 1 - BM25_B + BM25_B * indeks["dlugosci"][id_fragmentu] / indeks["srednia_dlugosc"]
+            wyniki[id_fragmentu] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norma)
+    najlepsze = sorted(wyniki.items(), key=lambda x: x[1], reverse=True)[:k]
+    return [dict(indeks["fragmenty"][i], wynik=round(w, 3)) for i, w in najlepsze]
+
+_blokada_indeksow = threading.Lock()
+_indeksy = {}
+
+def indeks_bazy_wiedzy(folder_path='baza_wiedzy'):
+    """
+    Indeks BM25 bazy wiedzy. Przebudowywany tylko wtedy, gdy zmienił się stan folderu;
+    wtedy ekstrakcja i tokenizacja dotyczą wyłącznie nowych lub zmienionych plików.
+    """
+    stan = stan_folderu_bazy(folder_path)
+    with _blokada_indeksow:
+        zapisany = _indeksy.get(folder_path)
+        if zapisany and zapisany[0] == stan:
+            return zapisany[1]
+        indeks = zbuduj_indeks(wczytaj_dokumenty_bazy(folder_path))
+        _indeksy[folder_path] = (stan, indeks)
+        return indeks
+
+def kontekst_prawny_dla_szkolenia(nazwa_zawodu, srodowisko="", obowiazki="", zagrozenia="", k=6, limit_znakow=6000, folder_path='baza_wiedzy'):
+    """
+    Wybiera z bazy wiedzy fragmenty przepisów najbardziej związane ze stanowiskiem i środowiskiem pracy.
+    Zwraca gotowy tekst do wstawienia w prompt (pusty, gdy baza jest pusta).
+    """
+    indeks = indeks_bazy_wiedzy(folder_path)
+    # Zawsze dokładamy rdzeń tematyczny szkolenia wstępnego, żeby zapytanie nie było zbyt wąskie
+    zapytanie = f"{nazwa_zawodu} {srodowisko} {obowiazki} {zagrozenia} szkolenie wstępne instruktaż stanowiskowy bezpieczeństwo higiena pracy"
+    czesci, dlugosc = [], 0
+    for fragment in szukaj(indeks, zapytanie, k):
+        wpis = f"[Źródło: {fragment['zrodlo']}]\n{fragment['tekst']}"
+        if dlugosc + len(wpis) > limit_znakow:
+            break
+        czesci.append(wpis)
+        dlugosc += len(wpis)
+    return "\n\n".join(czesci)